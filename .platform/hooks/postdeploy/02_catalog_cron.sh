@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+# Sincronización diaria de catálogos (catalog.py sync) con las variables de entorno de EB
+# (incluida SCRAPER_DATA_DIR: la instantánea va al mismo /var/app/data que lee la app)
+set -euo pipefail
+dnf install -y cronie
+systemctl enable --now crond
+cat > /etc/cron.d/catalog_sync <<'CRON'
+30 5 * * * webapp bash -c 'set -a; . /opt/elasticbeanstalk/deployment/env; set +a; source /var/app/venv/*/bin/activate && cd /var/app/current && python catalog.py sync' >> /var/log/catalog_sync.log 2>&1
+CRON
+chmod 644 /etc/cron.d/catalog_sync
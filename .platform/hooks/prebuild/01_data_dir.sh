@@ -0,0 +1,5 @@
+#!/usr/bin/env bash
+# Directorio de datos (SQLite de caché, trabajos, lotes, catálogo e historial) fuera de
+# /var/app/current, que EB reemplaza en cada deploy. SCRAPER_DATA_DIR apunta acá (01_python.config).
+set -euo pipefail
+install -d -o webapp -g webapp -m 750 /var/app/data
@@ -1,9 +1,21 @@
-import os, re, json
+import os, re, json, uuid, importlib
 from pathlib import Path
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from scraper import PriceScraper
+from ratelimit import RATE_LIMITER
+from cache import RESULT_CACHE, CACHE_MODES
+from httpcache import HTTP_CACHE
+from routing import STRATEGY_ROUTER
+from jobs import JOBS
+from registry import RUNS
+from sessions import SESSION_POOL
+from catalog import CATALOG, CATALOG_VENDORS
+from singleflight import FLIGHTS
+from metrics import METRICS
+from export import EXPORT_FORMATS, columns_for, rows_from_job, iter_csv, iter_xlsx, export_to_sheets
+from ingest import BATCHES, INGEST_FORMATS, save_upload, iter_csv_rows, iter_xlsx_rows, iter_products, run_batch
+from history import HISTORY, HISTORY_ENABLED, parse_since, product_key
 
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
@@ -13,7 +25,29 @@ PROMPT_FILE = BASE_DIR / "prompt-2.txt"
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path="")
 CORS(app)
 
-CANCEL_FLAGS = {}
+# scraper.py y sus dependencias pesadas se importan con el primer scraping, no al arrancar
+# el worker (/api/health y los estáticos no las necesitan). Con gunicorn --preload se
+# importan antes en el master (warm_imports) y los workers las comparten.
+WARM_MODULES = ["scraper", "pandas", "bs4", "pdfminer.high_level", "openpyxl", "curl_cffi.requests", "pypdfium2"]
+
+def new_scraper(**kw):
+    from scraper import PriceScraper
+    return PriceScraper(**kw)
+
+def warm_imports(modules=WARM_MODULES):
+    """Importa lo pesado por adelantado; devuelve los módulos que no se pudieron cargar."""
+    missing = []
+    for name in modules:
+        try: importlib.import_module(name)
+        except Exception: missing.append(name)
+    return missing
+
+# Paralelismo del scraping: carriles simultáneos (entre vendedores) y carriles por vendedor
+MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "10"))
+PER_VENDOR = int(os.getenv("SCRAPE_PER_VENDOR", "1"))
+# Presupuesto por vendedor de trabajos y lotes (s, 0 = sin tope): existen justamente para
+# pasar el límite de un request, así que no heredan el VENDOR_TIME_BUDGET de /api/scrape
+JOB_VENDOR_BUDGET = float(os.getenv("JOB_VENDOR_TIME_BUDGET", "0"))
 
 DEFAULT_VENDORS = {
     "Carrefour": "https://www.carrefour.com.ar",
@@ -67,6 +101,11 @@ def parse_vendors_from_prompt(path: Path):
             out[nm_clean] = DEFAULT_VENDORS.get(nm_clean, "")
     return out or None
 
+RESULT_COLUMNS = [
+    "Producto","Marca","Carrefour","Cetrogar","CheekSA","Frávega","Libertad",
+    "Masonline","Megatone","Musimundo","Naldo","Vital","Marca (Sitio oficial)","Fecha de Consulta"
+]
+
 def sanitize_products(products):
     safe = []
     for p in products or []:
@@ -80,6 +119,42 @@ def sanitize_products(products):
         })
     return safe
 
+def parse_scrape_options(data):
+    """
+    Parámetros comunes del JSON → (kwargs de PriceScraper, kwargs de scrape_all_vendors).
+    ValueError si son inválidos. No importa el scraper: sirve para validar al crear un lote.
+    """
+    cache_mode = to_str(data.get("cache")) or "use"
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"cache debe ser uno de {', '.join(CACHE_MODES)}")
+    min_delay = int(data.get("min_delay", 2))
+    max_delay = int(data.get("max_delay", 5))
+    scraper_kw = {"headless": bool(data.get("headless", True)), "delay_range": (min_delay, max_delay), "cache_mode": cache_mode,
+                  "batch_vtex": bool(data.get("batch_vtex", True)), "use_catalog": bool(data.get("catalog", True)),
+                  "record_history": bool(data.get("history", HISTORY_ENABLED))}
+    kwargs = {
+        "include_official_site": bool(data.get("include_official", False)),
+        "max_workers": int(data.get("max_workers", MAX_WORKERS)),
+        "per_vendor": int(data.get("per_vendor", PER_VENDOR)),
+    }
+    if data.get("vendor_budget") not in (None, ""):
+        kwargs["vendor_budget"] = float(data["vendor_budget"])  # s por vendedor; 0 = sin tope
+    return scraper_kw, kwargs
+
+def scrape_options(data):
+    """Como parse_scrape_options, pero con el PriceScraper ya creado."""
+    scraper_kw, kwargs = parse_scrape_options(data)
+    return new_scraper(**scraper_kw), kwargs
+
+def request_vendors(data):
+    v = data.get("vendor")
+    if isinstance(v, dict) and to_str(v.get("name")):
+        return {to_str(v.get("name")): to_str(v.get("url"))}
+    vendors = data.get("vendors")
+    if not vendors or not isinstance(vendors, dict) or len(vendors) == 0:
+        vendors = parse_vendors_file(VENDORS_FILE) or parse_vendors_from_prompt(PROMPT_FILE) or DEFAULT_VENDORS
+    return vendors
+
 @app.route("/", methods=["GET", "HEAD"])
 def root():
     return app.send_static_file("index.html")
@@ -108,14 +183,93 @@ def get_vendors():
         return jsonify({"vendors": v_from_prompt})
     return jsonify({"vendors": DEFAULT_VENDORS})
 
+@app.route("/api/ratelimits", methods=["GET"])
+def ratelimits():
+    return jsonify({"hosts": RATE_LIMITER.state(), "sessions": SESSION_POOL.state(), "singleflight": FLIGHTS.state()})
+
+@app.route("/api/cache", methods=["GET", "DELETE"])
+def result_cache():
+    if request.method == "DELETE":
+        RESULT_CACHE.clear(to_str(request.args.get("vendor")) or None)
+        return jsonify({"success": True})
+    return jsonify(RESULT_CACHE.stats())
+
+@app.route("/api/httpcache", methods=["GET", "DELETE"])
+def http_cache():
+    if request.method == "DELETE":
+        HTTP_CACHE.clear()
+        return jsonify({"success": True})
+    return jsonify(HTTP_CACHE.stats())
+
+@app.route("/api/routing", methods=["GET"])
+def routing_stats():
+    return jsonify({"vendors": STRATEGY_ROUTER.snapshot()})
+
+@app.route("/api/catalog", methods=["GET"])
+def catalog_stats():
+    return jsonify({"vendors": CATALOG.stats()})
+
+@app.route("/api/catalog/sync", methods=["POST"])
+def catalog_sync():
+    """Sincroniza instantáneas de catálogo en segundo plano (mismo seguimiento que /api/jobs)."""
+    data = request.get_json(force=True, silent=True) or {}
+    if data.get("vendor") or data.get("vendors"):
+        vendors = request_vendors(data)
+    else:
+        known = request_vendors({})
+        vendors = {n: known.get(n, "") for n in CATALOG_VENDORS} if CATALOG_VENDORS else known
+    vendors = {n: u for n, u in vendors.items() if u}
+    if not vendors:
+        return jsonify({"success": False, "error": "No hay vendedores configurados"}), 400
+    cats = data.get("categories")
+    force = bool(data.get("force", False))
+    scraper = new_scraper(delay_range=(int(data.get("min_delay", 1)), int(data.get("max_delay", 2))))
+
+    def work(job):
+        for name, url in vendors.items():
+            if job.cancel_cb(): return
+            categories = cats.get(name) if isinstance(cats, dict) else (cats or CATALOG_VENDORS.get(name))
+            res = scraper.sync_catalog(name, url, log=lambda msg: job.emit("log", msg), categories=categories,
+                                       force=force, cancel_cb=job.cancel_cb)
+            job.emit("vendor", res)
+            job.advance()
+
+    job_id = JOBS.submit("catalog", len(vendors), work, meta={"vendors": list(vendors)})
+    return jsonify({
+        "success": True, "job_id": job_id, "run_id": job_id,
+        "status_url": f"/api/jobs/{job_id}", "events_url": f"/api/jobs/{job_id}/events"
+    }), 202
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Métricas en formato de texto de Prometheus (sumadas entre los workers vivos)."""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route("/api/cancel", methods=["POST"])
 def cancel():
     data = request.get_json(force=True, silent=False)
     run_id = to_str(data.get("run_id"))
     if not run_id:
         return jsonify({"success": False, "error": "run_id requerido"}), 400
-    CANCEL_FLAGS[run_id] = True
-    return jsonify({"success": True})
+    known = RUNS.cancel(run_id)
+    return jsonify({"success": True, "known": known})
+
+@app.route("/api/runs", methods=["GET"])
+def list_runs():
+    return jsonify({"runs": RUNS.active()})
+
+def run_scrape(run_id, kind, products, vendors, scraper, kwargs):
+    """Ejecución síncrona registrada: cancelable desde cualquier worker vía /api/cancel."""
+    run_id = run_id or uuid.uuid4().hex
+    RUNS.register(run_id, kind, {"products": len(products), "vendors": list(vendors)})
+    status = "error"
+    try:
+        cancel_cb = RUNS.cancel_checker(run_id)
+        out = scraper.scrape_all_vendors(products, vendors, return_logs=True, cancel_cb=cancel_cb, run_id=run_id, **kwargs)
+        status = "cancelled" if cancel_cb() else "done"
+        return out
+    finally:
+        RUNS.finish(run_id, status)
 
 @app.route("/api/scrape_vendor", methods=["POST"])
 def scrape_vendor():
@@ -131,23 +285,20 @@ def scrape_vendor():
     if not name:
         return jsonify({"success": False, "error": "Falta nombre de vendedor"}), 400
 
-    headless = bool(data.get("headless", True))
-    min_delay = int(data.get("min_delay", 2))
-    max_delay = int(data.get("max_delay", 5))
-    include_official = bool(data.get("include_official", False))
-    cancel_cb = (lambda: bool(CANCEL_FLAGS.get(run_id))) if run_id else (lambda: False)
+    try:
+        scraper, kwargs = scrape_options(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-    scraper = PriceScraper(headless=headless, delay_range=(min_delay, max_delay))
-    df, logs = scraper.scrape_all_vendors(
-        products, {name: url}, include_official_site=include_official, return_logs=True, cancel_cb=cancel_cb
-    )
+    df, logs = run_scrape(run_id, "scrape_vendor", products, {name: url}, scraper, kwargs)
 
     base_cols = ["Producto","Marca","Marca (Sitio oficial)","Fecha de Consulta"]
     vendor_cols = [c for c in df.columns if c == name or c == f"{name} (num)"]
     keep = [c for c in base_cols + vendor_cols if c in df.columns]
     df = df[keep]
 
-    return jsonify({"success": True, "rows": df.to_dict(orient="records"), "log": logs})
+    return jsonify({"success": True, "rows": df.to_dict(orient="records"), "log": logs,
+                    "timings": scraper.last_timings.as_dict() if scraper.last_timings else None})
 
 @app.route("/api/scrape", methods=["POST"])
 def scrape():
@@ -156,34 +307,306 @@ def scrape():
         return jsonify({"success": False, "error": "Cuerpo JSON inválido"}), 400
 
     products = sanitize_products(data.get("products", []))
-    vendors = data.get("vendors")
+    vendors = request_vendors(data)
     run_id = to_str(data.get("run_id"))
-    if not vendors or not isinstance(vendors, dict) or len(vendors) == 0:
-        vendors = parse_vendors_file(VENDORS_FILE) or parse_vendors_from_prompt(PROMPT_FILE) or DEFAULT_VENDORS
     if not vendors:
         return jsonify({"success": False, "error": "No hay vendedores configurados"}), 400
     if not products:
         return jsonify({"success": False, "error": "No se enviaron productos"}), 400
 
-    headless = bool(data.get("headless", True))
-    min_delay = int(data.get("min_delay", 2))
-    max_delay = int(data.get("max_delay", 5))
-    include_official = bool(data.get("include_official", False))
-    cancel_cb = (lambda: bool(CANCEL_FLAGS.get(run_id))) if run_id else (lambda: False)
+    try:
+        scraper, kwargs = scrape_options(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-    scraper = PriceScraper(headless=headless, delay_range=(min_delay, max_delay))
-    df, logs = scraper.scrape_all_vendors(products, vendors, include_official_site=include_official, return_logs=True, cancel_cb=cancel_cb)
+    df, logs = run_scrape(run_id, "scrape", products, vendors, scraper, kwargs)
 
-    ordered = [
-        "Producto","Marca","Carrefour","Cetrogar","CheekSA","Frávega","Libertad",
-        "Masonline","Megatone","Musimundo","Naldo","Vital","Marca (Sitio oficial)","Fecha de Consulta"
-    ]
-    for c in ordered:
+    for c in RESULT_COLUMNS:
         if c not in df.columns:
             df[c] = "ND"
     extra = [c for c in df.columns if c.endswith(" (num)")]
-    df = df[ordered + extra]
-    return jsonify({"success": True, "rows": df.to_dict(orient="records"), "log": logs})
+    df = df[RESULT_COLUMNS + extra]
+    return jsonify({"success": True, "rows": df.to_dict(orient="records"), "log": logs,
+                    "timings": scraper.last_timings.as_dict() if scraper.last_timings else None})
+
+# ---------------- Trabajos asíncronos con progreso en streaming ----------------
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Cuerpo JSON inválido"}), 400
+    products = sanitize_products(data.get("products", []))
+    vendors = request_vendors(data)
+    if not vendors:
+        return jsonify({"success": False, "error": "No hay vendedores configurados"}), 400
+    if not products:
+        return jsonify({"success": False, "error": "No se enviaron productos"}), 400
+    try:
+        scraper, kwargs = scrape_options(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    kwargs.setdefault("vendor_budget", JOB_VENDOR_BUDGET)
+
+    def work(job):
+        def on_result(i, vendor, row):
+            job.emit("row", {"index": i, "vendor": vendor, "row": row})
+            job.advance()
+        scraper.scrape_all_vendors(products, vendors, cancel_cb=job.cancel_cb, run_id=job.id,
+                                   on_log=lambda msg: job.emit("log", msg), on_result=on_result, **kwargs)
+        job.emit("timings", scraper.last_timings.as_dict())
+
+    job_id = JOBS.submit("scrape", len(products) * len(vendors), work, meta={"products": len(products), "vendors": list(vendors)})
+    return jsonify({
+        "success": True, "job_id": job_id, "run_id": job_id,
+        "status_url": f"/api/jobs/{job_id}", "events_url": f"/api/jobs/{job_id}/events"
+    }), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = JOBS.store.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Trabajo inexistente"}), 404
+    return jsonify({"success": True, **job})
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Eventos del trabajo como Server-Sent Events (Accept: text/event-stream o ?format=sse) o NDJSON."""
+    if not JOBS.store.get(job_id):
+        return jsonify({"success": False, "error": "Trabajo inexistente"}), 404
+    try:
+        after = int(request.args.get("after") or request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        after = 0
+    fmt = to_str(request.args.get("format")) or ("sse" if "text/event-stream" in request.headers.get("Accept", "") else "ndjson")
+
+    def generate():
+        for ev in JOBS.stream(job_id, after):
+            if ev is None:
+                yield ": ping\n\n" if fmt == "sse" else "\n"
+                continue
+            seq, kind, payload = ev
+            if fmt == "sse":
+                yield f"id: {seq}\nevent: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            else:
+                yield json.dumps({"seq": seq, "type": kind, "data": payload}, ensure_ascii=False) + "\n"
+
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------------- Exportación ----------------
+def export_rows(data):
+    """Filas a exportar: las enviadas en `rows` o las de un trabajo (`job_id`). ValueError si no hay."""
+    job_id = to_str(data.get("job_id"))
+    if job_id:
+        if not JOBS.store.get(job_id): raise ValueError("Trabajo inexistente")
+        rows = rows_from_job(JOBS.store, job_id)
+    else:
+        rows = [r for r in (data.get("rows") or []) if isinstance(r, dict)]
+    if not rows: raise ValueError("Sin filas para exportar")
+    preferred = [c for c in RESULT_COLUMNS if any(c in r for r in rows)]
+    return rows, columns_for(rows, preferred)
+
+@app.route("/api/export", methods=["GET", "POST"])
+def export_file():
+    """CSV o XLSX en streaming. GET ?job_id=…&format=… (enlace de descarga) o POST con rows/job_id."""
+    data = request.args.to_dict() if request.method == "GET" else (request.get_json(force=True, silent=True) or {})
+    fmt = to_str(data.get("format")) or "csv"
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"success": False, "error": f"format debe ser uno de {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        rows, columns = export_rows(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return file_response(rows, columns, fmt, to_str(data.get("filename")) or "comparacion_precios")
+
+def file_response(rows, columns, fmt, filename):
+    """Respuesta en streaming con el CSV/XLSX de rows (lista o generador)."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", filename)
+    if fmt == "xlsx":
+        try:
+            body, mimetype = iter_xlsx(rows, columns), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            first = next(body)  # errores (openpyxl ausente) antes de empezar la respuesta
+        except RuntimeError as e:
+            return jsonify({"success": False, "error": str(e)}), 501
+        stream = (chunk for part in ([first], body) for chunk in part)
+    else:
+        stream, mimetype = iter_csv(rows, columns), "text/csv; charset=utf-8"
+    return Response(stream_with_context(stream), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'})
+
+@app.route("/api/export/sheets", methods=["POST"])
+def export_sheets():
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        rows, columns = export_rows(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    mode = to_str(data.get("mode")) or "replace"
+    if mode not in ("replace", "append"):
+        return jsonify({"success": False, "error": "mode debe ser replace o append"}), 400
+    logs = []
+    try:
+        res = export_to_sheets(rows, columns, to_str(data.get("sheet_name")) or "Comparación Precios Electrodomésticos",
+                               spreadsheet_id=to_str(data.get("spreadsheet_id")) or None, mode=mode, log=logs.append)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "log": logs}), 502
+    return jsonify({"success": True, **res, "log": logs})
+
+# ---------------- Lotes grandes (CSV/XLSX subido) ----------------
+def start_batch(batch_id, job_id):
+    """
+    Encola el scraping de lo pendiente del lote como trabajo (kind "batch"). El lote ya está
+    reservado para job_id (BATCHES.claim) y pasa a "running" recién cuando el trabajo arranca.
+    """
+    vendors, options = BATCHES.options(batch_id)
+    scraper, kwargs = scrape_options(options)
+    kwargs.setdefault("vendor_budget", JOB_VENDOR_BUDGET)
+    info = BATCHES.get(batch_id)
+
+    def work(job):
+        run_batch(BATCHES, batch_id, job, lambda products, on_result, on_log, cancel_cb: scraper.scrape_all_vendors(
+            products, vendors, cancel_cb=cancel_cb, on_log=on_log, on_result=on_result, run_id=job.id, **kwargs))
+
+    JOBS.submit("batch", info["total"] - info["done"], work, meta={"batch_id": batch_id, "vendors": list(vendors)}, job_id=job_id)
+    return jsonify({
+        "success": True, "batch_id": batch_id, "job_id": job_id, "run_id": job_id,
+        "total": info["total"], "duplicates": info["duplicates"], "done": info["done"],
+        "status_url": f"/api/batches/{batch_id}", "events_url": f"/api/jobs/{job_id}/events",
+        "export_url": f"/api/batches/{batch_id}/export"
+    }), 202
+
+@app.route("/api/batches", methods=["POST"])
+def create_batch():
+    """
+    multipart/form-data: file (.csv/.xlsx) y options (JSON con lo mismo que /api/scrape salvo
+    products). El archivo va a disco por trozos, se deduplica y se scrapea por tandas.
+    """
+    f = request.files.get("file")
+    if not f or not f.filename:
+        return jsonify({"success": False, "error": "Falta el archivo (campo file)"}), 400
+    fmt = to_str(request.form.get("format")) or f.filename.rsplit(".", 1)[-1].lower()
+    if fmt not in INGEST_FORMATS:
+        return jsonify({"success": False, "error": f"formato debe ser uno de {', '.join(INGEST_FORMATS)}"}), 400
+    try:
+        data = json.loads(request.form.get("options") or "{}")
+        if not isinstance(data, dict): raise ValueError("options debe ser un objeto JSON")
+        parse_scrape_options(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    vendors = request_vendors(data)
+    if not vendors:
+        return jsonify({"success": False, "error": "No hay vendedores configurados"}), 400
+    data.pop("products", None)
+
+    batch_id = BATCHES.create(f.filename, vendors, data)
+    path = BATCHES.file_path(batch_id, fmt)
+    try:
+        save_upload(f.stream, path)
+        rows = iter_xlsx_rows(path) if fmt == "xlsx" else iter_csv_rows(path)
+        total, _ = BATCHES.ingest(batch_id, iter_products(rows))
+    except Exception as e:
+        BATCHES.set_status(batch_id, "error", f"archivo inválido: {e}")
+        return jsonify({"success": False, "batch_id": batch_id, "error": f"No se pudo leer el archivo: {e}"}), 400
+    finally:
+        path.unlink(missing_ok=True)
+    if not total:
+        BATCHES.set_status(batch_id, "error", "sin productos")
+        return jsonify({"success": False, "batch_id": batch_id, "error": "El archivo no tiene productos"}), 400
+    job_id = uuid.uuid4().hex
+    BATCHES.claim(batch_id, job_id)
+    return start_batch(batch_id, job_id)
+
+@app.route("/api/batches/<batch_id>", methods=["GET"])
+def batch_status(batch_id):
+    info = BATCHES.get(batch_id)
+    if not info:
+        return jsonify({"success": False, "error": "Lote inexistente"}), 404
+    return jsonify({"success": True, **info})
+
+@app.route("/api/batches/<batch_id>/resume", methods=["POST"])
+def resume_batch(batch_id):
+    """Retoma un lote interrumpido (worker reiniciado), cancelado o con error desde lo pendiente."""
+    info = BATCHES.get(batch_id)
+    if not info:
+        return jsonify({"success": False, "error": "Lote inexistente"}), 404
+    if info["done"] >= info["total"]:
+        return jsonify({"success": False, "error": "El lote ya está completo"}), 409
+    job_id = uuid.uuid4().hex
+    if not BATCHES.claim(batch_id, job_id):
+        return jsonify({"success": False, "error": f"El lote está {info['status']}"}), 409
+    return start_batch(batch_id, job_id)
+
+@app.route("/api/batches/<batch_id>/export", methods=["GET"])
+def export_batch(batch_id):
+    """Resultados del lote (lo resuelto hasta el momento) leídos desde disco en streaming."""
+    info = BATCHES.get(batch_id)
+    if not info:
+        return jsonify({"success": False, "error": "Lote inexistente"}), 404
+    fmt = to_str(request.args.get("format")) or "csv"
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"success": False, "error": f"format debe ser uno de {', '.join(EXPORT_FORMATS)}"}), 400
+    name = (info["filename"] or "lote").rsplit(".", 1)[0] + "_precios"
+    return file_response(BATCHES.iter_rows(batch_id), BATCHES.columns(batch_id), fmt, name)
+
+# ---------------- Historial de precios ----------------
+def history_query():
+    """(product_key o None, limit, offset) desde ?key= o ?ean= / ?marca=&modelo= / ?producto=."""
+    args = request.args
+    key = to_str(args.get("key"))
+    if not key and any(to_str(args.get(k)) for k in ("ean", "marca", "modelo", "producto")):
+        key = product_key({k: to_str(args.get(k)) for k in ("ean", "marca", "modelo", "producto")})
+    limit = max(1, min(int(args.get("limit") or 500), 5000))
+    return key or None, limit, max(0, int(args.get("offset") or 0))
+
+@app.route("/api/history", methods=["GET"])
+def history_stats():
+    return jsonify(HISTORY.stats())
+
+@app.route("/api/history/latest", methods=["GET"])
+def history_latest():
+    """Último precio conocido por producto y vendedor (?vendor= para uno solo)."""
+    try: key, limit, offset = history_query()
+    except ValueError: return jsonify({"success": False, "error": "limit/offset inválidos"}), 400
+    return jsonify({"success": True, "items": HISTORY.latest(key, to_str(request.args.get("vendor")) or None, limit, offset)})
+
+@app.route("/api/history/changes", methods=["GET"])
+def history_changes():
+    """
+    Cambios de precio desde ?since= (epoch o ISO) y/o posteriores a ?cursor= (id). Para
+    sondear, repetir con el `cursor` devuelto: solo llegan los cambios nuevos.
+    """
+    since = parse_since(request.args.get("since"))
+    if request.args.get("since") and since is None:
+        return jsonify({"success": False, "error": "since debe ser epoch o fecha ISO"}), 400
+    try:
+        cursor = int(request.args.get("cursor") or 0)
+        _, limit, _ = history_query()
+    except ValueError:
+        return jsonify({"success": False, "error": "cursor/limit inválidos"}), 400
+    items = HISTORY.changes(since, cursor, to_str(request.args.get("vendor")) or None, limit)
+    return jsonify({"success": True, "items": items, "cursor": items[-1]["id"] if items else cursor,
+                    "more": len(items) == limit})
+
+@app.route("/api/history/cheapest", methods=["GET"])
+def history_cheapest():
+    """Vendedor más barato por producto según el último precio de cada uno."""
+    try: key, limit, offset = history_query()
+    except ValueError: return jsonify({"success": False, "error": "limit/offset inválidos"}), 400
+    return jsonify({"success": True, "items": HISTORY.cheapest(key, limit, offset)})
+
+@app.route("/api/history/product", methods=["GET"])
+def history_product():
+    """Evolución de un producto; ?all=1 incluye las observaciones sin cambio."""
+    try: key, limit, _ = history_query()
+    except ValueError: return jsonify({"success": False, "error": "limit inválido"}), 400
+    if not key:
+        return jsonify({"success": False, "error": "Indicar key, ean, marca+modelo o producto"}), 400
+    since = parse_since(request.args.get("since"))
+    items = HISTORY.series(key, to_str(request.args.get("vendor")) or None, since,
+                           changes_only=request.args.get("all") not in ("1", "true"), limit=limit)
+    return jsonify({"success": True, "key": key, "items": items})
 
 if __name__ == "__main__":
     # Para desarrollo local; en EB se usa Gunicorn vía Procfile
@@ -0,0 +1,196 @@
+# bench/run.py
+# Benchmark offline del scraper contra bench/server.py (sin internet). Cada escenario
+# corre en un subproceso propio con DATA_DIR temporal, para medir CPU y memoria pico
+# limpias. Reporta por escenario: búsquedas/s, latencia p50/p95 por búsqueda
+# (producto × vendedor), CPU (proceso + hijos de OCR), RSS pico y aciertos.
+#
+#   python bench/run.py --products 200 --workers 4 --per-vendor 2
+#   python bench/run.py --mode jobs --scenarios vtex,woo --json bench/ultimo.json
+#   python bench/run.py --compare bench/ultimo.json     # falla si empeora más de --tolerance
+import os, sys, json, time, shutil, argparse, resource, subprocess, tempfile
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+# escenario → (vendedor, ruta en el servidor). Vital y Cheek arrancan por folletos.
+SCENARIOS = {
+    "vtex": ("BenchVtex", "/vtex"),
+    "magento": ("BenchMagento", "/magento"),
+    "woo": ("BenchWoo", "/woo"),
+    "brochures": ("Vital", "/folletos"),
+    "ocr": ("Cheek", "/escaneados"),
+}
+MODES = ("scraper", "flask", "jobs")
+
+def pct(values: List[float], q: float) -> float:
+    if not values: return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(q * (len(v) - 1))))]
+
+def _peak_rss_mb() -> float:
+    # VmHWM se reinicia con exec; ru_maxrss en Linux arrastra el pico del proceso padre
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"): return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _cpu() -> float:
+    me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+
+# ---------------- un escenario (subproceso) ----------------
+def run_scenario(args) -> Dict:
+    import ocr
+    from scraper import PriceScraper
+    from server import bench_products
+
+    name, path = SCENARIOS[args.scenario]
+    vendors = {name: args.url + path}
+    products = bench_products(args.products)
+    latencies: List[float] = []
+
+    # latencia por búsqueda: se envuelve _search_product (también la usan app.py y los trabajos)
+    inner = PriceScraper._search_product
+    def timed(self, *a, **kw):
+        t0 = time.perf_counter()
+        try: return inner(self, *a, **kw)
+        finally: latencies.append(time.perf_counter() - t0)
+    PriceScraper._search_product = timed
+
+    opts = {"products": products, "vendors": vendors, "cache": "bypass", "min_delay": args.delay, "max_delay": args.delay,
+            "max_workers": args.workers, "per_vendor": args.per_vendor, "batch_vtex": args.batch, "catalog": False}
+    cpu0, t0 = _cpu(), time.perf_counter()
+    timings = None
+    if args.mode == "scraper":
+        scraper = PriceScraper(delay_range=(args.delay, args.delay), cache_mode="bypass", batch_vtex=args.batch, use_catalog=False)
+        df = scraper.scrape_all_vendors(products, vendors, max_workers=args.workers, per_vendor=args.per_vendor)[0]
+        found = int((df[name] != "ND").sum())
+        timings = scraper.last_timings.as_dict()
+    else:
+        from app import app
+        client = app.test_client()
+        if args.mode == "flask":
+            data = client.post("/api/scrape", json=opts).get_json()
+            if not data.get("success"): raise RuntimeError(data.get("error"))
+            found = sum(1 for r in data["rows"] if r.get(f"{name} (num)"))  # /api/scrape solo deja la columna (num) de vendedores extra
+            timings = data.get("timings")
+        else:
+            job = client.post("/api/jobs", json=opts).get_json()
+            if not job.get("success"): raise RuntimeError(job.get("error"))
+            found = 0
+            resp = client.get(job["events_url"] + "?format=ndjson")
+            for line in resp.response:
+                line = line.decode("utf-8") if isinstance(line, bytes) else line
+                for part in filter(str.strip, line.splitlines()):
+                    ev = json.loads(part)
+                    if ev["type"] == "row" and ev["data"]["row"].get(name) not in (None, "", "ND"): found += 1
+                    elif ev["type"] == "timings": timings = ev["data"]
+                    elif ev["type"] == "end": break
+                else:
+                    continue
+                break
+            resp.close()
+    wall = time.perf_counter() - t0
+    if ocr._pool is not None: ocr._pool.shutdown(wait=True)  # así su CPU entra en RUSAGE_CHILDREN
+    lookups = len(latencies)
+    return {
+        "scenario": args.scenario, "mode": args.mode, "products": len(products), "lookups": lookups, "found": found,
+        "wall_s": round(wall, 3), "lookups_per_s": round(lookups / wall, 2) if wall else 0.0,
+        "p50_ms": round(pct(latencies, 0.50) * 1000, 1), "p95_ms": round(pct(latencies, 0.95) * 1000, 1),
+        "cpu_s": round(_cpu() - cpu0, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "timings": timings,
+    }
+
+# ---------------- orquestación ----------------
+def spawn(scenario: str, url: str, args) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        env = {**os.environ, "SCRAPER_DATA_DIR": tmp, "PYTHONHASHSEED": "0"}
+        cmd = [sys.executable, __file__, "--child", "--scenario", scenario, "--url", url, "--mode", args.mode,
+               "--products", str(args.products), "--workers", str(args.workers), "--per-vendor", str(args.per_vendor),
+               "--delay", str(args.delay)] + (["--batch"] if args.batch else [])
+        p = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if p.returncode != 0:
+            return {"scenario": scenario, "mode": args.mode, "error": (p.stderr.strip().splitlines() or ["?"])[-1]}
+        return json.loads(p.stdout.strip().splitlines()[-1])
+
+def print_table(results: List[Dict]):
+    cols = [("scenario", "escenario", "<10"), ("mode", "modo", "<8"), ("lookups", "búsq", ">6"), ("found", "ok", ">5"),
+            ("wall_s", "total s", ">8"), ("lookups_per_s", "búsq/s", ">8"), ("p50_ms", "p50 ms", ">8"),
+            ("p95_ms", "p95 ms", ">8"), ("cpu_s", "CPU s", ">7"), ("peak_rss_mb", "RSS MB", ">7")]
+    print("  ".join(f"{h:{a}}" for _, h, a in cols))
+    for r in results:
+        if "error" in r:
+            print(f"{r['scenario']:<10}  {r['mode']:<8}  ERROR: {r['error']}"); continue
+        print("  ".join(f"{r.get(k, ''):{a}}" for k, _, a in cols))
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Regresiones contra una corrida anterior (--json): throughput menor o p95 mayor que la tolerancia."""
+    base = {(r["scenario"], r["mode"]): r for r in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"] if "error" not in r}
+    out = []
+    for r in results:
+        b = base.get((r["scenario"], r["mode"]))
+        if not b or "error" in r: continue
+        if r["lookups_per_s"] < b["lookups_per_s"] * (1 - tolerance):
+            out.append(f"{r['scenario']}/{r['mode']}: búsq/s {b['lookups_per_s']} → {r['lookups_per_s']}")
+        if r["p95_ms"] > b["p95_ms"] * (1 + tolerance) and r["p95_ms"] - b["p95_ms"] > 5:
+            out.append(f"{r['scenario']}/{r['mode']}: p95 {b['p95_ms']} ms → {r['p95_ms']} ms")
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark offline del scraper con fixtures locales")
+    ap.add_argument("--products", type=int, default=50, help="productos por escenario")
+    ap.add_argument("--workers", type=int, default=4, help="max_workers de scrape_all_vendors")
+    ap.add_argument("--per-vendor", type=int, default=2, help="carriles por vendedor")
+    ap.add_argument("--delay", type=float, default=0.0, help="delay entre pedidos al mismo host (s)")
+    ap.add_argument("--latency", type=float, default=0.0, help="latencia simulada del servidor por respuesta (s)")
+    ap.add_argument("--scenarios", default="vtex,magento,woo,brochures,ocr")
+    ap.add_argument("--mode", choices=MODES, default="scraper", help="scraper directo, /api/scrape o /api/jobs")
+    ap.add_argument("--batch", action="store_true", help="lote VTEX por vendedor (por defecto se mide la búsqueda término a término)")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    ap.add_argument("--compare", help="resultados anteriores (--json) contra los que comparar")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--scenario", help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_scenario(args), ensure_ascii=False))
+        return 0
+
+    from ocr import HAVE_PDFIUM, HAVE_TESS
+    from server import FixtureServer, bench_products
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown: ap.error(f"escenarios desconocidos: {', '.join(unknown)}")
+    if "ocr" in scenarios and not (HAVE_TESS and HAVE_PDFIUM and shutil.which("tesseract")):
+        print("aviso: sin tesseract/pypdfium2, se omite el escenario ocr", file=sys.stderr)
+        scenarios.remove("ocr")
+
+    server = FixtureServer(bench_products(args.products), latency=args.latency).start()
+    try:
+        results = []
+        for sc in scenarios:
+            results.append(spawn(sc, server.url, args))
+            print(f"… {sc}: listo", file=sys.stderr)
+    finally:
+        server.stop()
+    print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": {k: v for k, v in vars(args).items() if k not in ("child", "scenario", "url")},
+                                               "results": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for r in regressions: print(f"REGRESIÓN {r}")
+        if regressions: return 1
+    return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
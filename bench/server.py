@@ -0,0 +1,129 @@
+# bench/server.py
+# Servidor HTTP local que reproduce respuestas grabadas de vendedores (bench/fixtures) para
+# medir el scraper sin salir a internet. Rutas por plataforma:
+#   /vtex/…      home + API catalog_system (JSON)          → estrategia VTEX
+#   /magento/…   home + catalogsearch/result (HTML)         → estrategia Magento
+#   /woo/…       home con form de búsqueda + ?s= (HTML)     → estrategia WordPress
+#   /folletos/…  home con enlace a un folleto PDF de texto    → estrategia Folletos
+#   /escaneados/… ídem con el folleto escaneado (solo imagen) → Folletos + OCR
+# En los fixtures, {{TERM}} se reemplaza por el término buscado y {{BASE}} por la URL base.
+import io, json, time, random, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+def bench_products(n: int, seed: int = 11) -> List[Dict]:
+    """Lote determinístico de productos (los folletos generados contienen a todos)."""
+    rnd = random.Random(seed)
+    brands = ["Samsung", "LG", "Whirlpool", "Drean", "Philco", "BGH", "Electrolux", "Midea"]
+    kinds = [("Heladera No Frost", "RF"), ("Lavarropas", "WW"), ("Smart TV", "UN"), ("Aire Split", "AS"), ("Microondas", "MS")]
+    out = []
+    for i in range(n):
+        b = rnd.choice(brands); k, pfx = rnd.choice(kinds)
+        model = f"{pfx}{rnd.randint(10, 99)}{rnd.choice('ABCDEFG')}{i:04d}"
+        out.append({"producto": f"{k} {b} {model}", "marca": b, "modelo": model, "capacidad": "", "ean": ""})
+    return out
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """PDF mínimo de texto (Helvetica), una lista de líneas por página."""
+    n = len(pages)
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * j} 0 R' for j in range(n))}] /Count {n} >>",
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for j, lines in enumerate(pages):
+        content = "BT /F1 9 Tf 30 810 Td 11 TL " + " ".join(f"({l}) Tj T*" for l in lines) + " ET"
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {5 + 2 * j} 0 R /Resources << /Font << /F1 3 0 R >> >> >>")
+        objs.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    out = b"%PDF-1.4\n"; offs = []
+    for i, o in enumerate(objs, 1):
+        offs.append(len(out)); out += f"{i} 0 obj\n{o}\nendobj\n".encode("latin-1", "replace")
+    x = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode() + b"".join(f"{o:010d} 00000 n \n".encode() for o in offs)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{x}\n%%EOF\n".encode()
+    return out
+
+def brochure_pages(products: List[Dict], per_page: int = 60, filler: int = 400, seed: int = 5) -> List[List[str]]:
+    """Líneas de folleto: muchos precios de relleno y los productos del lote repartidos."""
+    rnd = random.Random(seed)
+    lines = [f"Oferta articulo {rnd.randint(1000, 9999)} Cod {rnd.randint(10, 99)} $ {rnd.randint(10, 999)}.{rnd.randint(100, 999)}" for _ in range(filler)]
+    for p in products:
+        lines.insert(rnd.randint(0, len(lines)), f"{p['marca']} {p['modelo']} $ {rnd.randint(100, 999)}.999")
+    return [lines[k:k + per_page] for k in range(0, len(lines), per_page)]
+
+def scanned_pdf(text_pdf: bytes, scale: float = 1.5) -> Optional[bytes]:
+    """El mismo folleto como imágenes (sin capa de texto); None si falta pypdfium2/PIL."""
+    try:
+        import pypdfium2 as pdfium
+    except Exception:
+        return None
+    doc = pdfium.PdfDocument(text_pdf)
+    imgs = [doc[i].render(scale=scale, grayscale=True).to_pil().convert("RGB") for i in range(len(doc))]
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=72 * scale)
+    return buf.getvalue()
+
+class FixtureServer:
+    def __init__(self, products: List[Dict], port: int = 0, latency: float = 0.0, fixtures: Path = FIXTURES):
+        self.latency = latency
+        self.fixtures = {p.name: p.read_text(encoding="utf-8") for p in fixtures.glob("*.*")}
+        text = make_pdf(brochure_pages(products))
+        self.pdfs = {"ofertas.pdf": text, "escaneado.pdf": scanned_pdf(text)}
+        self.hits = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def log_message(self, *a): pass
+            def do_GET(self):
+                with server._lock: server.hits += 1
+                if server.latency: time.sleep(server.latency)
+                u = urlparse(self.path)
+                status, ctype, body = server.route(u.path, parse_qs(u.query), f"http://{self.headers.get('Host')}")
+                self.send_response(status)
+                self.send_header("content-type", ctype)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def _fx(self, name: str, term: str = "", base: str = "", js: bool = False, pdf: str = "") -> bytes:
+        t = json.dumps(term, ensure_ascii=False)[1:-1] if js else term.replace("<", "&lt;")
+        return self.fixtures[name].replace("{{TERM}}", t).replace("{{BASE}}", base).replace("{{PDF}}", pdf).encode("utf-8")
+
+    def route(self, path: str, q: Dict[str, List[str]], host: str):
+        html, js = "text/html; charset=utf-8", "application/json; charset=utf-8"
+        arg = lambda k: (q.get(k) or [""])[0]
+        if path.startswith("/vtex"):
+            if "/api/catalog_system/pub/products/search" in path:
+                return 200, js, self._fx("vtex_search.json", arg("ft"), js=True)
+            if path in ("/vtex", "/vtex/"): return 200, html, self._fx("home_vtex.html", base=f"{host}/vtex")
+        elif path.startswith("/magento"):
+            if path.startswith("/magento/catalogsearch/result"): return 200, html, self._fx("magento_search.html", arg("q"))
+            if path in ("/magento", "/magento/"): return 200, html, self._fx("home_magento.html", base=f"{host}/magento")
+        elif path.startswith("/woo"):
+            if path in ("/woo", "/woo/"):
+                if arg("s"): return 200, html, self._fx("woo_search.html", arg("s"), base=f"{host}/woo")
+                return 200, html, self._fx("home_woo.html", base=f"{host}/woo")
+        elif path.startswith(("/folletos", "/escaneados")):
+            root = path.strip("/").split("/")[0]
+            if path.rstrip("/") == f"/{root}":
+                name = "ofertas.pdf" if root == "folletos" else "escaneado.pdf"
+                return 200, html, self._fx("home_brochures.html", base=f"{host}/{root}", pdf=name)
+            pdf = self.pdfs.get(path.rsplit("/", 1)[-1])
+            if pdf: return 200, "application/pdf", pdf
+        return 404, html, b"<html><body>404</body></html>"
+
+    def start(self) -> "FixtureServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
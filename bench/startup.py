@@ -0,0 +1,127 @@
+# bench/startup.py
+# Costo de arranque: tiempo de import y RSS de la app (liviana, tras /api/health y con
+# las dependencias de scraping cargadas) y, si gunicorn está instalado, tiempo hasta
+# responder y memoria por worker (RSS / PSS / compartida) con y sin GUNICORN_PRELOAD.
+#
+#   python bench/startup.py                 # imports + gunicorn con 3 workers
+#   python bench/startup.py --workers 4 --skip-gunicorn
+import os, sys, json, time, socket, argparse, subprocess, urllib.request
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import sys, time, json
+sys.path.insert(0, %(root)r)
+def rss():
+    for l in open("/proc/self/status"):
+        if l.startswith("VmRSS:"): return int(l.split()[1]) / 1024
+out = {"python": rss()}
+t = time.perf_counter(); import app; out["import_ms"] = (time.perf_counter() - t) * 1000; out["app"] = rss()
+t = time.perf_counter(); app.app.test_client().get("/api/health"); out["health_ms"] = (time.perf_counter() - t) * 1000; out["health"] = rss()
+t = time.perf_counter(); missing = app.warm_imports(); out["warm_ms"] = (time.perf_counter() - t) * 1000; out["warm"] = rss()
+out["missing"] = missing
+print(json.dumps(out))
+"""
+
+def probe_imports(runs: int) -> Dict:
+    """Promedio de `runs` procesos nuevos (el primero calienta la caché de disco y se descarta)."""
+    res: List[Dict] = []
+    env = {**os.environ, "SCRAPER_DATA_DIR": os.environ.get("SCRAPER_DATA_DIR", "/tmp/bench-startup")}
+    for i in range(runs + 1):
+        p = subprocess.run([sys.executable, "-c", PROBE % {"root": str(ROOT)}], capture_output=True, text=True, env=env)
+        if p.returncode != 0: raise RuntimeError(p.stderr.strip().splitlines()[-1])
+        if i: res.append(json.loads(p.stdout))
+    avg = {k: sum(r[k] for r in res) / len(res) for k in res[0] if k != "missing"}
+    avg["missing"] = res[0]["missing"]
+    return avg
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def _children(pid: int) -> List[int]:
+    out = []
+    for d in Path("/proc").iterdir():
+        if not d.name.isdigit(): continue
+        try: stat = (d / "stat").read_text()
+        except OSError: continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid: out.append(int(d.name))
+    return out
+
+def _mem(pid: int) -> Dict[str, float]:
+    """Rss, Pss y páginas compartidas (MB) desde smaps_rollup."""
+    vals = {}
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            k, _, rest = line.partition(":")
+            if k in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"): vals[k] = int(rest.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {"rss": vals.get("Rss", 0), "pss": vals.get("Pss", 0), "shared": vals.get("Shared_Clean", 0) + vals.get("Shared_Dirty", 0)}
+
+def probe_gunicorn(preload: bool, workers: int, timeout: float = 60) -> Dict:
+    port = _free_port()
+    env = {**os.environ, "GUNICORN_PRELOAD": "1" if preload else "0", "WORKERS": str(workers), "THREADS": "4",
+           "GUNICORN_BIND": f"127.0.0.1:{port}", "SCRAPER_DATA_DIR": os.environ.get("SCRAPER_DATA_DIR", "/tmp/bench-startup")}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(ROOT / "gunicorn.conf.py"), "application:application"],
+                            cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        ready = None
+        while time.perf_counter() - t0 < timeout:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1).read()
+                ready = time.perf_counter() - t0
+                break
+            except OSError:
+                time.sleep(0.05)
+        if ready is None: raise RuntimeError("gunicorn no respondió")
+        # que todos los workers terminen de iniciar antes de medir
+        deadline = time.perf_counter() + timeout
+        while len(_children(proc.pid)) < workers and time.perf_counter() < deadline: time.sleep(0.05)
+        time.sleep(1.0)
+        kids = [_mem(pid) for pid in _children(proc.pid)]
+        master = _mem(proc.pid)
+        return {"preload": preload, "ready_s": ready, "master": master, "workers": kids,
+                "total_pss": master.get("pss", 0) + sum(k.get("pss", 0) for k in kids)}
+    finally:
+        proc.terminate()
+        try: proc.wait(10)
+        except subprocess.TimeoutExpired: proc.kill()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tiempo de arranque y memoria de la app / workers de gunicorn")
+    ap.add_argument("--runs", type=int, default=3, help="procesos para promediar los imports")
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--skip-gunicorn", action="store_true")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    imp = probe_imports(args.runs)
+    print(f"import app            {imp['import_ms']:7.0f} ms   RSS {imp['app']:6.1f} MB  (intérprete {imp['python']:.1f} MB)")
+    print(f"+ GET /api/health     {imp['health_ms']:7.0f} ms   RSS {imp['health']:6.1f} MB")
+    print(f"+ deps de scraping    {imp['warm_ms']:7.0f} ms   RSS {imp['warm']:6.1f} MB"
+          + (f"  (no disponibles: {', '.join(imp['missing'])})" if imp["missing"] else ""))
+    results = {"imports": imp, "gunicorn": []}
+
+    if not args.skip_gunicorn:
+        if find_spec("gunicorn") is None:
+            print("gunicorn no instalado: se omite la medición de workers", file=sys.stderr)
+        else:
+            print(f"\ngunicorn ({args.workers} workers)   listo s   master RSS   worker RSS   worker PSS   compartida   PSS total")
+            for preload in (False, True):
+                g = probe_gunicorn(preload, args.workers)
+                results["gunicorn"].append(g)
+                ws = g["workers"] or [{}]
+                avg = lambda k: sum(w.get(k, 0) for w in ws) / len(ws)
+                print(f"{'preload' if preload else 'lazy':<22}{g['ready_s']:8.2f}   {g['master'].get('rss', 0):9.1f}   "
+                      f"{avg('rss'):10.1f}   {avg('pss'):10.1f}   {avg('shared'):10.1f}   {g['total_pss']:9.1f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# breaker.py
+# Control de una ejecución por vendedor: circuit breaker ante fallas repetidas de red,
+# estrategias descartadas por el resto de la ejecución (p. ej. VTEX con 404 en la API
+# de catálogo) y presupuesto de tiempo, para acotar el peor caso de un lote.
+import time, threading
+from typing import Dict, Optional
+
+from settings import env_float, env_int
+
+BREAKER_FAILURES = env_int("BREAKER_FAILURES", 4)          # fallas seguidas que cortan al vendedor
+VENDOR_TIME_BUDGET = env_float("VENDOR_TIME_BUDGET", 900)  # s por vendedor y ejecución (0 = sin tope)
+GONE_STATUSES = (404, 405, 410, 501)                       # el endpoint de la estrategia no existe
+NOT_SEARCHED = "Sin buscar"                                # celda de un producto salteado por vendedor cortado
+
+class StrategyUnavailable(Exception):
+    """La estrategia no aplica a este vendedor (endpoint inexistente, respuesta de otro tipo)."""
+
+def http_status(e: BaseException) -> int:
+    resp = getattr(e, "response", None)
+    return getattr(resp, "status_code", 0) or 0
+
+def is_transport_error(e: BaseException) -> bool:
+    """Falla atribuible al sitio (caído, bloqueado, timeout), no a la estrategia."""
+    if isinstance(e, StrategyUnavailable) or str(e) == "cancelled": return False
+    code = http_status(e)
+    if code: return code not in GONE_STATUSES
+    import requests  # diferido: ingest.py importa este módulo sin cargar el cliente HTTP
+    return isinstance(e, (requests.RequestException, OSError)) or type(e).__module__.startswith("curl_cffi")
+
+class _VendorState:
+    __slots__ = ("started", "failures", "halted", "dead")
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.failures = 0
+        self.halted: Optional[str] = None
+        self.dead: Dict[str, str] = {}
+
+class RunGuard:
+    """Estado de una ejecución de scrape_all_vendors, compartido por los carriles de cada vendedor."""
+    def __init__(self, failures: int = BREAKER_FAILURES, budget: float = VENDOR_TIME_BUDGET, clock=time.monotonic):
+        self.failures = max(1, int(failures))
+        self.budget = float(budget or 0)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._vendors: Dict[str, _VendorState] = {}
+
+    def _state(self, vendor: str) -> _VendorState:
+        st = self._vendors.get(vendor)
+        if st is None: st = self._vendors[vendor] = _VendorState()
+        return st
+
+    def start(self, vendor: str):
+        """El presupuesto corre desde que arranca el primer carril del vendedor."""
+        with self._lock:
+            st = self._state(vendor)
+            if st.started is None: st.started = self.clock()
+
+    def halted(self, vendor: str) -> Optional[str]:
+        """Motivo por el que ya no se busca en el vendedor, o None."""
+        with self._lock:
+            st = self._state(vendor)
+            if st.halted is None and self.budget and st.started is not None and self.clock() - st.started >= self.budget:
+                st.halted = f"presupuesto de {self.budget:g}s agotado"
+            return st.halted
+
+    def skip(self, vendor: str, strategy: str) -> Optional[str]:
+        with self._lock:
+            return self._state(vendor).dead.get(strategy)
+
+    def ok(self, vendor: str):
+        with self._lock:
+            self._state(vendor).failures = 0
+
+    def failed(self, vendor: str, strategy: str, error: BaseException) -> Optional[str]:
+        """
+        Registra el error de una estrategia. Devuelve un mensaje si cambió el estado:
+        estrategia descartada (endpoint inexistente) o vendedor cortado (breaker abierto).
+        """
+        with self._lock:
+            st = self._state(vendor)
+            if isinstance(error, StrategyUnavailable) or http_status(error) in GONE_STATUSES:
+                reason = str(error) if isinstance(error, StrategyUnavailable) else f"HTTP {http_status(error)}"
+                if strategy not in st.dead:
+                    st.dead[strategy] = reason
+                    return f"{strategy} descartada en esta ejecución ({reason})"
+                return None
+            if not is_transport_error(error): return None
+            st.failures += 1
+            if st.halted is None and st.failures >= self.failures:
+                code = http_status(error)
+                st.halted = f"{st.failures} fallas seguidas (última: {f'HTTP {code}' if code else type(error).__name__})"
+                return f"vendedor cortado: {st.halted}"
+            return None
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {vn: {"halted": st.halted, "skipped": dict(st.dead)}
+                    for vn, st in sorted(self._vendors.items()) if st.halted or st.dead}
@@ -0,0 +1,257 @@
+# brochures.py
+# Índice de folletos PDF por vendedor: se descubren y descargan una vez, el texto
+# (pdfminer/OCR) se guarda en disco por hash de contenido y las búsquedas de términos
+# se resuelven en memoria sobre un índice de tokens y posiciones de precios. Los PDF
+# escaneados se reconocen página a página solo hasta donde haga falta.
+import re, json, time, hashlib, threading
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from settings import DATA_DIR, env_int
+from ocr import HAVE_PDFIUM, iter_ocr_pages, page_count
+from matching import TermMatcher, fold
+
+DISCOVERY_TTL = env_int("BROCHURE_DISCOVERY_TTL", 6 * 3600)  # re-descubrir PDFs de un vendedor
+CHECK_TTL = env_int("BROCHURE_CHECK_TTL", 3600)              # revalidar (ETag/hash) un PDF
+MAX_INDEXES = env_int("BROCHURE_MAX_INDEXES", 64)             # índices de texto en memoria (LRU)
+MAX_AGE = env_int("BROCHURE_MAX_AGE_DAYS", 30) * 86400         # PDF/texto sin usar por más de esto se borran
+MAX_BYTES = env_int("BROCHURE_MAX_MB", 500) * 1024 * 1024      # tope en disco (LRU por documento)
+PRUNE_EVERY = 20                                              # documentos nuevos entre podas
+WINDOW = 200
+
+LANDING_PATHS = ["ofertas","oferta","promociones","folleto","folletos","catalogo","catalogos"]
+
+def _slug(s: str) -> str:
+    return hashlib.sha1((s or "").encode("utf-8")).hexdigest()[:16]
+
+class TextIndex:
+    """Tokens (separados por espacios, en minúscula y sin tildes) → offsets, y posiciones de precios."""
+    def __init__(self, text: str, price_pat: re.Pattern):
+        self.text = text or ""
+        folded = fold(self.text)
+        self.prices = [(m.start(), m.end(), m.group(0)) for m in price_pat.finditer(self.text)]
+        self._starts = [p[0] for p in self.prices]
+        self._longest = max((e - s for s, e, _ in self.prices), default=0)
+        self.tokens: Dict[str, List[int]] = {}
+        for m in re.finditer(r"\S+", folded):
+            self.tokens.setdefault(m.group(0), []).append(m.start())
+        self._expand: Dict[str, List[int]] = {}
+
+    def positions(self, tok: str) -> List[int]:
+        """Offsets de todas las apariciones de tok como subcadena de algún token (como `tok in texto`)."""
+        hit = self._expand.get(tok)
+        if hit is None:
+            pos = []
+            for vt, offs in self.tokens.items():
+                i = vt.find(tok)
+                while i >= 0:
+                    pos.extend(o + i for o in offs)
+                    i = vt.find(tok, i + 1)
+            hit = self._expand[tok] = sorted(pos)
+        return hit
+
+    def _near(self, tok: str, lo: int, hi: int) -> bool:
+        pos = self.positions(tok)
+        k = bisect_left(pos, lo)
+        return k < len(pos) and pos[k] + len(tok) <= hi
+
+    def find_price(self, variants: Union[TermMatcher, Sequence[str]]) -> Optional[str]:
+        """Primer precio con todos los tokens de alguna variante a ±WINDOW caracteres."""
+        if not isinstance(variants, TermMatcher): variants = TermMatcher(variants)
+        toks = variants.variants
+        if not toks or not self.prices: return None
+        toks = [ts for ts in toks if all(self.positions(t) for t in ts)]
+        if not toks: return None
+        # candidatos: solo los precios cerca de alguna aparición del token más raro de cada
+        # variante, en vez de revisar los miles de precios de un folleto
+        cands = set()
+        for ts in toks:
+            rare = min(ts, key=lambda t: len(self.positions(t)))
+            for pos in self.positions(rare):
+                a = bisect_left(self._starts, pos + len(rare) - WINDOW - self._longest)
+                b = bisect_left(self._starts, pos + WINDOW + 1)
+                cands.update(range(a, b))
+        for k in sorted(cands):
+            start, end, raw = self.prices[k]
+            lo, hi = max(0, start - WINDOW), end + WINDOW
+            if any(all(self._near(t, lo, hi) for t in ts) for ts in toks):
+                return raw
+        return None
+
+class BrochureIndex:
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root
+        self._lock = threading.Lock()
+        self._vendor_lock: Dict[str, threading.Lock] = {}
+        self._indexes: "OrderedDict[str, TextIndex]" = OrderedDict()
+        self._stored = 0
+
+    def _dir(self) -> Path:
+        if self.root is None: self.root = DATA_DIR / "brochures"
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root
+
+    def _read_json(self, path: Path) -> dict:
+        try: return json.loads(path.read_text(encoding="utf-8"))
+        except Exception: return {}
+
+    def _write_json(self, path: Path, data: dict):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._vendor_lock.setdefault(key, threading.Lock())
+
+    # ---------- poda del directorio ----------
+    def _touch(self, sha: str):
+        """Marca como usado el documento (su PDF, texto y estado de OCR) para la poda LRU."""
+        for p in self._dir().glob(f"{sha}.*"):
+            try: p.touch()
+            except OSError: pass
+
+    def prune(self, max_age: Optional[float] = None, max_bytes: Optional[int] = None, keep: Optional[str] = None) -> int:
+        """
+        Borra documentos (PDF + texto + OCR, juntos por hash) sin uso en max_age y, si el
+        directorio sigue pasando max_bytes, los menos usados. Los metadatos vencidos
+        también se van; un documento podado se vuelve a bajar en la próxima revalidación.
+        """
+        max_age = MAX_AGE if max_age is None else max_age
+        max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        now, docs, removed = time.time(), {}, 0
+        for p in self._dir().iterdir():
+            try: st = p.stat()
+            except OSError: continue
+            key = p.name.split(".", 1)[0]
+            if key.startswith(("pdf-", "vendor-")):
+                if now - st.st_mtime > max_age:
+                    p.unlink(missing_ok=True); removed += 1
+                continue
+            used, size, files = docs.get(key, (0.0, 0, []))
+            docs[key] = (max(used, st.st_mtime), size + st.st_size, files + [p])
+        total = sum(size for _, size, _ in docs.values())
+        for key, (used, size, files) in sorted(docs.items(), key=lambda kv: kv[1][0]):
+            if key == keep or (now - used <= max_age and total <= max_bytes): continue
+            for p in files: p.unlink(missing_ok=True)
+            total -= size; removed += 1
+            with self._lock: self._indexes.pop(key, None)
+        return removed
+
+    # ---------- descubrimiento de PDFs por vendedor ----------
+    def pdf_urls(self, base: str, client, extract_links: Callable[[str, str], List[str]], log) -> List[str]:
+        path = self._dir() / f"vendor-{_slug(base)}.json"
+        with self._lock_for("v:" + base):
+            meta = self._read_json(path)
+            if meta and time.time() - meta.get("discovered_at", 0) < DISCOVERY_TTL:
+                return meta.get("pdfs", [])
+            pdfs: List[str] = []
+            for u in [base] + [f"{base.rstrip('/')}/{p}" for p in LANDING_PATHS]:
+                try:
+                    pdfs.extend(extract_links(client.get(u).text, base))
+                except Exception as e:
+                    if str(e) == "cancelled": raise
+                    log(f"Folleto error {u}: {e}")
+            pdfs = list(dict.fromkeys(pdfs))
+            log(f"Folletos: {len(pdfs)} PDF(s) descubiertos en {base}")
+            self._write_json(path, {"base": base, "discovered_at": time.time(), "pdfs": pdfs})
+            return pdfs
+
+    # ---------- documento: descarga condicional + texto por hash ----------
+    def _document(self, url: str, client, to_text: Callable[[bytes, str], str], log):
+        """(sha256, escaneado). Descarga condicional; el texto pdfminer se extrae una vez por hash."""
+        d = self._dir()
+        path = d / f"pdf-{_slug(url)}.json"
+        with self._lock_for("u:" + url):
+            meta = self._read_json(path)
+            sha = meta.get("sha256")
+            ready = lambda h: (d / f"{h}.txt").exists() or (d / f"{h}.ocr.json").exists()
+            fresh = sha and time.time() - meta.get("checked_at", 0) < CHECK_TTL and ready(sha)
+            if not fresh:
+                hdr = {}
+                if sha and meta.get("etag"): hdr["If-None-Match"] = meta["etag"]
+                if sha and meta.get("last_modified"): hdr["If-Modified-Since"] = meta["last_modified"]
+                r = client.get(url, timeout=45, headers=hdr or None)
+                if r.status_code == 304 and not ready(sha):
+                    # el texto se podó (o nunca se guardó): sin validadores para recibir el cuerpo
+                    r = client.get(url, timeout=45)
+                if r.status_code == 304:
+                    log(f"PDF sin cambios (304) {url}")
+                    self._touch(sha)
+                else:
+                    content = r.content
+                    sha = hashlib.sha256(content).hexdigest()
+                    pdf_path = d / f"{sha}.pdf"
+                    if not pdf_path.exists(): pdf_path.write_bytes(content)
+                    if not ready(sha):
+                        txt = to_text(content, url)
+                        total = None
+                        if len(txt) < 200 and HAVE_PDFIUM:
+                            try: total = page_count(str(pdf_path))
+                            except Exception as e:
+                                # no es un PDF (página de error, HTML): queda como texto vacío hasta
+                                # la próxima revalidación, en vez de bajarlo en cada búsqueda
+                                log(f"Folleto ilegible {url}: {e}")
+                        if total is not None:
+                            # escaneado: el OCR se hace por página y bajo demanda (ver find_price)
+                            self._write_json(d / f"{sha}.ocr.json", {"pages": [], "total": total})
+                        else:
+                            (d / f"{sha}.txt").write_text(txt, encoding="utf-8")
+                        self._stored += 1
+                        if self._stored % PRUNE_EVERY == 0: self.prune(keep=sha)
+                    else:
+                        self._touch(sha)
+                    meta.update({"etag": r.headers.get("etag"), "last_modified": r.headers.get("last-modified")})
+                meta.update({"url": url, "sha256": sha, "checked_at": time.time()})
+                self._write_json(path, meta)
+        return sha, not (d / f"{sha}.txt").exists()
+
+    def find_price(self, url: str, client, variants: Union[TermMatcher, Sequence[str]], to_text: Callable[[bytes, str], str],
+                   price_pat: re.Pattern, log) -> Optional[str]:
+        sha, scanned = self._document(url, client, to_text, log)
+        if not isinstance(variants, TermMatcher): variants = TermMatcher(variants)
+        if not scanned:
+            return self._load_index(sha, price_pat).find_price(variants)
+        # folleto escaneado: primero las páginas ya reconocidas, luego OCR del resto con corte
+        # en la primera página que contenga el término; lo reconocido queda para otros términos
+        d = self._dir()
+        state_path = d / f"{sha}.ocr.json"
+        with self._lock_for("o:" + sha):
+            state = self._read_json(state_path)
+            pages: List[str] = state.get("pages", [])
+            if pages:
+                hit = TextIndex("\n".join(pages), price_pat).find_price(variants)
+                if hit: return hit
+            for i, txt in iter_ocr_pages(str(d / f"{sha}.pdf"), start=len(pages)):
+                pages.append(txt)
+                self._write_json(state_path, {"pages": pages, "total": state.get("total", 0)})
+                hit = TextIndex(txt, price_pat).find_price(variants)
+                if hit:
+                    log(f"OCR: término en página {i + 1} {url}")
+                    return hit
+            total = state.get("total", 0)
+            if len(pages) < total:
+                # cortado por OCR_MAX_PAGES o sin tesseract: no es el texto final del documento
+                log(f"OCR parcial ({len(pages)}/{total} páginas) {url}")
+                self._write_json(state_path, {"pages": pages, "total": total, "partial": True})
+                return None
+            log(f"OCR completo ({len(pages)} páginas) {url}")
+            (d / f"{sha}.txt").write_text("\n".join(pages), encoding="utf-8")
+        return None
+
+    def _load_index(self, sha: str, price_pat: re.Pattern) -> TextIndex:
+        with self._lock:
+            idx = self._indexes.get(sha)
+            if idx is not None:
+                self._indexes.move_to_end(sha)
+                return idx
+        text = (self._dir() / f"{sha}.txt").read_text(encoding="utf-8")
+        idx = TextIndex(text, price_pat)
+        with self._lock:
+            self._indexes[sha] = idx
+            while len(self._indexes) > MAX_INDEXES: self._indexes.popitem(last=False)
+        return idx
+
+BROCHURES = BrochureIndex()
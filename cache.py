@@ -0,0 +1,93 @@
+# cache.py
+# Caché persistente (SQLite) de resultados por (vendedor, término normalizado, estrategia).
+import re, time, sqlite3, threading, unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+from settings import data_path, env_int
+
+CACHE_MODES = ("use", "bypass", "refresh")  # use: lee y escribe; bypass: ni lee ni escribe; refresh: solo escribe
+
+def normalize_term(term: str) -> str:
+    t = unicodedata.normalize("NFKD", term or "")
+    t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", t).strip().lower()
+
+class ResultCache:
+    """
+    Guarda precios encontrados y también misses ("ND") con TTL distinto.
+    Expulsión LRU por last_used cuando se supera max_entries.
+    """
+    def __init__(self, path: Optional[Path] = None, ttl_hit: Optional[int] = None,
+                 ttl_miss: Optional[int] = None, max_entries: Optional[int] = None):
+        self.path = path
+        self.ttl_hit = ttl_hit if ttl_hit is not None else env_int("CACHE_TTL_HIT", 6 * 3600)
+        self.ttl_miss = ttl_miss if ttl_miss is not None else env_int("CACHE_TTL_MISS", 3600)
+        self.max_entries = max_entries if max_entries is not None else env_int("CACHE_MAX_ENTRIES", 200_000)
+        self._ready = False
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("results_cache.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                    vendor TEXT NOT NULL, term TEXT NOT NULL, strategy TEXT NOT NULL,
+                    price_txt TEXT, price_num TEXT, created REAL NOT NULL, expires REAL NOT NULL,
+                    last_used REAL NOT NULL, PRIMARY KEY (vendor, term, strategy))""")
+                conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results(last_used)")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def get(self, vendor: str, term: str, strategy: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(txt, num) si hay entrada vigente — (None, None) es un ND cacheado —; None si no hay."""
+        now = time.time()
+        key = (vendor, normalize_term(term), strategy)
+        with self._conn() as conn:
+            row = conn.execute("SELECT price_txt, price_num, expires FROM results WHERE vendor=? AND term=? AND strategy=?", key).fetchone()
+            if not row or row[2] < now: return None
+            conn.execute("UPDATE results SET last_used=? WHERE vendor=? AND term=? AND strategy=?", (now,) + key)
+        return row[0], row[1]
+
+    def put(self, vendor: str, term: str, strategy: str, price_txt: Optional[str], price_num: Optional[str]):
+        now = time.time()
+        ttl = self.ttl_hit if (price_txt and price_num) else self.ttl_miss
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?)",
+                         (vendor, normalize_term(term), strategy, price_txt or None, price_num or None, now, now + ttl, now))
+            self._puts += 1
+            if self._puts % 100 == 0: self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+        n = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if n > self.max_entries:
+            conn.execute("DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_used ASC LIMIT ?)", (n - self.max_entries,))
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._conn() as conn:
+            total, hits, live = conn.execute(
+                "SELECT COUNT(*), SUM(price_num IS NOT NULL), SUM(expires >= ?) FROM results", (now,)).fetchone()
+        return {"entries": total, "prices": hits or 0, "nd": (total or 0) - (hits or 0), "live": live or 0,
+                "ttl_hit": self.ttl_hit, "ttl_miss": self.ttl_miss, "max_entries": self.max_entries}
+
+    def clear(self, vendor: Optional[str] = None):
+        with self._conn() as conn:
+            if vendor: conn.execute("DELETE FROM results WHERE vendor=?", (vendor,))
+            else: conn.execute("DELETE FROM results")
+
+RESULT_CACHE = ResultCache()
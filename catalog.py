@@ -0,0 +1,187 @@
+# catalog.py
+# Instantáneas locales del catálogo de vendedores (VTEX/Magento) para responder precios
+# sin buscar término por término. El recorrido lo hace PriceScraper.sync_catalog; acá
+# se guardan los ítems (solo se reescriben los que cambiaron, por hash) y se indexan
+# por EAN y modelo.
+#
+#   python catalog.py sync [--vendor Nombre[=url]] [--category /ruta] [--force]
+#   python catalog.py stats
+import os, re, sys, json, time, hashlib, sqlite3, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from settings import data_path, env_int
+
+SYNC_INTERVAL = env_int("CATALOG_SYNC_INTERVAL", 20 * 3600)  # no re-sincronizar antes (salvo --force)
+MAX_AGE = env_int("CATALOG_MAX_AGE", 36 * 3600)              # instantánea más vieja: no se usa
+# vendedores a sincronizar y categorías por vendedor, p. ej. {"Frávega": ["/heladeras"], "Carrefour": []}
+CATALOG_VENDORS = json.loads(os.getenv("CATALOG_VENDORS", "{}") or "{}")
+
+def alnum(x) -> str:
+    return re.sub(r"[^a-z0-9]", "", ("" if x is None else str(x)).lower())
+
+def model_keys(*texts) -> List[str]:
+    """Claves de modelo: cada texto completo y las palabras con letras y dígitos (≥ 4 caracteres)."""
+    keys = []
+    for t in texts:
+        k = alnum(t)
+        if 4 <= len(k) <= 40: keys.append(k)
+        for w in re.split(r"[\s,;()/|]+", str(t or "")):
+            k = alnum(w)
+            if len(k) >= 4 and re.search(r"\d", k) and re.search(r"[a-z]", k): keys.append(k)
+    return list(dict.fromkeys(keys))
+
+class CatalogStore:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("catalog.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS items (
+                    vendor TEXT NOT NULL, sku TEXT NOT NULL, ean TEXT, brand TEXT, model TEXT, title TEXT,
+                    price TEXT, hash TEXT NOT NULL, seen_at REAL NOT NULL, changed_at REAL NOT NULL,
+                    PRIMARY KEY (vendor, sku))""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS item_keys (
+                    vendor TEXT NOT NULL, key TEXT NOT NULL, sku TEXT NOT NULL, PRIMARY KEY (vendor, key, sku))""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS syncs (
+                    vendor TEXT PRIMARY KEY, base TEXT, platform TEXT, started REAL, finished REAL,
+                    status TEXT, items INTEGER, changed INTEGER, removed INTEGER, error TEXT, ok_at REAL)""")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    # ---------- escritura (sincronización) ----------
+    def begin(self, vendor: str, base: str, platform: str) -> float:
+        started = time.time()
+        with self._conn() as conn:
+            conn.execute("""INSERT INTO syncs (vendor, base, platform, started, status) VALUES (?,?,?,?,'running')
+                ON CONFLICT(vendor) DO UPDATE SET base=excluded.base, platform=excluded.platform,
+                started=excluded.started, status='running', error=NULL""", (vendor, base, platform, started))
+        return started
+
+    def upsert(self, vendor: str, items: Iterable[Dict]) -> int:
+        """Guarda ítems {sku, ean, brand, model, title, price, keys}; devuelve cuántos cambiaron."""
+        now = time.time()
+        changed = 0
+        with self._conn() as conn:
+            for it in items:
+                fields = (it.get("ean") or None, it.get("brand") or None, it.get("model") or None,
+                          it.get("title") or None, it.get("price") or None)
+                h = hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+                row = conn.execute("SELECT hash FROM items WHERE vendor=? AND sku=?", (vendor, it["sku"])).fetchone()
+                if row and row[0] == h:
+                    conn.execute("UPDATE items SET seen_at=? WHERE vendor=? AND sku=?", (now, vendor, it["sku"]))
+                    continue
+                changed += 1
+                conn.execute("INSERT OR REPLACE INTO items VALUES (?,?,?,?,?,?,?,?,?,?)",
+                             (vendor, it["sku"], *fields, h, now, now))
+                conn.execute("DELETE FROM item_keys WHERE vendor=? AND sku=?", (vendor, it["sku"]))
+                keys = set(it.get("keys") or [])
+                if it.get("ean"): keys.add(re.sub(r"\D", "", it["ean"]))
+                conn.executemany("INSERT OR IGNORE INTO item_keys VALUES (?,?,?)",
+                                 [(vendor, k, it["sku"]) for k in keys if k])
+        return changed
+
+    def finish(self, vendor: str, started: float, status: str, items: int = 0, changed: int = 0,
+               error: Optional[str] = None, complete: bool = True):
+        """Cierra la sincronización; si recorrió todo, borra lo que ya no está publicado."""
+        removed = 0
+        with self._conn() as conn:
+            if status == "done" and complete:
+                gone = [r[0] for r in conn.execute("SELECT sku FROM items WHERE vendor=? AND seen_at<?", (vendor, started))]
+                for sku in gone:
+                    conn.execute("DELETE FROM item_keys WHERE vendor=? AND sku=?", (vendor, sku))
+                    conn.execute("DELETE FROM items WHERE vendor=? AND sku=?", (vendor, sku))
+                removed = len(gone)
+            now = time.time()
+            conn.execute("""UPDATE syncs SET finished=?, status=?, items=?, changed=?, removed=?, error=?,
+                ok_at=CASE WHEN ? THEN ? ELSE ok_at END WHERE vendor=?""",
+                         (now, status, items, changed, removed, error, status == "done", now, vendor))
+        return removed
+
+    # ---------- lectura ----------
+    def last_sync(self, vendor: str) -> Optional[Dict]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT vendor, base, platform, started, finished, status, items, changed, removed, error, ok_at "
+                               "FROM syncs WHERE vendor=?", (vendor,)).fetchone()
+        keys = ("vendor", "base", "platform", "started", "finished", "status", "items", "changed", "removed", "error", "ok_at")
+        return dict(zip(keys, row)) if row else None
+
+    def is_fresh(self, vendor: str, max_age: int = MAX_AGE) -> bool:
+        last = self.last_sync(vendor)
+        # vale la última sincronización completa, aunque haya otra en curso o una posterior fallida
+        return bool(last and last["ok_at"] and time.time() - last["ok_at"] < max_age)
+
+    def lookup(self, vendor: str, ean: str = "", model: str = "") -> Optional[Tuple[str, Dict]]:
+        """(precio plano, ítem) por EAN y luego por modelo; None si no hay una coincidencia inequívoca."""
+        cands = [re.sub(r"\D", "", ean or "")]
+        mk = alnum(model)
+        if len(mk) >= 4: cands.append(mk)
+        with self._conn() as conn:
+            for key in cands:
+                if not key: continue
+                rows = conn.execute("""SELECT i.sku, i.ean, i.brand, i.model, i.title, i.price, i.seen_at FROM item_keys k
+                    JOIN items i ON i.vendor=k.vendor AND i.sku=k.sku WHERE k.vendor=? AND k.key=? AND i.price IS NOT NULL""",
+                    (vendor, key)).fetchall()
+                if not rows: continue
+                if len({r[5] for r in rows}) > 1: return None  # mismo modelo con precios distintos: buscar en vivo
+                r = rows[0]
+                return r[5], dict(zip(("sku", "ean", "brand", "model", "title", "price", "seen_at"), r))
+        return None
+
+    def stats(self) -> List[Dict]:
+        with self._conn() as conn:
+            vendors = [r[0] for r in conn.execute("SELECT vendor FROM syncs ORDER BY vendor")]
+        return [self.last_sync(v) for v in vendors]
+
+CATALOG = CatalogStore()
+
+# ---------------- CLI (cron) ----------------
+def _cli_vendors(args: List[str]) -> Dict[str, str]:
+    from app import request_vendors
+    known = request_vendors({})
+    wanted = [a.split("=", 1) for a in args]
+    if not wanted:
+        return {n: known.get(n, "") for n in CATALOG_VENDORS} if CATALOG_VENDORS else known
+    return {w[0]: (w[1] if len(w) > 1 else known.get(w[0], "")) for w in wanted}
+
+def main(argv: List[str]) -> int:
+    cmd = argv[0] if argv else "stats"
+    if cmd == "stats":
+        print(json.dumps(CATALOG.stats(), ensure_ascii=False, indent=2)); return 0
+    if cmd != "sync":
+        print("uso: python catalog.py sync [--vendor Nombre[=url]] [--category /ruta] [--force] | stats"); return 2
+    vendors, cats, force = [], [], False
+    it = iter(argv[1:])
+    for a in it:
+        if a == "--vendor": vendors.append(next(it, ""))
+        elif a == "--category": cats.append(next(it, ""))
+        elif a == "--force": force = True
+    from scraper import PriceScraper
+    scraper = PriceScraper(delay_range=(1, 2))
+    failed = 0
+    for name, url in _cli_vendors([v for v in vendors if v]).items():
+        if not url:
+            print(f"[{name}] sin URL, se omite"); continue
+        res = scraper.sync_catalog(name, url, log=print, categories=cats or CATALOG_VENDORS.get(name), force=force)
+        print(json.dumps(res, ensure_ascii=False))
+        failed += res.get("status") == "error"
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
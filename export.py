@@ -0,0 +1,163 @@
+# export.py
+# Exportación de resultados: CSV y XLSX en streaming (sin armar el archivo completo en
+# memoria) y escritura a Google Sheets por lotes con reintentos ante cuotas.
+import os, io, csv, json, time, base64, random, tempfile
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from settings import BASE_DIR, env_int
+
+# Opcionales: openpyxl para XLSX, gspread para Google Sheets (se importan al exportar)
+HAVE_OPENPYXL = find_spec("openpyxl") is not None
+HAVE_GSPREAD = find_spec("gspread") is not None
+
+SHEETS_BATCH = env_int("SHEETS_BATCH_ROWS", 1000)   # filas por llamada values.update/append
+SHEETS_MAX_RETRIES = env_int("SHEETS_MAX_RETRIES", 6)
+EXPORT_FORMATS = ("csv", "xlsx")
+
+# ---------------- filas ----------------
+def columns_for(rows: Sequence[Dict], preferred: Optional[Sequence[str]] = None) -> List[str]:
+    """Columnas en orden de aparición (o `preferred` primero), unión de todas las filas."""
+    cols = list(preferred or [])
+    for r in rows:
+        for k in r:
+            if k not in cols: cols.append(k)
+    return cols
+
+def rows_from_job(store, job_id: str, page: int = 2000) -> List[Dict]:
+    """Reconstruye las filas de un trabajo a partir de sus eventos 'row' (una fila por producto)."""
+    rows: Dict[int, Dict] = {}
+    after = 0
+    while True:
+        batch = store.events(job_id, after, page)
+        for seq, kind, data in batch:
+            after = seq
+            if kind == "row": rows.setdefault(data["index"], {}).update(data["row"])
+        if len(batch) < page: break
+    return [rows[i] for i in sorted(rows)]
+
+def _cell(v) -> str:
+    return "" if v is None else str(v)
+
+# ---------------- CSV / XLSX ----------------
+def iter_csv(rows: Iterable[Dict], columns: Sequence[str], chunk_rows: int = 500) -> Iterator[str]:
+    """CSV en trozos de chunk_rows filas; con BOM para que Excel lo abra en UTF-8."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")
+    w.writerow(columns)
+    for n, r in enumerate(rows, 1):
+        w.writerow([_cell(r.get(c)) for c in columns])
+        if n % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def iter_xlsx(rows: Iterable[Dict], columns: Sequence[str], sheet_title: str = "Precios", chunk: int = 64 * 1024) -> Iterator[bytes]:
+    """XLSX con openpyxl en modo write_only (filas a disco) y luego el archivo en trozos."""
+    if not HAVE_OPENPYXL: raise RuntimeError("openpyxl no disponible")
+    from openpyxl import Workbook
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_title[:31])
+        ws.append(list(columns))
+        for r in rows:
+            ws.append([_num_or_text(r.get(c), c) for c in columns])
+        wb.save(path)
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk)
+                if not data: break
+                yield data
+    finally:
+        os.unlink(path)
+
+def _num_or_text(v, col: str):
+    # las columnas "(num)" van como número para poder ordenar y comparar en la planilla
+    if col.endswith(" (num)") and v not in (None, "") and str(v).isdigit(): return int(v)
+    return _cell(v)
+
+# ---------------- Google Sheets ----------------
+def _status(e: Exception) -> int:
+    resp = getattr(e, "response", None)
+    return getattr(resp, "status_code", 0) or 0
+
+def with_backoff(fn: Callable, retries: int = SHEETS_MAX_RETRIES, base: float = 1.0, sleep=time.sleep, log=None,
+                 idempotent: bool = True):
+    """
+    Reintenta fn() ante 429/5xx con espera exponencial y jitter (cuotas por minuto de la API).
+    Con idempotent=False (crear, agregar filas) solo ante 429: tras un 5xx la llamada puede
+    haberse aplicado y repetirla duplicaría la planilla o las filas.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            code = _status(e)
+            if attempt == retries or not (code == 429 or (idempotent and 500 <= code < 600)): raise
+            wait = min(64.0, base * 2 ** attempt) + random.uniform(0, 1)
+            if log: log(f"Sheets {code}: reintento en {wait:.1f}s")
+            sleep(wait)
+
+def _not_found():
+    """gspread.exceptions.SpreadsheetNotFound, o () sin gspread (el except no captura nada)."""
+    if not HAVE_GSPREAD: return ()
+    from gspread.exceptions import SpreadsheetNotFound
+    return SpreadsheetNotFound
+
+def google_client():
+    """Cliente gspread con GOOGLE_CREDENTIALS_BASE64 (JSON de cuenta de servicio) o credentials.json."""
+    if not HAVE_GSPREAD: raise RuntimeError("gspread no disponible")
+    import gspread
+    b64 = os.getenv("GOOGLE_CREDENTIALS_BASE64", "").strip()
+    if b64: return gspread.service_account_from_dict(json.loads(base64.b64decode(b64)))
+    path = os.getenv("GOOGLE_CREDENTIALS_FILE") or str(BASE_DIR / "credentials.json")
+    if not os.path.exists(path): raise RuntimeError("faltan credenciales de Google (GOOGLE_CREDENTIALS_BASE64 o credentials.json)")
+    return gspread.service_account(filename=path)
+
+def export_to_sheets(rows: Sequence[Dict], columns: Sequence[str], sheet_name: str, client=None,
+                     spreadsheet_id: Optional[str] = None, mode: str = "replace", batch: int = SHEETS_BATCH,
+                     sleep=time.sleep, log=None) -> Dict:
+    """
+    Escribe las filas en la primera hoja de la planilla (por id o por nombre; se crea si no
+    existe). mode="replace" limpia, dimensiona y escribe con values.update por bloques;
+    mode="append" agrega con values.append (encabezado solo si la planilla es nueva).
+    Cada llamada lleva `batch` filas; create/share/values.append no se reintentan ante 5xx.
+    """
+    client = client or google_client()
+    call = lambda fn: with_backoff(fn, sleep=sleep, log=log)
+    once = lambda fn: with_backoff(fn, sleep=sleep, log=log, idempotent=False)
+    created = False
+    if spreadsheet_id:
+        sh = call(lambda: client.open_by_key(spreadsheet_id))
+    else:
+        try: sh = call(lambda: client.open(sheet_name))
+        except _not_found():
+            sh = once(lambda: client.create(sheet_name))
+            created = True
+            share = os.getenv("SHEETS_SHARE_WITH", "").strip()
+            if share: once(lambda: sh.share(share, perm_type="user", role="writer"))
+    ws = sh.sheet1
+    title = ws.title.replace("'", "''")
+    values = [[_cell(r.get(c)) for c in columns] for r in rows]
+    requests_made = 0
+    if mode == "append":
+        if created: values.insert(0, list(columns))
+        for k in range(0, len(values), batch):
+            chunk = values[k:k + batch]
+            once(lambda: sh.values_append(f"'{title}'!A1", params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                                          body={"values": chunk}))
+            requests_made += 1
+    else:
+        values.insert(0, list(columns))
+        call(lambda: sh.values_clear(f"'{title}'"))
+        call(lambda: ws.resize(rows=max(len(values), 1), cols=max(len(columns), 1)))
+        requests_made += 2
+        for k in range(0, len(values), batch):
+            chunk = values[k:k + batch]
+            call(lambda: sh.values_update(f"'{title}'!A{k + 1}", params={"valueInputOption": "RAW"}, body={"values": chunk}))
+            requests_made += 1
+    return {"spreadsheet_id": getattr(sh, "id", None), "url": getattr(sh, "url", None),
+            "rows": len(rows), "requests": requests_made}
@@ -0,0 +1,46 @@
+# gunicorn.conf.py
+# Configuración de gunicorn (Procfile y Dockerfile). Por defecto cada worker arranca
+# liviano y carga pandas, bs4, pdfminer, etc. con su primer scraping. Con
+# GUNICORN_PRELOAD=1 la app y esas dependencias se importan una vez en el master y los
+# workers las comparten por copy-on-write: arrancan al instante y ocupan menos RSS.
+import gc, os, time
+
+bind = os.getenv("GUNICORN_BIND") or f"127.0.0.1:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WORKERS", "3"))
+threads = int(os.getenv("THREADS", "8"))
+timeout = int(os.getenv("TIMEOUT", "900"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") in ("1", "true", "yes")
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def when_ready(server):
+    # con preload la app ya está cargada en el master: se suman las dependencias pesadas
+    # y se congela el GC para que no ensucie (copie) las páginas compartidas con los workers
+    if not preload_app: return
+    t0 = time.perf_counter()
+    from app import warm_imports
+    missing = warm_imports()
+    gc.freeze()
+    server.log.info("preload: dependencias importadas en %.2fs, RSS master %.0f MB%s", time.perf_counter() - t0, _rss_mb(),
+                    f" (no disponibles: {', '.join(missing)})" if missing else "")
+
+def pre_fork(server, worker):
+    worker._forked_at = time.perf_counter()
+
+def post_fork(server, worker):
+    # lo que no debe heredarse del master (pools de conexiones, ejecutores) se recrea por pid;
+    # acá solo se fuerza el chequeo para no arrastrar nada abierto por warm_imports
+    from sessions import SESSION_POOL
+    SESSION_POOL._check_fork()
+
+def post_worker_init(worker):
+    started = getattr(worker, "_forked_at", None)
+    worker.log.info("worker %s listo en %.2fs, RSS %.0f MB", worker.pid,
+                    time.perf_counter() - started if started else 0.0, _rss_mb())
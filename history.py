@@ -0,0 +1,170 @@
+# history.py
+# Historial de precios append-only (SQLite): cada resultado de scraping queda como una
+# observación (producto, vendedor, precio, estrategia, momento). Una tabla `latest` con
+# el último precio por producto y vendedor permite detectar cambios al escribir y
+# responder "último precio", "cambios desde T" y "vendedor más barato" sin recorrer todo.
+import re, time, sqlite3, threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from settings import data_path, env_int
+from products import dedupe_key
+
+HISTORY_ENABLED = env_int("HISTORY_ENABLED", 1)                     # 0 = no registrar los scrapings
+KEEP_UNCHANGED_DAYS = env_int("HISTORY_KEEP_UNCHANGED_DAYS", 90)  # 0 = conservar todo
+PRUNE_EVERY = 1000  # observaciones entre podas
+
+def product_key(p: Dict) -> str:
+    """Misma identidad que la deduplicación de lotes: EAN, si no marca+modelo, si no el nombre."""
+    return dedupe_key(p)
+
+def parse_since(value) -> Optional[float]:
+    """Epoch en segundos o fecha ISO (2026-10-18 / 2026-10-18T12:00); None si no es interpretable."""
+    v = ("" if value is None else str(value)).strip()
+    if not v: return None
+    if re.fullmatch(r"\d+(\.\d+)?", v): return float(v)
+    try: return datetime.fromisoformat(v).timestamp()
+    except ValueError: return None
+
+def _int(price_num) -> Optional[int]:
+    s = re.sub(r"\D", "", str(price_num or ""))
+    return int(s) if s else None
+
+class PriceHistory:
+    def __init__(self, path: Optional[Path] = None, keep_unchanged_days: int = KEEP_UNCHANGED_DAYS):
+        self.path = path
+        self.keep_unchanged_days = keep_unchanged_days
+        self._ready = False
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("history.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS observations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, product_key TEXT NOT NULL, vendor TEXT NOT NULL,
+                    price INTEGER, price_txt TEXT, prev_price INTEGER, changed INTEGER NOT NULL,
+                    strategy TEXT, run_id TEXT, ts REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS obs_product ON observations(product_key, vendor, ts)")
+                conn.execute("CREATE INDEX IF NOT EXISTS obs_changes ON observations(ts) WHERE changed=1")
+                conn.execute("""CREATE TABLE IF NOT EXISTS products (
+                    product_key TEXT PRIMARY KEY, producto TEXT, marca TEXT, modelo TEXT, ean TEXT)""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS latest (
+                    product_key TEXT NOT NULL, vendor TEXT NOT NULL, price INTEGER, price_txt TEXT, strategy TEXT,
+                    since REAL NOT NULL, checked REAL NOT NULL, PRIMARY KEY (product_key, vendor))""")
+                conn.execute("CREATE INDEX IF NOT EXISTS latest_price ON latest(product_key, price)")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def record(self, product: Dict, vendor: str, price_txt: Optional[str], price_num, strategy: Optional[str] = None,
+               run_id: Optional[str] = None, ts: Optional[float] = None) -> bool:
+        """Agrega una observación (ND = precio None). Devuelve True si el precio cambió respecto del último."""
+        key = product_key(product)
+        price = _int(price_num)
+        ts = time.time() if ts is None else ts
+        with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO products VALUES (?,?,?,?,?)",
+                         (key, product.get("producto"), product.get("marca"), product.get("modelo"), product.get("ean")))
+            prev = conn.execute("SELECT price FROM latest WHERE product_key=? AND vendor=?", (key, vendor)).fetchone()
+            changed = prev is None or prev[0] != price
+            conn.execute("""INSERT INTO observations (product_key, vendor, price, price_txt, prev_price, changed, strategy, run_id, ts)
+                            VALUES (?,?,?,?,?,?,?,?,?)""",
+                         (key, vendor, price, price_txt if price is not None else None, prev[0] if prev else None,
+                          int(changed), strategy, run_id, ts))
+            if changed:
+                conn.execute("INSERT OR REPLACE INTO latest VALUES (?,?,?,?,?,?,?)",
+                             (key, vendor, price, price_txt if price is not None else None, strategy, ts, ts))
+            else:
+                conn.execute("UPDATE latest SET checked=?, strategy=COALESCE(?, strategy) WHERE product_key=? AND vendor=?",
+                             (ts, strategy, key, vendor))
+            self._writes += 1
+            if self.keep_unchanged_days and self._writes % PRUNE_EVERY == 0:
+                self._prune(conn, ts - self.keep_unchanged_days * 86400)
+        return changed
+
+    @staticmethod
+    def _prune(conn: sqlite3.Connection, cutoff: float):
+        # las observaciones sin cambio viejas no aportan a los deltas; los cambios se conservan
+        conn.execute("DELETE FROM observations WHERE changed=0 AND ts < ?", (cutoff,))
+
+    # ---------------- consultas ----------------
+    _LATEST_COLS = "l.product_key, p.producto, p.marca, p.modelo, p.ean, l.vendor, l.price, l.price_txt, l.strategy, l.since, l.checked"
+
+    @staticmethod
+    def _rows(cur, keys) -> List[Dict]:
+        return [dict(zip(keys, r)) for r in cur]
+
+    def latest(self, key: Optional[str] = None, vendor: Optional[str] = None, limit: int = 500, offset: int = 0) -> List[Dict]:
+        """Último precio conocido por producto y vendedor (ND incluidos, con price = None)."""
+        where, args = [], []
+        if key: where.append("l.product_key=?"); args.append(key)
+        if vendor: where.append("l.vendor=?"); args.append(vendor)
+        sql = (f"SELECT {self._LATEST_COLS} FROM latest l LEFT JOIN products p USING (product_key)"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY l.product_key, l.vendor LIMIT ? OFFSET ?")
+        keys = ("product_key", "producto", "marca", "modelo", "ean", "vendor", "price", "price_txt", "strategy", "since", "checked")
+        with self._conn() as conn:
+            return self._rows(conn.execute(sql, (*args, limit, offset)), keys)
+
+    def changes(self, since: Optional[float] = None, cursor: int = 0, vendor: Optional[str] = None, limit: int = 500) -> List[Dict]:
+        """
+        Cambios de precio (incluye aparecer/desaparecer: ND ↔ precio) en orden de llegada.
+        `cursor` es el id de la última observación recibida: sondear con el último id
+        devuelve solo lo nuevo.
+        """
+        where, args = ["o.changed=1", "o.id>?"], [cursor]
+        if since is not None: where.append("o.ts>=?"); args.append(since)
+        if vendor: where.append("o.vendor=?"); args.append(vendor)
+        sql = f"""SELECT o.id, o.product_key, p.producto, p.marca, p.modelo, p.ean, o.vendor, o.prev_price, o.price, o.price_txt,
+                         o.strategy, o.ts FROM observations o LEFT JOIN products p USING (product_key)
+                  WHERE {' AND '.join(where)} ORDER BY o.id LIMIT ?"""
+        keys = ("id", "product_key", "producto", "marca", "modelo", "ean", "vendor", "prev_price", "price", "price_txt", "strategy", "ts")
+        with self._conn() as conn:
+            return self._rows(conn.execute(sql, (*args, limit)), keys)
+
+    def cheapest(self, key: Optional[str] = None, limit: int = 500, offset: int = 0) -> List[Dict]:
+        """Vendedor con el menor último precio por producto (ignora ND) y cuántos vendedores lo tienen."""
+        where, args = ["price IS NOT NULL"], []
+        if key: where.append("product_key=?"); args.append(key)
+        # con MIN() SQLite devuelve las demás columnas de la fila mínima
+        sql = f"""SELECT c.product_key, p.producto, p.marca, p.modelo, p.ean, c.vendor, c.price, c.price_txt, c.since, c.vendors
+                  FROM (SELECT product_key, vendor, MIN(price) AS price, price_txt, since, COUNT(*) AS vendors
+                        FROM latest WHERE {' AND '.join(where)} GROUP BY product_key) c
+                  LEFT JOIN products p USING (product_key) ORDER BY c.product_key LIMIT ? OFFSET ?"""
+        keys = ("product_key", "producto", "marca", "modelo", "ean", "vendor", "price", "price_txt", "since", "vendors")
+        with self._conn() as conn:
+            return self._rows(conn.execute(sql, (*args, limit, offset)), keys)
+
+    def series(self, key: str, vendor: Optional[str] = None, since: Optional[float] = None, changes_only: bool = True,
+               limit: int = 2000) -> List[Dict]:
+        """Evolución de un producto (por defecto solo los cambios) por vendedor."""
+        where, args = ["product_key=?"], [key]
+        if vendor: where.append("vendor=?"); args.append(vendor)
+        if since is not None: where.append("ts>=?"); args.append(since)
+        if changes_only: where.append("changed=1")
+        sql = f"SELECT id, vendor, price, price_txt, prev_price, changed, strategy, run_id, ts FROM observations WHERE {' AND '.join(where)} ORDER BY vendor, ts LIMIT ?"
+        keys = ("id", "vendor", "price", "price_txt", "prev_price", "changed", "strategy", "run_id", "ts")
+        with self._conn() as conn:
+            return self._rows(conn.execute(sql, (*args, limit)), keys)
+
+    def stats(self) -> dict:
+        with self._conn() as conn:
+            n, ch, last = conn.execute("SELECT COUNT(*), COALESCE(SUM(changed), 0), MAX(id) FROM observations").fetchone()
+            products, pairs = conn.execute("SELECT COUNT(DISTINCT product_key), COUNT(*) FROM latest").fetchone()
+        return {"observations": n, "changes": ch, "cursor": last or 0, "products": products, "pairs": pairs}
+
+HISTORY = PriceHistory()
@@ -0,0 +1,146 @@
+# htmlparse.py
+# Backends de parseo HTML para la extracción desde "cards": selectolax (lexbor) o lxml
+# con selectores precompilados si están instalados; BeautifulSoup como respaldo.
+import os, re
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Sequence
+
+from metrics import stage
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAVE_SELECTOLAX = True
+except Exception:
+    HAVE_SELECTOLAX = False
+
+try:
+    from lxml import etree, html as lxml_html
+    HAVE_LXML = True
+except Exception:
+    HAVE_LXML = False
+
+def _spaces(txt: str) -> str:
+    return re.sub(r"\s+", " ", txt or "").strip()
+
+# ---------------- CSS → XPath (subconjunto usado por el scraper) ----------------
+_CSS_RE = re.compile(r"^([A-Za-z][\w-]*)?((?:\.[\w-]+)*)(?:\[([\w-]+)(?:\*=['\"]([^'\"]*)['\"](\s+i)?)?\])?$")
+_UP = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def css_to_xpath(sel: str, first: bool = False) -> str:
+    m = _CSS_RE.match(sel.strip())
+    if not m: raise ValueError(f"selector no soportado: {sel}")
+    tag, classes, attr, val, icase = m.groups()
+    conds = [f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes.split(".") if c]
+    if attr and val is None:
+        conds.append(f"@{attr}")
+    elif attr:
+        if icase: conds.append(f"contains(translate(@{attr}, '{_UP}', '{_UP.lower()}'), '{val.lower()}')")
+        else: conds.append(f"contains(@{attr}, '{val}')")
+    xp = ".//" + (tag or "*") + "".join(f"[{c}]" for c in conds)
+    return f"({xp})[1]" if first else xp
+
+# ---------------- Documentos ----------------
+class Doc(ABC):
+    """Interfaz mínima: nodos por selector, primer nodo por selector y texto normalizado."""
+    backend = "base"
+    @abstractmethod
+    def select(self, sel: str, node=None) -> List: ...
+    @abstractmethod
+    def select_one(self, sel: str, node=None): ...
+    @abstractmethod
+    def text(self, node=None) -> str: ...
+    @abstractmethod
+    def attr(self, node, name: str) -> Optional[str]: ...
+
+class SoupDoc(Doc):
+    backend = "bs4"
+    def __init__(self, html: str):
+        from bs4 import BeautifulSoup  # respaldo: solo se importa si no hay selectolax/lxml
+        self.soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html or "", "html.parser")
+    def select(self, sel, node=None): return (self.soup if node is None else node).select(sel)
+    def select_one(self, sel, node=None): return (self.soup if node is None else node).select_one(sel)
+    def text(self, node=None): return (self.soup if node is None else node).get_text(" ", strip=True)
+    def attr(self, node, name):
+        v = node.get(name) if node is not None else None
+        return " ".join(v) if isinstance(v, list) else v
+
+class LexborDoc(Doc):
+    backend = "selectolax"
+    def __init__(self, html: str):
+        self.tree = LexborHTMLParser(html or "")
+    def select(self, sel, node=None): return (self.tree if node is None else node).css(sel)
+    def select_one(self, sel, node=None): return (self.tree if node is None else node).css_first(sel)
+    def text(self, node=None):
+        n = node if node is not None else self.tree.root
+        return _spaces(n.text(separator=" ", strip=True)) if n is not None else ""
+    def attr(self, node, name): return node.attributes.get(name) if node is not None else None
+
+class LxmlDoc(Doc):
+    backend = "lxml"
+    _compiled = {}  # (selector, first) → XPath precompilado, compartido por todos los documentos
+
+    def __init__(self, html: str):
+        self.root = lxml_html.document_fromstring(html) if (html or "").strip() else lxml_html.fromstring("<html></html>")
+
+    @classmethod
+    def _xp(cls, sel: str, first: bool):
+        key = (sel, first)
+        xp = cls._compiled.get(key)
+        if xp is None: xp = cls._compiled[key] = etree.XPath(css_to_xpath(sel, first))
+        return xp
+
+    def select(self, sel, node=None): return self._xp(sel, False)(node if node is not None else self.root)
+    def select_one(self, sel, node=None):
+        res = self._xp(sel, True)(node if node is not None else self.root)
+        return res[0] if res else None
+    _text_xp = etree.XPath(".//text()") if HAVE_LXML else None
+    def text(self, node=None):
+        n = node if node is not None else self.root
+        return " ".join(t.strip() for t in self._text_xp(n) if t.strip())
+    def attr(self, node, name): return node.get(name) if node is not None else None
+
+def _pick_backend() -> str:
+    want = os.getenv("HTML_PARSER", "").strip().lower()
+    available = {"selectolax": HAVE_SELECTOLAX, "lxml": HAVE_LXML, "bs4": True}
+    if want in available and available[want]: return want
+    return "selectolax" if HAVE_SELECTOLAX else ("lxml" if HAVE_LXML else "bs4")
+
+BACKEND = _pick_backend()
+_DOCS = {"selectolax": LexborDoc if HAVE_SELECTOLAX else None, "lxml": LxmlDoc if HAVE_LXML else None, "bs4": SoupDoc}
+
+def parse_html(html: str, backend: Optional[str] = None) -> Doc:
+    cls = _DOCS.get(backend or BACKEND) or SoupDoc
+    with stage("parse"):
+        try:
+            return cls(html)
+        except Exception:
+            return SoupDoc(html)  # HTML que el parser rápido no acepta
+
+# ---------------- Extracción en una pasada ----------------
+def card_price(doc: Doc, card_selectors: Sequence[str], price_selectors: Sequence[str],
+               matches: Callable[[str], float], price_pat: re.Pattern, clean: Callable[[str], Optional[str]]) -> Optional[str]:
+    """
+    Precio de la card que mejor coincide con el término. `matches` devuelve un puntaje
+    (o un bool): ante empates gana la primera card en el orden de selectores. Una card
+    con elemento de precio le gana a una cuyo precio sale del texto suelto (un nodo con
+    solo el título puntúa alto, pero el patrón tomaría dígitos del modelo). El texto de
+    cada card se calcula una sola vez; no hace falta probar los selectores de título
+    aparte porque su texto está contenido en el de la card.
+    """
+    best, best_price = (0, 0.0), None
+    for cs in card_selectors:
+        for card in doc.select(cs):
+            ctxt = doc.text(card)
+            sc = float(matches(ctxt))
+            if not sc or (1, sc) <= best: continue
+            p, tier = None, 1
+            for ps in price_selectors:
+                el = doc.select_one(ps, card)
+                if el is not None:
+                    p = clean(doc.text(el))
+                    if p: break
+            if not p:
+                m = price_pat.search(ctxt)
+                p, tier = (clean(m.group(0)) if m else None), 0
+            if p and (tier, sc) > best: best, best_price = (tier, sc), p
+    return best_price
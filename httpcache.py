@@ -0,0 +1,188 @@
+# httpcache.py
+# Caché HTTP de respuestas completas para las páginas que el scraper pide una y otra vez
+# sin cambios (home del vendedor para detectar plataforma o el formulario de búsqueda de
+# WordPress, landings de /ofertas): cuerpo comprimido con zlib en SQLite, TTL por patrón
+# de URL y, vencido el TTL, revalidación con If-None-Match / If-Modified-Since (304 = se
+# reutiliza el cuerpo guardado). Las búsquedas (URLs con query) no pasan por acá: sus
+# precios ya se guardan en la caché de resultados.
+import os, re, json, time, zlib, sqlite3, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from settings import data_path, env_int
+
+HTTP_CACHE_ENABLED = env_int("HTTP_CACHE_ENABLED", 1)
+TTL_PAGE = env_int("HTTP_CACHE_TTL_PAGE", 6 * 3600)        # páginas sin query (home, secciones)
+TTL_LANDING = env_int("HTTP_CACHE_TTL_LANDING", 3 * 3600)  # /ofertas, /folletos, /promociones…
+MAX_BYTES = env_int("HTTP_CACHE_MAX_MB", 200) * 1024 * 1024
+EVICT_EVERY = 50  # escrituras entre controles de tamaño
+
+# (regex sobre la URL completa, TTL en s); gana la primera que coincide, 0 = no cachear.
+# HTTP_CACHE_RULES="regex=ttl;regex=ttl" agrega reglas por delante de estas.
+DEFAULT_RULES = [
+    (r"\.pdf(\?|$)", 0),  # folletos: brochures.py ya los revalida y guarda por hash
+    (r"/(ofertas?|promociones|folletos?|catalogos?)/?$", TTL_LANDING),
+    (r"^[^?#]*$", TTL_PAGE),
+]
+
+def parse_rules(spec: str) -> List[Tuple[str, int]]:
+    out = []
+    for part in (spec or "").split(";"):
+        pat, sep, ttl = part.strip().rpartition("=")
+        if sep and pat:
+            try: out.append((pat, int(ttl)))
+            except ValueError: pass
+    return out
+
+class CachedResponse:
+    """Respuesta servida desde la caché; expone lo que el scraper usa de requests.Response."""
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: bytes, encoding: Optional[str]):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in (headers or {}).items()}
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        try: return self.content.decode(self.encoding or "utf-8", errors="replace")
+        except LookupError: return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        pass  # solo se guardan respuestas 200
+
+class _Entry:
+    __slots__ = ("response", "etag", "last_modified", "expires")
+    def __init__(self, response: CachedResponse, etag: Optional[str], last_modified: Optional[str], expires: float):
+        self.response, self.etag, self.last_modified, self.expires = response, etag, last_modified, expires
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def validators(self) -> Dict[str, str]:
+        hdr = {}
+        if self.etag: hdr["If-None-Match"] = self.etag
+        if self.last_modified: hdr["If-Modified-Since"] = self.last_modified
+        return hdr
+
+class HttpCache:
+    def __init__(self, path: Optional[Path] = None, rules: Optional[List[Tuple[str, int]]] = None,
+                 max_bytes: int = MAX_BYTES, enabled: bool = bool(HTTP_CACHE_ENABLED)):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        if rules is None: rules = parse_rules(os.getenv("HTTP_CACHE_RULES", "")) + DEFAULT_RULES
+        self.rules = [(re.compile(p, re.I), ttl) for p, ttl in rules]
+        self._ready = False
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("httpcache.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY, url TEXT NOT NULL, status INTEGER NOT NULL, headers TEXT, encoding TEXT,
+                    body BLOB NOT NULL, size INTEGER NOT NULL, etag TEXT, last_modified TEXT,
+                    fetched REAL NOT NULL, expires REAL NOT NULL, last_used REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+                conn.execute("""CREATE TABLE IF NOT EXISTS memo (
+                    key TEXT PRIMARY KEY, value TEXT, expires REAL NOT NULL)""")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(url: str, params=None) -> str:
+        if not params: return url
+        items = sorted(params.items()) if isinstance(params, dict) else list(params)
+        return url + ("&" if "?" in url else "?") + urlencode(items)
+
+    def ttl_for(self, key: str) -> int:
+        if not self.enabled: return 0
+        for pat, ttl in self.rules:
+            if pat.search(key): return ttl
+        return 0
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT url, status, headers, encoding, body, etag, last_modified, expires FROM responses WHERE key=?",
+                               (key,)).fetchone()
+            if not row: return None
+            conn.execute("UPDATE responses SET last_used=? WHERE key=?", (time.time(), key))
+        url, status, headers, encoding, body, etag, last_modified, expires = row
+        try: content = zlib.decompress(body)
+        except zlib.error: return None
+        return _Entry(CachedResponse(url, status, json.loads(headers or "{}"), content, encoding), etag, last_modified, expires)
+
+    def put(self, key: str, r, ttl: int):
+        """Guarda una respuesta 200 (requests o curl_cffi) con su cuerpo comprimido."""
+        now = time.time()
+        headers = {k.lower(): v for k, v in r.headers.items() if k.lower() in ("content-type", "etag", "last-modified")}
+        body = zlib.compress(r.content or b"", 6)
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                         (key, str(r.url), r.status_code, json.dumps(headers), getattr(r, "encoding", None), body, len(body),
+                          headers.get("etag"), headers.get("last-modified"), now, now + ttl, now))
+            self._writes += 1
+            if self.max_bytes and self._writes % EVICT_EVERY == 0: self._evict(conn)
+
+    def touch(self, key: str, ttl: int):
+        """304: el cuerpo guardado sigue vigente por otro TTL."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("UPDATE responses SET expires=?, last_used=? WHERE key=?", (now + ttl, now, key))
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes: return
+        # LRU: se borran las menos usadas hasta quedar en el 90 % del tope
+        acc, cut = total, None
+        for last_used, size in conn.execute("SELECT last_used, size FROM responses ORDER BY last_used"):
+            acc -= size; cut = last_used
+            if acc <= self.max_bytes * 0.9: break
+        if cut is not None: conn.execute("DELETE FROM responses WHERE last_used <= ?", (cut,))
+
+    # valores derivados de una página (p. ej. la acción de búsqueda de WordPress), con TTL
+    def recall(self, key: str) -> Optional[str]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, expires FROM memo WHERE key=?", (key,)).fetchone()
+        return row[0] if row and row[1] > time.time() else None
+
+    def remember(self, key: str, value: str, ttl: int):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO memo VALUES (?,?,?)", (key, value, time.time() + ttl))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM memo")
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._conn() as conn:
+            n, size, fresh = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(expires > ?), 0) FROM responses", (now,)).fetchone()
+            memo = conn.execute("SELECT COUNT(*) FROM memo WHERE expires > ?", (now,)).fetchone()[0]
+        return {"enabled": self.enabled, "entries": n, "fresh": fresh, "bytes": size, "memo": memo,
+                "rules": [(p.pattern, ttl) for p, ttl in self.rules]}
+
+HTTP_CACHE = HttpCache()
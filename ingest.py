@@ -0,0 +1,302 @@
+# ingest.py
+# Lotes grandes de productos subidos como CSV/XLSX: el archivo se guarda en disco por
+# trozos, se lee en streaming, se deduplica por EAN o marca+modelo y se scrapea por
+# tandas. Cada resultado (producto × vendedor) se escribe en SQLite a medida que llega,
+# así un lote interrumpido (reinicio del worker) se retoma desde lo ya resuelto.
+import re, csv, json, time, uuid, sqlite3, threading
+from contextlib import contextmanager
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from settings import DATA_DIR, data_path, env_int
+from breaker import NOT_SEARCHED
+from products import dedupe_key
+
+HAVE_OPENPYXL = find_spec("openpyxl") is not None  # se importa al leer un XLSX
+
+INGEST_CHUNK = env_int("INGEST_CHUNK_ROWS", 1000)      # filas por INSERT al ingerir
+INGEST_BATCH = env_int("INGEST_BATCH_PRODUCTS", 100)   # productos por tanda de scraping
+STALE_AFTER = env_int("INGEST_STALE_AFTER", 120)     # s sin latido → lote interrumpido (worker muerto)
+QUEUED_STALE = env_int("INGEST_QUEUED_STALE", 3600)  # s en cola tras los que /resume puede reasignarlo
+HEARTBEAT_EVERY = 15.0
+UPLOAD_CHUNK = 256 * 1024
+INGEST_FORMATS = ("csv", "xlsx")
+RESUMABLE = ("interrupted", "error", "cancelled")
+
+# ---------------- lectura del archivo ----------------
+def save_upload(stream, dest: Path, chunk: int = UPLOAD_CHUNK) -> int:
+    """Copia el archivo subido a disco sin cargarlo entero en memoria; devuelve los bytes."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with open(dest, "wb") as f:
+        while True:
+            data = stream.read(chunk)
+            if not data: break
+            f.write(data); n += len(data)
+    return n
+
+def iter_csv_rows(path: Path) -> Iterator[List[str]]:
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        sample = f.read(8192)
+        f.seek(0)
+        # mismo criterio que la importación del navegador: coma o punto y coma (o tab)
+        try: dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error: dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            yield row
+
+def iter_xlsx_rows(path: Path) -> Iterator[List]:
+    if not HAVE_OPENPYXL: raise RuntimeError("openpyxl no disponible")
+    from openpyxl import load_workbook
+    wb = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+HEADER_KEYS = ("producto", "marca", "modelo", "capacidad", "ean", "ean/código", "codigo", "código")
+
+def _cell(v) -> str:
+    if v is None: return ""
+    if isinstance(v, float) and v.is_integer(): v = int(v)  # EAN leído como número en XLSX
+    return str(v).strip()
+
+def iter_products(rows: Iterable[Sequence]) -> Iterator[Dict]:
+    """Filas → productos, con las columnas y normalización de normalizeRows (script.js)."""
+    it = iter(rows)
+    first = next(it, None)
+    if first is None: return
+    header = [_cell(h).lower() for h in first]
+    if any(k in header for k in HEADER_KEYS):
+        idx = lambda *names: next((header.index(n) for n in names if n in header), -1)
+        cols = (idx("producto"), idx("marca"), idx("modelo"), idx("capacidad"), idx("ean", "ean/código", "codigo", "código"))
+        body = it
+    else:
+        cols = (0, 1, 2, 3, 4)
+        body = (r for part in ([first], it) for r in part)
+    for row in body:
+        get = lambda i: _cell(row[i]) if 0 <= i < len(row) else ""
+        p = {"producto": get(cols[0]), "marca": get(cols[1]).upper(), "modelo": get(cols[2]).upper(),
+             "capacidad": re.sub(r"\s+", "", get(cols[3]).upper()), "ean": re.sub(r"\D", "", get(cols[4]))}
+        if any(p.values()): yield p
+
+# ---------------- almacenamiento ----------------
+class BatchStore:
+    def __init__(self, path: Optional[Path] = None, files_dir: Optional[Path] = None):
+        self.path = path
+        self.files_dir = files_dir
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("batches.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS batches (
+                    id TEXT PRIMARY KEY, filename TEXT, status TEXT NOT NULL, vendors TEXT NOT NULL, options TEXT NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0, duplicates INTEGER NOT NULL DEFAULT 0, job_id TEXT,
+                    created REAL NOT NULL, updated REAL NOT NULL, error TEXT)""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS items (
+                    batch_id TEXT NOT NULL, idx INTEGER NOT NULL, key TEXT NOT NULL, product TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (batch_id, idx), UNIQUE (batch_id, key))""")
+                conn.execute("CREATE INDEX IF NOT EXISTS items_pending ON items (batch_id, done, idx)")
+                conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                    batch_id TEXT NOT NULL, idx INTEGER NOT NULL, vendor TEXT NOT NULL, price TEXT, price_num TEXT,
+                    checked TEXT, PRIMARY KEY (batch_id, idx, vendor))""")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def file_path(self, batch_id: str, fmt: str) -> Path:
+        if self.files_dir is None: self.files_dir = DATA_DIR / "uploads"
+        return self.files_dir / f"{batch_id}.{fmt}"
+
+    def create(self, filename: str, vendors: Dict[str, str], options: Dict) -> str:
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO batches (id, filename, status, vendors, options, created, updated) VALUES (?,?,?,?,?,?,?)",
+                         (batch_id, filename, "ingesting", json.dumps(vendors, ensure_ascii=False),
+                          json.dumps(options, ensure_ascii=False), now, now))
+        return batch_id
+
+    def ingest(self, batch_id: str, products: Iterable[Dict], chunk: int = INGEST_CHUNK) -> Tuple[int, int]:
+        """Inserta por bloques; los repetidos (misma clave) se descartan. Devuelve (únicos, duplicados)."""
+        total = dup = 0
+        buf: List[Dict] = []
+        def flush(conn):
+            nonlocal total, dup
+            for p in buf:
+                cur = conn.execute("INSERT OR IGNORE INTO items (batch_id, idx, key, product) VALUES (?,?,?,?)",
+                                   (batch_id, total, dedupe_key(p), json.dumps(p, ensure_ascii=False)))
+                if cur.rowcount: total += 1
+                else: dup += 1
+            buf.clear()
+        for p in products:
+            buf.append(p)
+            if len(buf) >= chunk:
+                with self._conn() as conn: flush(conn)
+        with self._conn() as conn:
+            flush(conn)
+            conn.execute("UPDATE batches SET total=?, duplicates=?, status='queued', updated=? WHERE id=?",
+                         (total, dup, time.time(), batch_id))
+        return total, dup
+
+    def set_status(self, batch_id: str, status: str, error: Optional[str] = None, job_id: Optional[str] = None):
+        with self._conn() as conn:
+            conn.execute("UPDATE batches SET status=?, error=?, job_id=COALESCE(?, job_id), updated=? WHERE id=?",
+                         (status, error, job_id, time.time(), batch_id))
+
+    def claim(self, batch_id: str, job_id: str, stale: float = STALE_AFTER, queued_stale: float = QUEUED_STALE) -> bool:
+        """
+        Reserva el lote para el trabajo job_id (queda "queued" hasta que arranque, ver start)
+        si está recién ingerido, terminado a medias o sin latido (worker muerto). Uno ya
+        encolado para otro trabajo solo se reasigna pasado queued_stale: ese trabajo, si
+        llega a arrancar, ya no es el dueño y no corre.
+        """
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                f"""UPDATE batches SET status='queued', job_id=?, error=NULL, updated=? WHERE id=? AND
+                    ((status='queued' AND (job_id IS NULL OR updated < ?)) OR status IN ({','.join('?' * len(RESUMABLE))})
+                     OR (status='running' AND updated < ?))""",
+                (job_id, now, batch_id, now - queued_stale, *RESUMABLE, now - stale))
+            return cur.rowcount == 1
+
+    def start(self, batch_id: str, job_id: str) -> bool:
+        """Pasa a "running" el lote reservado por claim(), solo si job_id sigue siendo su dueño."""
+        with self._conn() as conn:
+            cur = conn.execute("UPDATE batches SET status='running', updated=? WHERE id=? AND job_id=? AND status='queued'",
+                               (time.time(), batch_id, job_id))
+            return cur.rowcount == 1
+
+    def pending(self, batch_id: str, after: int = -1, limit: int = INGEST_BATCH) -> List[Tuple[int, Dict]]:
+        with self._conn() as conn:
+            return [(idx, json.loads(p)) for idx, p in conn.execute(
+                "SELECT idx, product FROM items WHERE batch_id=? AND done=0 AND idx>? ORDER BY idx LIMIT ?", (batch_id, after, limit))]
+
+    def touch(self, batch_id: str):
+        with self._conn() as conn:
+            conn.execute("UPDATE batches SET updated=? WHERE id=?", (time.time(), batch_id))
+
+    def put_result(self, batch_id: str, idx: int, vendor: str, price: str, price_num: str, checked: str, n_vendors: int):
+        """Guarda un resultado; el producto queda completo cuando tiene el de todos los vendedores."""
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?)", (batch_id, idx, vendor, price, price_num, checked))
+            conn.execute("""UPDATE items SET done=1 WHERE batch_id=? AND idx=? AND
+                            (SELECT COUNT(*) FROM results WHERE batch_id=? AND idx=?) >= ?""", (batch_id, idx, batch_id, idx, n_vendors))
+            conn.execute("UPDATE batches SET updated=? WHERE id=?", (time.time(), batch_id))
+
+    def get(self, batch_id: str) -> Optional[Dict]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT id, filename, status, vendors, total, duplicates, job_id, created, updated, error FROM batches WHERE id=?",
+                               (batch_id,)).fetchone()
+            if not row: return None
+            done = conn.execute("SELECT COUNT(*) FROM items WHERE batch_id=? AND done=1", (batch_id,)).fetchone()[0]
+        keys = ("batch_id", "filename", "status", "vendors", "total", "duplicates", "job_id", "created", "updated", "error")
+        out = dict(zip(keys, row))
+        out["vendors"] = json.loads(out["vendors"])
+        out["done"] = done
+        out["progress"] = round(done / out["total"], 4) if out["total"] else 0.0
+        if out["status"] == "running" and time.time() - out["updated"] > STALE_AFTER: out["status"] = "interrupted"
+        return out
+
+    def options(self, batch_id: str) -> Tuple[Dict[str, str], Dict]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT vendors, options FROM batches WHERE id=?", (batch_id,)).fetchone()
+        return json.loads(row[0]), json.loads(row[1])
+
+    def iter_rows(self, batch_id: str, page: int = 1000) -> Iterator[Dict]:
+        """Filas de resultado (mismo formato que /api/scrape) leídas por páginas desde disco."""
+        vendors = list(self.options(batch_id)[0])
+        after = -1
+        while True:
+            with self._conn() as conn:
+                items = conn.execute("SELECT idx, product FROM items WHERE batch_id=? AND idx>? ORDER BY idx LIMIT ?",
+                                     (batch_id, after, page)).fetchall()
+                if not items: return
+                res: Dict[int, Dict[str, tuple]] = {}
+                for idx, vendor, price, num, checked in conn.execute(
+                        "SELECT idx, vendor, price, price_num, checked FROM results WHERE batch_id=? AND idx BETWEEN ? AND ?",
+                        (batch_id, items[0][0], items[-1][0])):
+                    res.setdefault(idx, {})[vendor] = (price, num, checked)
+            for idx, product in items:
+                p = json.loads(product)
+                got = res.get(idx, {})
+                row = {"Producto": p.get("producto", ""), "Marca": p.get("marca", ""), "Modelo": p.get("modelo", ""), "EAN": p.get("ean", "")}
+                for vn in vendors: row[vn] = got[vn][0] if vn in got else ""
+                row["Marca (Sitio oficial)"] = "ND"
+                row["Fecha de Consulta"] = next((g[2] for g in got.values() if g[2]), "")
+                for vn in vendors: row[f"{vn} (num)"] = got[vn][1] if vn in got else ""
+                yield row
+            after = items[-1][0]
+
+    def columns(self, batch_id: str) -> List[str]:
+        vendors = list(self.options(batch_id)[0])
+        return ["Producto", "Marca", "Modelo", "EAN", *vendors, "Marca (Sitio oficial)", "Fecha de Consulta", *[f"{vn} (num)" for vn in vendors]]
+
+# ---------------- ejecución ----------------
+def run_batch(store: BatchStore, batch_id: str, job, scrape: Callable[..., None], batch: int = INGEST_BATCH):
+    """
+    Scrapea los productos pendientes por tandas de `batch`. scrape(products, on_result, on_log,
+    cancel_cb) es scrape_all_vendors ya configurado. Cada resultado se persiste al llegar; si
+    el trabajo se corta, el lote queda con lo resuelto y se retoma con los productos incompletos.
+    El lote tiene que estar reservado para job.id (claim); si otro /resume lo reasignó, no corre.
+    """
+    if not store.start(batch_id, job.id):
+        job.emit("log", "El lote fue reasignado a otro trabajo")
+        return
+    vendors = store.options(batch_id)[0]
+    info = store.get(batch_id)
+    job.emit("batch", {"batch_id": batch_id, "total": info["total"], "done": info["done"]})
+    # latido propio: un producto puede tardar minutos sin resultados (OCR, esperas del rate
+    # limit) y sin latido otro /resume tomaría el lote mientras este sigue corriendo
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(store, batch_id, stop, HEARTBEAT_EVERY), name=f"batch-{batch_id[:8]}", daemon=True)
+    beat.start()
+    skipped = set()
+    after = -1
+    try:
+        try:
+            while not job.cancel_cb():
+                chunk = store.pending(batch_id, after, batch)
+                if not chunk: break
+                after = chunk[-1][0]
+                idxs = [idx for idx, _ in chunk]
+                def on_result(i, vendor, row, idxs=idxs):
+                    # producto salteado por vendedor cortado: no se guarda, queda pendiente para /resume
+                    if row.get(vendor) == NOT_SEARCHED: skipped.add(idxs[i]); return
+                    store.put_result(batch_id, idxs[i], vendor, row.get(vendor), row.get(f"{vendor} (num)"),
+                                     row.get("Fecha de Consulta"), len(vendors))
+                scrape([p for _, p in chunk], on_result, lambda msg: job.emit("log", msg), job.cancel_cb)
+                info = store.get(batch_id)
+                job.advance(len(chunk))
+                job.emit("batch", {"batch_id": batch_id, "total": info["total"], "done": info["done"]})
+        except Exception as e:
+            store.set_status(batch_id, "cancelled" if job.cancel_cb() else "error", str(e))
+            raise
+        if skipped: job.emit("log", f"{len(skipped)} producto(s) sin buscar por vendedores cortados: quedan pendientes para /resume")
+        info = store.get(batch_id)
+        status = "cancelled" if job.cancel_cb() else ("done" if info["done"] >= info["total"] else "interrupted")
+        store.set_status(batch_id, status)
+    finally:
+        stop.set(); beat.join(5)
+
+def _heartbeat(store: BatchStore, batch_id: str, stop: threading.Event, every: float):
+    while not stop.wait(every):
+        try: store.touch(batch_id)
+        except Exception: pass  # un fallo puntual de la base no debe cortar el latido
+
+BATCHES = BatchStore()
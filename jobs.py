@@ -0,0 +1,197 @@
+# jobs.py
+# Trabajos de scraping en segundo plano. Estado y eventos (filas/logs) van a SQLite,
+# así cualquier worker de gunicorn puede informar el progreso o transmitir los eventos.
+import json, time, uuid, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from settings import data_path, env_int
+from registry import RUNS, RunRegistry, HEARTBEAT_EVERY, RUN_RETENTION, RUN_TTL
+
+FINAL_STATES = ("done", "error", "cancelled")
+
+class Job:
+    """Handle que recibe la función del trabajo para publicar eventos y avance."""
+    def __init__(self, store: "JobStore", job_id: str, cancel_cb: Callable[[], bool]):
+        self.store = store
+        self.id = job_id
+        self._cancelled = cancel_cb
+        self._seq = 0
+        self._beat = time.monotonic()
+        self._lock = threading.Lock()
+
+    def cancel_cb(self) -> bool:
+        # el scraper lo consulta seguido (esperas, pedidos): sirve de latido del trabajo aunque
+        # pase mucho sin filas ni avance (OCR largo, rate limit), para que no se dé por muerto
+        now = time.monotonic()
+        if now - self._beat >= HEARTBEAT_EVERY:
+            self._beat = now
+            try: self.store.touch(self.id)
+            except Exception: pass
+        return self._cancelled()
+
+    def emit(self, kind: str, data):
+        with self._lock:
+            self._seq += 1
+            self.store.add_event(self.id, self._seq, kind, data)
+
+    def advance(self, n: int = 1):
+        self.store.advance(self.id, n)
+
+class JobStore:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("jobs.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, kind TEXT, status TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, updated REAL NOT NULL, error TEXT)""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS events (
+                    job_id TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, data TEXT,
+                    ts REAL NOT NULL, PRIMARY KEY (job_id, seq))""")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def create(self, kind: str, total: int, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, total, created, updated) VALUES (?,?,?,?,?,?)",
+                         (job_id, kind, "queued", total, now, now))
+        return job_id
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET status=?, error=COALESCE(?, error), updated=? WHERE id=?",
+                         (status, error, time.time(), job_id))
+
+    def advance(self, job_id: str, n: int = 1):
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET done=done+?, updated=? WHERE id=?", (n, time.time(), job_id))
+
+    def touch(self, job_id: str):
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET updated=? WHERE id=?", (time.time(), job_id))
+
+    def add_event(self, job_id: str, seq: int, kind: str, data):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO events VALUES (?,?,?,?,?)",
+                         (job_id, seq, kind, json.dumps(data, ensure_ascii=False), now))
+            conn.execute("UPDATE jobs SET updated=? WHERE id=?", (now, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT id, kind, status, total, done, created, updated, error FROM jobs WHERE id=?",
+                               (job_id,)).fetchone()
+        if not row: return None
+        keys = ("job_id", "kind", "status", "total", "done", "created", "updated", "error")
+        out = dict(zip(keys, row))
+        out["progress"] = round(out["done"] / out["total"], 4) if out["total"] else 0.0
+        return out
+
+    def purge(self, max_age: float = RUN_RETENTION) -> int:
+        """Borra trabajos terminados (y sus eventos) más viejos que max_age."""
+        cutoff = time.time() - max_age
+        with self._conn() as conn:
+            ids = [r[0] for r in conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({','.join('?' * len(FINAL_STATES))}) AND updated < ?",
+                (*FINAL_STATES, cutoff))]
+            for job_id in ids:
+                conn.execute("DELETE FROM events WHERE job_id=?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id=?", (job_id,))
+        return len(ids)
+
+    def events(self, job_id: str, after: int = 0, limit: int = 500):
+        with self._conn() as conn:
+            return [(seq, kind, json.loads(data)) for seq, kind, data in conn.execute(
+                "SELECT seq, kind, data FROM events WHERE job_id=? AND seq>? ORDER BY seq LIMIT ?", (job_id, after, limit))]
+
+class JobManager:
+    def __init__(self, store: Optional[JobStore] = None, max_workers: Optional[int] = None, registry: Optional[RunRegistry] = None):
+        self.store = store or JobStore()
+        self.registry = registry or RUNS
+        self.max_workers = max_workers or env_int("JOBS_MAX_WORKERS", 2)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # se crea al primer uso (nunca antes del fork de gunicorn)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    def submit(self, kind: str, total: int, fn: Callable[[Job], None], meta: Optional[Dict] = None,
+               job_id: Optional[str] = None) -> str:
+        """
+        Encola fn(job) con `job_id` (o uno nuevo), que es también el run_id del registro
+        (cancelable desde cualquier worker). Se registra recién al arrancar: en cola no hay
+        quién renueve el latido, y una cancelación previa queda pendiente hasta entonces.
+        """
+        self.store.purge()
+        job_id = self.store.create(kind, total, job_id)
+        job = Job(self.store, job_id, self.registry.cancel_checker(job_id))
+
+        def run():
+            self.registry.register(job_id, kind, meta)
+            self.store.set_status(job_id, "running")
+            try:
+                fn(job)
+                status, err = ("cancelled" if job.cancel_cb() else "done"), None
+            except Exception as e:
+                status, err = ("cancelled" if job.cancel_cb() else "error"), str(e)
+            job.emit("end", {"status": status, "error": err})
+            self.registry.finish(job_id, status)  # antes que el estado final: quien lo vea ya no la ve activa
+            self.store.set_status(job_id, status, err)
+
+        self._pool().submit(run)
+        return job_id
+
+    def stream(self, job_id: str, after: int = 0, poll: float = 0.5, heartbeat: float = 15.0) -> Iterator[Optional[tuple]]:
+        """
+        Genera (seq, kind, data) a medida que aparecen en la base; None como latido
+        cuando no hubo eventos en `heartbeat` segundos. Termina tras el evento 'end'.
+        """
+        last_sent = time.monotonic()
+        while True:
+            batch = self.store.events(job_id, after)
+            for ev in batch:
+                after = ev[0]
+                yield ev
+                if ev[1] == "end": return
+            if batch:
+                last_sent = time.monotonic()
+                continue
+            job = self.store.get(job_id)
+            if not job: return
+            if job["status"] in FINAL_STATES and not self.store.events(job_id, after, 1): return
+            if job["status"] == "running" and time.time() - job["updated"] > RUN_TTL:
+                # sin eventos, avance ni latido (Job.cancel_cb) en RUN_TTL: el worker que lo
+                # ejecutaba murió, no esperar para siempre. En cola no hay latido: no vence
+                self.store.set_status(job_id, "error", "expirado sin actividad")
+                return
+            if time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield None
+            time.sleep(poll)
+
+JOBS = JobManager()
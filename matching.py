@@ -0,0 +1,69 @@
+# matching.py
+# Coincidencia de términos precompilada: las variantes se normalizan y tokenizan una vez
+# y el texto candidato (card, título, ventana de folleto) se recorre en una sola pasada
+# con una regex combinada de todos los tokens.
+import re, unicodedata
+from typing import Dict, List, Sequence, Set, Tuple
+
+def fold(text: str) -> str:
+    """Minúsculas sin tildes, conservando la longitud (los offsets siguen valiendo)."""
+    out = []
+    for ch in (text or "").lower():
+        base = unicodedata.normalize("NFKD", ch)
+        base = "".join(c for c in base if not unicodedata.combining(c))
+        out.append(base if len(base) == 1 else ch)
+    return "".join(out)
+
+def _norm(text: str, accents: bool) -> str:
+    t = fold(text) if accents else (text or "").lower()
+    return re.sub(r"\s+", " ", t).strip()
+
+class TermMatcher:
+    """
+    Variantes → listas de tokens. Un texto coincide con una variante si contiene todos
+    sus tokens como subcadenas (mismo criterio que text_matches_any_variant).
+    score() además premia tokens como palabra completa y cards con poco texto extra,
+    para que gane la card más parecida y no la primera.
+    """
+    def __init__(self, variants: Sequence[str], accents: bool = True):
+        self.accents = accents
+        self.variants: List[List[str]] = []
+        for v in variants:
+            toks = list(dict.fromkeys(_norm(v, accents).split()))
+            if toks and toks not in self.variants: self.variants.append(toks)
+        self.tokens: List[str] = sorted({t for ts in self.variants for t in ts}, key=lambda t: (-len(t), t))
+        # en cada posición la regex toma el token más largo; los más cortos que empiezan
+        # ahí son prefijos suyos y se marcan junto con él
+        self._prefixes: Dict[str, List[str]] = {t: [u for u in self.tokens if t.startswith(u)] for t in self.tokens}
+        self._pat = re.compile("(?=(" + "|".join(map(re.escape, self.tokens)) + "))") if self.tokens else None
+
+    def _scan(self, text: str) -> Tuple[Set[str], Set[str], str]:
+        """(tokens presentes, tokens presentes como palabra completa, texto normalizado)."""
+        t = _norm(text, self.accents)
+        found, whole = set(), set()
+        if self._pat is None: return found, whole, t
+        for m in self._pat.finditer(t):
+            p = m.start()
+            before = t[p - 1] if p else " "
+            for u in self._prefixes[m.group(1)]:
+                found.add(u)
+                after = t[p + len(u)] if p + len(u) < len(t) else " "
+                if not before.isalnum() and not after.isalnum(): whole.add(u)
+        return found, whole, t
+
+    def matches(self, text: str) -> bool:
+        found = self._scan(text)[0]
+        return any(all(tok in found for tok in ts) for ts in self.variants)
+
+    def score(self, text: str) -> float:
+        """0 si ninguna variante coincide; si no, 0.6–1.0 según palabras completas y cobertura."""
+        found, whole, t = self._scan(text)
+        best = 0.0
+        for ts in self.variants:
+            if not all(tok in found for tok in ts): continue
+            words = sum(tok in whole for tok in ts) / len(ts)
+            cover = min(1.0, sum(len(tok) for tok in ts) / max(1, len(t.replace(" ", ""))))
+            best = max(best, 0.6 + 0.3 * words + 0.1 * cover)
+        return best
+
+    __call__ = score
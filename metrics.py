@@ -0,0 +1,285 @@
+# metrics.py
+# Métricas del scraper (contadores e histogramas con etiquetas) en formato de texto de
+# Prometheus, agregadas entre workers de gunicorn mediante instantáneas en disco, y
+# desglose de tiempos por ejecución para devolver junto con los resultados.
+import os, json, time, atexit, threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from settings import DATA_DIR
+
+try:
+    import fcntl
+    HAVE_FCNTL = True
+except Exception:  # Windows
+    HAVE_FCNTL = False
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 2e7)
+FLUSH_EVERY = 5.0  # segundos entre instantáneas del worker en disco
+RETIRED = "retired.json"  # lo contado por workers que ya terminaron
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    kind = "counter"
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, n: float = 1):
+        key = tuple(str(l) for l in labels)
+        with METRICS.lock:
+            self.values[key] = self.values.get(key, 0) + n
+        METRICS.touch()
+
+    def dump(self) -> dict:
+        return {"|".join(k): v for k, v in self.values.items()}
+
+    @staticmethod
+    def merge(into: dict, data: dict):
+        for k, v in data.items(): into[k] = into.get(k, 0) + v
+
+    def render(self, data: dict) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for k in sorted(data):
+            out.append(f"{self.name}{_fmt_labels(self.labels, k.split('|') if self.labels else [])} {data[k]:g}")
+        return out
+
+class Histogram:
+    kind = "histogram"
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple[str, ...], List[float]] = {}  # conteos por bucket (+Inf al final), suma
+
+    def observe(self, value: float, *labels):
+        key = tuple(str(l) for l in labels)
+        with METRICS.lock:
+            v = self.values.get(key)
+            if v is None: v = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            v[bisect_left(self.buckets, value)] += 1
+            v[-1] += value
+        METRICS.touch()
+
+    def dump(self) -> dict:
+        return {"|".join(k): list(v) for k, v in self.values.items()}
+
+    @staticmethod
+    def merge(into: dict, data: dict):
+        for k, v in data.items():
+            cur = into.get(k)
+            into[k] = list(v) if cur is None else [a + b for a, b in zip(cur, v)]
+
+    def render(self, data: dict) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for k in sorted(data):
+            v = data[k]
+            lv = k.split("|") if self.labels else []
+            acc = 0
+            for b, c in zip(self.buckets + (float("inf"),), v[:-1]):
+                acc += c
+                le = 'le="%s"' % ("+Inf" if b == float("inf") else f"{b:g}")
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {acc:g}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, lv)} {v[-1]:g}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, lv)} {acc:g}")
+        return out
+
+class Registry:
+    """
+    Métricas del proceso; cada worker deja su instantánea en DATA_DIR/metrics/<pid>.json
+    desde un hilo de fondo, cada FLUSH_EVERY s si hubo cambios (nunca en el camino de una
+    búsqueda). Lo de un worker muerto se suma a retired.json, así los contadores no bajan
+    cuando gunicorn recicla workers.
+    """
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root
+        self.lock = threading.RLock()
+        self.metrics: Dict[str, object] = {}
+        self._pid = os.getpid()
+        self._dirty = False
+        self._flusher: Optional[threading.Thread] = None
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def _dir(self) -> Path:
+        if self.root is None: self.root = DATA_DIR / "metrics"
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root
+
+    def touch(self):
+        if self._pid != os.getpid():
+            # worker recién forkeado: no arrastrar lo contado por el proceso padre (ni su hilo)
+            with self.lock:
+                for m in self.metrics.values(): m.values.clear()
+                self._pid, self._flusher = os.getpid(), None
+        self._dirty = True
+        if self._flusher is None: self._start_flusher()
+
+    def _start_flusher(self):
+        with self.lock:
+            if self._flusher is not None: return
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_EVERY)
+            if self._dirty: self.flush()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {name: m.dump() for name, m in self.metrics.items()}
+
+    def flush(self):
+        self._dirty = False
+        try:
+            path = self._dir() / f"{os.getpid()}.json"
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+            tmp.replace(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def _retired_lock(self):
+        """flock entre workers: dos que ven al mismo muerto no deben sumarlo dos veces."""
+        if not HAVE_FCNTL:
+            yield; return
+        fd = os.open(str(self._dir() / "retired.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _retire(self, snapshot: Path):
+        """Suma la instantánea de un worker muerto a retired.json y la borra."""
+        path = self._dir() / RETIRED
+        with self._retired_lock():
+            try: data = json.loads(snapshot.read_text(encoding="utf-8"))
+            except FileNotFoundError: return  # otro worker ya la sumó
+            except Exception: data = {}
+            retired = self._read(path)
+            for name, values in data.items():
+                m = self.metrics.get(name)
+                if m is not None: m.merge(retired.setdefault(name, {}), values)
+            try:
+                tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp.write_text(json.dumps(retired), encoding="utf-8")
+                tmp.replace(path)
+            except OSError:
+                return  # sin poder guardarlo, mejor conservar la instantánea
+            snapshot.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read(path: Path) -> dict:
+        try: return json.loads(path.read_text(encoding="utf-8"))
+        except Exception: return {}
+
+    def collect(self) -> Dict[str, dict]:
+        """Suma de las instantáneas de los workers vivos (la propia, al día) y de los retirados."""
+        self.flush()
+        total: Dict[str, dict] = {}
+        snapshots = []
+        for f in self._dir().glob("*.json"):
+            if f.name == RETIRED: continue
+            try:
+                pid = int(f.stem)
+                if pid != os.getpid(): os.kill(pid, 0)
+            except ValueError:
+                f.unlink(missing_ok=True); continue
+            except ProcessLookupError:
+                self._retire(f); continue
+            except PermissionError:
+                pass
+            snapshots.append(f)
+        for data in [self._read(f) for f in snapshots] + [self._read(self._dir() / RETIRED)]:
+            for name, values in data.items():
+                m = self.metrics.get(name)
+                if m is not None: m.merge(total.setdefault(name, {}), values)
+        return total
+
+    def render(self) -> str:
+        data = self.collect()
+        lines: List[str] = []
+        for name, m in sorted(self.metrics.items()):
+            lines.extend(m.render(data.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+METRICS = Registry()
+
+HTTP_REQUESTS = METRICS.counter("scraper_http_requests_total", "Respuestas HTTP por host, estado y cliente", ("host", "status", "client"))
+HTTP_SECONDS = METRICS.histogram("scraper_http_request_seconds", "Latencia HTTP (sin la espera del rate limit)", ("host", "client"))
+HTTP_BYTES = METRICS.histogram("scraper_http_response_bytes", "Tamaño de las respuestas", ("host",), BYTES_BUCKETS)
+RATE_WAIT = METRICS.histogram("scraper_rate_limit_wait_seconds", "Espera del rate limit por host", ("host",))
+CURL_FALLBACK = METRICS.counter("scraper_curl_fallback_total", "403 reintentados con curl_cffi", ("host",))
+STRATEGY_SECONDS = METRICS.histogram("scraper_strategy_seconds", "Duración de cada estrategia", ("vendor", "strategy", "outcome"))
+CACHE_LOOKUPS = METRICS.counter("scraper_cache_lookups_total", "Consultas a la caché de resultados", ("result",))
+HTTP_CACHE_LOOKUPS = METRICS.counter("scraper_http_cache_total", "Caché HTTP: fresh (sin red), revalidated (304), stored (descarga completa)", ("host", "result"))
+STAGE_SECONDS = METRICS.histogram("scraper_stage_seconds", "Tiempo por etapa (parse, cards, pdf, ocr)", ("stage",))
+
+# ---------------- desglose por ejecución ----------------
+class RunTimings:
+    """Segundos acumulados por etapa y resultados por vendedor/estrategia de una ejecución."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = {}
+        self.strategies: Dict[str, Dict[str, List[float]]] = {}
+        self.vendors: Dict[str, dict] = {}  # vendedores cortados / estrategias descartadas (breaker.RunGuard)
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            v = self.stages.setdefault(stage, [0, 0.0])
+            v[0] += 1; v[1] += seconds
+
+    def strategy(self, vendor: str, strategy: str, outcome: str, seconds: float):
+        with self._lock:
+            v = self.strategies.setdefault(vendor, {}).setdefault(f"{strategy}:{outcome}", [0, 0.0])
+            v[0] += 1; v[1] += seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "wall_s": round(time.monotonic() - self.started, 3),
+                "stages": {k: {"count": c, "seconds": round(s, 3)} for k, (c, s) in sorted(self.stages.items())},
+                "strategies": {vn: {k: {"count": c, "seconds": round(s, 3)} for k, (c, s) in sorted(st.items())}
+                               for vn, st in sorted(self.strategies.items())},
+                "vendors": dict(self.vendors),
+            }
+
+_current = threading.local()
+
+def bind_run(timings: Optional[RunTimings]):
+    """Asocia el hilo actual (un carril de vendedor) a la ejecución en curso."""
+    _current.run = timings
+
+def current_run() -> Optional[RunTimings]:
+    return getattr(_current, "run", None)
+
+def record(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    run = current_run()
+    if run is not None: run.add(stage, seconds)
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
@@ -0,0 +1,106 @@
+# ocr.py
+# OCR de folletos escaneados página por página en un pool de procesos (tesseract es
+# CPU-bound), entregando el texto en orden a medida que sale para permitir corte temprano.
+import os, shutil, threading
+import multiprocessing as mp
+from importlib.util import find_spec
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
+
+from settings import env_float, env_int
+from metrics import stage
+
+if TYPE_CHECKING:
+    import pypdfium2 as pdfium
+
+# Opcional: pypdfium2 + PIL + pytesseract para OCR de folletos escaneados. Solo se
+# verifica que estén instalados; se importan recién cuando aparece un PDF escaneado
+# (pytesseract arrastra pandas y pesa ~50 MB por proceso).
+HAVE_PDFIUM = find_spec("pypdfium2") is not None and find_spec("PIL") is not None
+HAVE_TESS = find_spec("pytesseract") is not None
+
+OCR_SCALE = env_float("OCR_SCALE", 2.2)                       # 2.2 ≈ 158 DPI
+OCR_GREYSCALE = os.getenv("OCR_GREYSCALE", "0") in ("1", "true", "yes")
+OCR_MAX_PAGES = env_int("OCR_MAX_PAGES", 0)                   # 0 = todas
+OCR_WORKERS = env_int("OCR_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+OCR_LANG = os.getenv("OCR_LANG", "spa+eng")
+
+# ---------------- lado del proceso hijo ----------------
+_DOCS: Dict[str, "pdfium.PdfDocument"] = {}
+
+def _ocr_page(path: str, index: int, scale: float, greyscale: bool, lang: str) -> str:
+    import pypdfium2 as pdfium
+    doc = _DOCS.get(path)
+    if doc is None:
+        if len(_DOCS) > 8: _DOCS.clear()
+        doc = _DOCS[path] = pdfium.PdfDocument(path)
+    if not HAVE_TESS: return ""
+    img = doc[index].render(scale=scale, grayscale=greyscale).to_pil()
+    try:
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=lang)
+    except Exception as e:
+        # algunas excepciones de pytesseract no se pueden serializar y romperían el pool
+        raise RuntimeError(f"tesseract: {e}") from None
+
+# ---------------- lado del worker web ----------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid = 0
+_pool_lock = threading.Lock()
+
+def _executor() -> ProcessPoolExecutor:
+    # "spawn": los workers de gunicorn tienen hilos y fork desde ahí no es seguro
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=mp.get_context("spawn"))
+            _pool_pid = os.getpid()
+        return _pool
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def ocr_available() -> bool:
+    """pypdfium2, PIL y pytesseract instalados y el binario de tesseract en el PATH."""
+    return HAVE_PDFIUM and HAVE_TESS and shutil.which("tesseract") is not None
+
+def page_count(path: str) -> int:
+    if not HAVE_PDFIUM: return 0
+    import pypdfium2 as pdfium
+    return len(pdfium.PdfDocument(path))
+
+def iter_ocr_pages(path: str, start: int = 0, scale: Optional[float] = None, greyscale: Optional[bool] = None,
+                   max_pages: Optional[int] = None, workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    (nro_página, texto) en orden desde `start`. Mantiene a lo sumo `workers` páginas en
+    vuelo por delante del consumidor; si éste deja de iterar (encontró el término) las
+    pendientes se cancelan. Sin tesseract no genera nada (ni renderiza las páginas).
+    """
+    if not ocr_available(): return
+    scale = OCR_SCALE if scale is None else scale
+    greyscale = OCR_GREYSCALE if greyscale is None else greyscale
+    max_pages = OCR_MAX_PAGES if max_pages is None else max_pages
+    n = page_count(path)
+    if max_pages: n = min(n, max_pages)
+    ahead = max(1, workers or OCR_WORKERS)
+    ex = _executor()
+    futs = {}
+    nxt = start
+    try:
+        for i in range(start, n):
+            while nxt < n and nxt < i + ahead:
+                futs[nxt] = ex.submit(_ocr_page, path, nxt, scale, greyscale, OCR_LANG)
+                nxt += 1
+            try:
+                with stage("ocr"):
+                    txt = futs.pop(i).result()
+            except BrokenProcessPool:
+                _discard_pool()
+                raise
+            yield i, txt
+    finally:
+        for f in futs.values(): f.cancel()
@@ -0,0 +1,14 @@
+# products.py
+# Identidad de un producto, compartida por la deduplicación de lotes (ingest.py) y el
+# historial de precios (history.py): el mismo producto cae en la misma clave venga de
+# un CSV subido, del formulario o de una consulta al historial.
+import re
+from typing import Dict
+
+def dedupe_key(p: Dict) -> str:
+    """EAN (solo sus dígitos) si hay; si no marca+modelo; si no, el nombre del producto normalizado."""
+    ean = re.sub(r"\D", "", str(p.get("ean") or ""))  # "779 0000 00001", "779-0000-00001.0" de Excel
+    if ean: return "ean:" + ean
+    alnum = lambda x: re.sub(r"[^a-z0-9]", "", (x or "").lower())
+    if p.get("marca") and p.get("modelo"): return f"mm:{alnum(p['marca'])}:{alnum(p['modelo'])}"
+    return "p:" + re.sub(r"\s+", " ", (p.get("producto") or "").lower()).strip()
@@ -0,0 +1,132 @@
+# ratelimit.py
+# Limitador por dominio (token bucket con jitter) compartido por todo el proceso.
+import re, time, random, threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Callable
+
+MAX_PENALTY = 16.0      # multiplicador máximo del intervalo ante 429/503
+MAX_RETRY_AFTER = 300.0 # tope (s) para Retry-After
+
+def host_of(url: str) -> str:
+    m = re.match(r"^https?://([^/:?#]+)", url or "", re.I)
+    return (m.group(1) if m else (url or "")).lower()
+
+def parse_retry_after(value) -> Optional[float]:
+    """Retry-After en segundos o como fecha HTTP; None si no es interpretable."""
+    if value is None: return None
+    v = str(value).strip()
+    if not v: return None
+    if v.isdigit(): return min(float(v), MAX_RETRY_AFTER)
+    try:
+        return min(max(0.0, parsedate_to_datetime(v).timestamp() - time.time()), MAX_RETRY_AFTER)
+    except Exception:
+        return None
+
+class TokenBucket:
+    def __init__(self, interval: float, jitter: float, burst: int = 1):
+        self.interval = max(0.0, interval)  # segundos por token (sin penalidad)
+        self.jitter = max(0.0, jitter)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.next_at = 0.0          # no entregar tokens antes de este instante (jitter / Retry-After)
+        self.penalty = 1.0
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.last_status = None
+
+    def _refill(self, now: float):
+        eff = self.interval * self.penalty
+        if eff <= 0:
+            self.tokens = float(self.burst)
+        else:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) / eff)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Reserva un token y devuelve cuánto hay que esperar (s) antes de usarlo."""
+        self._refill(now)
+        eff = self.interval * self.penalty
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) * eff
+        self.tokens -= 1
+        wait = max(wait, self.next_at - now) + random.uniform(0, self.jitter)
+        # el jitter también corre el próximo turno para no agrupar pedidos
+        self.next_at = max(self.next_at, now + wait)
+        self.requests += 1
+        self.waited += wait
+        return wait
+
+class DomainRateLimiter:
+    """
+    Un bucket por host: cada pedido espera solo el presupuesto de su propio dominio.
+    delay_range=(a, b) equivale al sleep anterior: intervalo base a + jitter uniforme
+    en [0, b-a]. Ante 429/503 el intervalo se multiplica (y se respeta Retry-After);
+    con respuestas OK vuelve gradualmente al valor base. Si distintos clientes piden
+    otro delay_range para el mismo host, el bucket queda con el mayor intervalo y el
+    mayor jitter pedidos: un cliente apurado no acelera al resto.
+    """
+    def __init__(self, delay_range: Tuple[float, float] = (2, 5), burst: int = 1):
+        self.delay_range = delay_range
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str, delay_range=None) -> TokenBucket:
+        a, b = delay_range or self.delay_range
+        a, b = float(a), float(max(a, b))
+        bk = self._buckets.get(host)
+        if bk is None:
+            bk = self._buckets[host] = TokenBucket(a, b - a, self.burst)
+        elif delay_range is not None:
+            bk.interval, bk.jitter = max(bk.interval, a), max(bk.jitter, b - a)
+        return bk
+
+    def acquire(self, url: str, delay_range=None, cancel_cb: Optional[Callable[[], bool]] = None) -> float:
+        host = host_of(url)
+        with self._lock:
+            wait = self._bucket(host, delay_range).reserve(time.monotonic())
+        end = time.monotonic() + wait
+        while True:
+            left = end - time.monotonic()
+            if left <= 0: break
+            if cancel_cb and cancel_cb(): raise RuntimeError("cancelled")
+            time.sleep(min(left, 0.5))
+        return wait
+
+    def feedback(self, url: str, status: int, retry_after=None):
+        host = host_of(url)
+        with self._lock:
+            bk = self._bucket(host)
+            bk.last_status = status
+            if status in (429, 503):
+                bk.throttled += 1
+                bk.penalty = min(MAX_PENALTY, bk.penalty * 2)
+                ra = parse_retry_after(retry_after)
+                delay = ra if ra is not None else bk.interval * bk.penalty
+                bk.next_at = max(bk.next_at, time.monotonic() + delay)
+                bk.tokens = min(bk.tokens, 0.0)
+            elif status < 400 and bk.penalty > 1:
+                bk.penalty = max(1.0, bk.penalty * 0.75)
+
+    def state(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            out = {}
+            for host, bk in self._buckets.items():
+                bk._refill(now)
+                out[host] = {
+                    "interval": round(bk.interval * bk.penalty, 3),
+                    "jitter": round(bk.jitter, 3),
+                    "penalty": round(bk.penalty, 3),
+                    "tokens": round(bk.tokens, 3),
+                    "blocked_for": round(max(0.0, bk.next_at - now), 3),
+                    "requests": bk.requests,
+                    "throttled": bk.throttled,
+                    "waited_s": round(bk.waited, 3),
+                    "last_status": bk.last_status,
+                }
+            return out
+
+# instancia global: todos los PriceScraper del proceso comparten el presupuesto por dominio
+RATE_LIMITER = DomainRateLimiter()
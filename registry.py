@@ -0,0 +1,198 @@
+# registry.py
+# Registro de ejecuciones compartido entre workers: cancelación, expiración y listado.
+# Backend SQLite en disco local (default) o Redis si REDIS_URL está definido y hay cliente.
+import os, json, time, sqlite3, threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from settings import data_path, env_int
+
+RUN_TTL = env_int("RUNS_TTL", 3600)              # sin latido por este tiempo → ejecución vencida
+RUN_RETENTION = env_int("RUNS_RETENTION", 86400)  # tiempo que se conservan ejecuciones terminadas
+HEARTBEAT_EVERY = 15.0
+CANCEL_POLL = 1.0
+
+class RunRegistry(ABC):
+    @abstractmethod
+    def register(self, run_id: str, kind: str = "scrape", meta: Optional[Dict] = None): ...
+    @abstractmethod
+    def heartbeat(self, run_id: str): ...
+    @abstractmethod
+    def finish(self, run_id: str, status: str = "done"): ...
+    @abstractmethod
+    def cancel(self, run_id: str) -> bool: ...
+    @abstractmethod
+    def is_cancelled(self, run_id: str) -> bool: ...
+    @abstractmethod
+    def active(self) -> List[Dict]: ...
+    @abstractmethod
+    def expire(self) -> int: ...
+
+    def cancel_checker(self, run_id: str) -> Callable[[], bool]:
+        """
+        cancel_cb para el scraper: consulta el registro como mucho cada CANCEL_POLL s
+        y de paso renueva el latido de la ejecución.
+        """
+        state = {"checked": 0.0, "beat": time.monotonic(), "cancelled": False}
+        lock = threading.Lock()
+        def check() -> bool:
+            if state["cancelled"]: return True
+            now = time.monotonic()
+            with lock:
+                if now - state["checked"] < CANCEL_POLL: return False
+                state["checked"] = now
+                beat = now - state["beat"] >= HEARTBEAT_EVERY
+                if beat: state["beat"] = now
+            try:
+                if beat: self.heartbeat(run_id)
+                state["cancelled"] = self.is_cancelled(run_id)
+            except Exception:
+                pass  # un fallo del registro no debe tirar la ejecución
+            return state["cancelled"]
+        return check
+
+class SqliteRunRegistry(RunRegistry):
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("runs.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY, kind TEXT, status TEXT NOT NULL, cancelled INTEGER NOT NULL DEFAULT 0,
+                    pid INTEGER, meta TEXT, created REAL NOT NULL, updated REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS runs_status ON runs(status, updated)")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def register(self, run_id, kind="scrape", meta=None):
+        now = time.time()
+        with self._conn() as conn:
+            # conserva una cancelación que haya llegado antes que el registro
+            conn.execute("""INSERT INTO runs (run_id, kind, status, pid, meta, created, updated) VALUES (?,?,?,?,?,?,?)
+                ON CONFLICT(run_id) DO UPDATE SET kind=excluded.kind, status='running', pid=excluded.pid,
+                meta=excluded.meta, updated=excluded.updated""",
+                (run_id, kind, "running", os.getpid(), json.dumps(meta or {}, ensure_ascii=False), now, now))
+
+    def heartbeat(self, run_id):
+        with self._conn() as conn:
+            conn.execute("UPDATE runs SET updated=? WHERE run_id=?", (time.time(), run_id))
+
+    def finish(self, run_id, status="done"):
+        with self._conn() as conn:
+            conn.execute("UPDATE runs SET status=?, updated=? WHERE run_id=?", (status, time.time(), run_id))
+
+    def cancel(self, run_id):
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute("UPDATE runs SET cancelled=1, updated=? WHERE run_id=?", (now, run_id))
+            if cur.rowcount: return True
+            conn.execute("INSERT INTO runs (run_id, kind, status, cancelled, created, updated) VALUES (?,?,?,?,?,?)",
+                         (run_id, None, "pending", 1, now, now))
+        return False
+
+    def is_cancelled(self, run_id):
+        with self._conn() as conn:
+            row = conn.execute("SELECT cancelled FROM runs WHERE run_id=?", (run_id,)).fetchone()
+        return bool(row and row[0])
+
+    def active(self):
+        self.expire()
+        with self._conn() as conn:
+            rows = conn.execute("""SELECT run_id, kind, status, cancelled, pid, meta, created, updated FROM runs
+                WHERE status='running' ORDER BY created""").fetchall()
+        keys = ("run_id", "kind", "status", "cancelled", "pid", "meta", "created", "updated")
+        out = [dict(zip(keys, r)) for r in rows]
+        for r in out:
+            r["cancelled"] = bool(r["cancelled"]); r["meta"] = json.loads(r["meta"] or "{}")
+        return out
+
+    def expire(self):
+        now = time.time()
+        with self._conn() as conn:
+            n = conn.execute("UPDATE runs SET status='expired' WHERE status IN ('running','pending') AND updated < ?",
+                             (now - RUN_TTL,)).rowcount
+            conn.execute("DELETE FROM runs WHERE status NOT IN ('running','pending') AND updated < ?", (now - RUN_RETENTION,))
+        return n
+
+class RedisRunRegistry(RunRegistry):
+    """Mismo contrato sobre Redis (o compatible): hash run:<id> con TTL + set runs:active."""
+    def __init__(self, url: str):
+        import redis  # opcional
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, run_id): return f"run:{run_id}"
+
+    def register(self, run_id, kind="scrape", meta=None):
+        now = time.time()
+        k = self._key(run_id)
+        p = self.r.pipeline()
+        p.hsetnx(k, "created", now); p.hsetnx(k, "cancelled", 0)
+        p.hset(k, mapping={"kind": kind, "status": "running", "pid": os.getpid(),
+                           "meta": json.dumps(meta or {}, ensure_ascii=False), "updated": now})
+        p.expire(k, RUN_TTL); p.sadd("runs:active", run_id)
+        p.execute()
+
+    def heartbeat(self, run_id):
+        k = self._key(run_id)
+        p = self.r.pipeline(); p.hset(k, "updated", time.time()); p.expire(k, RUN_TTL); p.execute()
+
+    def finish(self, run_id, status="done"):
+        k = self._key(run_id)
+        p = self.r.pipeline()
+        p.hset(k, mapping={"status": status, "updated": time.time()}); p.expire(k, RUN_RETENTION); p.srem("runs:active", run_id)
+        p.execute()
+
+    def cancel(self, run_id):
+        k = self._key(run_id)
+        existed = bool(self.r.exists(k))
+        p = self.r.pipeline(); p.hset(k, mapping={"cancelled": 1, "updated": time.time()}); p.expire(k, RUN_TTL); p.execute()
+        return existed
+
+    def is_cancelled(self, run_id):
+        return self.r.hget(self._key(run_id), "cancelled") == "1"
+
+    def active(self):
+        self.expire()
+        out = []
+        for run_id in sorted(self.r.smembers("runs:active")):
+            h = self.r.hgetall(self._key(run_id))
+            if not h: continue
+            out.append({"run_id": run_id, "kind": h.get("kind"), "status": h.get("status"),
+                        "cancelled": h.get("cancelled") == "1", "pid": int(h.get("pid") or 0),
+                        "meta": json.loads(h.get("meta") or "{}"),
+                        "created": float(h.get("created") or 0), "updated": float(h.get("updated") or 0)})
+        return out
+
+    def expire(self):
+        # el TTL de Redis borra el hash; queda limpiar el índice de activas
+        gone = [rid for rid in self.r.smembers("runs:active") if not self.r.exists(self._key(rid))]
+        if gone: self.r.srem("runs:active", *gone)
+        return len(gone)
+
+def make_registry() -> RunRegistry:
+    url = os.getenv("REDIS_URL", "").strip()
+    if url:
+        try:
+            return RedisRunRegistry(url)
+        except Exception:
+            pass  # sin cliente redis instalado: SQLite
+    return SqliteRunRegistry()
+
+RUNS = make_registry()
@@ -0,0 +1,145 @@
+# routing.py
+# Enrutamiento aprendido: qué estrategia resuelve cada vendedor (persistido en SQLite).
+import re, time, random, sqlite3, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from settings import data_path, env_float, env_int
+
+MIN_WINS = env_int("ROUTING_MIN_WINS", 3)      # aciertos para confiar en una estrategia
+MIN_TRIES = env_int("ROUTING_MIN_TRIES", 5)    # intentos sin acierto para descartar otra
+HALF_LIFE = env_int("ROUTING_HALF_LIFE", 7 * 24 * 3600)  # vida media (s) de intentos y aciertos
+EXPLORE = env_float("ROUTING_EXPLORE", 0.05)   # probabilidad de volver a probar lo descartado, al final
+PLATFORM_TTL = env_int("ROUTING_PLATFORM_TTL", 7 * 24 * 3600)
+STATS_TTL = 60  # segundos que se reutilizan las estadísticas leídas en memoria
+
+# marcadores en el HTML de la home → plataforma (= nombre de estrategia)
+PLATFORM_MARKERS = [
+    ("vtex", re.compile(r"vteximg|vtexassets|vtex\.com|__RUNTIME__|/api/catalog_system|vtex-", re.I)),
+    ("magento", re.compile(r"Magento|mage/cookies|/static/version\d+|data-mage-init|\bform_key\b", re.I)),
+    ("wordpress", re.compile(r"wp-content|wp-includes|woocommerce", re.I)),
+]
+
+def _decay(age: float) -> float:
+    """Factor por el que se multiplican intentos y aciertos de hace `age` segundos."""
+    return 0.5 ** (max(0.0, age or 0.0) / HALF_LIFE) if HALF_LIFE > 0 else 1.0
+
+def detect_platform(html: str) -> Optional[str]:
+    for name, pat in PLATFORM_MARKERS:
+        if pat.search(html or ""): return name
+    return None
+
+class StrategyRouter:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+        # vendedor → (leído, {estrategia: [intentos, aciertos, actualizado]}, plataforma, detectada)
+        self._mem: Dict[str, Tuple[float, Dict[str, List[float]], Optional[str], float]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is None: self.path = data_path("routing.sqlite3")
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        conn.create_function("decay", 1, _decay, deterministic=True)
+        if not self._ready:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS strategy_stats (
+                    vendor TEXT NOT NULL, strategy TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL, PRIMARY KEY (vendor, strategy))""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS platforms (
+                    vendor TEXT PRIMARY KEY, platform TEXT, detected_at REAL NOT NULL)""")
+                conn.commit()
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    def _load(self, vendor: str):
+        now = time.time()
+        hit = self._mem.get(vendor)
+        if hit and now - hit[0] < STATS_TTL: return hit
+        with self._conn() as conn:
+            stats = {st: [a, w, at] for st, a, w, at in conn.execute(
+                "SELECT strategy, attempts, wins, updated FROM strategy_stats WHERE vendor=?", (vendor,))}
+            row = conn.execute("SELECT platform, detected_at FROM platforms WHERE vendor=?", (vendor,)).fetchone()
+        hit = (now, stats, row[0] if row else None, row[1] if row else 0.0)
+        self._mem[vendor] = hit
+        return hit
+
+    def record(self, vendor: str, strategy: str, won: bool):
+        """
+        Suma un intento (y un acierto si won) con decaimiento: lo viejo pesa la mitad cada
+        HALF_LIFE segundos. Las estadísticas en memoria se actualizan en el lugar, así el
+        próximo order() no vuelve a leer la base; lo de otros workers entra cada STATS_TTL.
+        """
+        now, won = time.time(), int(bool(won))
+        with self._conn() as conn:
+            conn.execute("""INSERT INTO strategy_stats (vendor, strategy, attempts, wins, updated) VALUES (?,?,1,?,?)
+                ON CONFLICT(vendor, strategy) DO UPDATE SET attempts=attempts*decay(excluded.updated-updated)+1,
+                wins=wins*decay(excluded.updated-updated)+excluded.wins, updated=excluded.updated""",
+                (vendor, strategy, won, now))
+        with self._lock:
+            hit = self._mem.get(vendor)
+            if hit is None: return
+            st = hit[1].get(strategy)
+            if st is None: hit[1][strategy] = [1, won, now]
+            else:
+                f = _decay(now - st[2])
+                st[:] = [st[0] * f + 1, st[1] * f + won, now]
+
+    def platform(self, vendor: str) -> Tuple[Optional[str], bool]:
+        """(plataforma, vigente). vigente=False si nunca se detectó o la detección expiró."""
+        _, _, platform, at = self._load(vendor)
+        return platform, bool(at) and time.time() - at < PLATFORM_TTL
+
+    def set_platform(self, vendor: str, platform: Optional[str]):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO platforms VALUES (?,?,?)", (vendor, platform, time.time()))
+        self._mem.pop(vendor, None)
+
+    def order(self, vendor: str, base_order: List[str]) -> List[str]:
+        """
+        Reordena base_order por tasa de acierto (suavizada, con decaimiento). La plataforma
+        detectada va primero y excluye 'generic'; si alguna estrategia acertó MIN_WINS veces
+        se descartan las que fallaron MIN_TRIES veces sin acertar. Lo descartado no queda
+        afuera para siempre: los intentos viejos pierden peso y, con probabilidad EXPLORE,
+        se vuelve a probar al final (solo corre si las demás estrategias no encontraron nada).
+        """
+        _, stats, platform, _ = self._load(vendor)
+        now = time.time()
+        with self._lock:
+            # redondeado: los intentos de recién no deben quedar en 4,9999 por el decaimiento
+            decayed = {st: (round(a * _decay(now - at), 2), round(w * _decay(now - at), 2)) for st, (a, w, at) in stats.items()}
+        order = list(base_order)
+        if platform in order:
+            order = [platform] + [st for st in order if st != platform]
+        def score(st):
+            a, w = decayed.get(st, (0, 0))
+            return (w + 1) / (a + 2) + (0.5 if st == platform else 0.0)
+        order = sorted(order, key=lambda st: -score(st))
+        dropped = ["generic"] if platform in order and "generic" in order else []
+        if any(w >= MIN_WINS for _, w in decayed.values()):
+            dead = lambda st: st in decayed and decayed[st][0] >= MIN_TRIES and decayed[st][1] < 0.5
+            dropped += [st for st in order if dead(st)]
+        order = [st for st in order if st not in dropped]
+        if dropped and random.random() < EXPLORE: order += dropped
+        return order
+
+    def snapshot(self) -> Dict[str, dict]:
+        out: Dict[str, dict] = {}
+        with self._conn() as conn:
+            for v, st, a, w in conn.execute("SELECT vendor, strategy, attempts, wins FROM strategy_stats ORDER BY vendor"):
+                out.setdefault(v, {"platform": None, "strategies": {}})["strategies"][st] = {"attempts": round(a, 2), "wins": round(w, 2)}
+            for v, pl, _ in conn.execute("SELECT vendor, platform, detected_at FROM platforms"):
+                out.setdefault(v, {"platform": None, "strategies": {}})["platform"] = pl
+        return out
+
+STRATEGY_ROUTER = StrategyRouter()
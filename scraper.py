@@ -1,33 +1,26 @@
 # scraper.py
-import re, io, time, random
+import re, io, time, uuid, random, threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional, Callable
 from datetime import datetime
 
-import pandas as pd
 import requests
-from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text as pdf_extract_text
-
-# Opcional: curl_cffi para reducir 403 por fingerprint (si está disponible)
-try:
-    from curl_cffi import requests as curl_requests
-    HAVE_CURLCFFI = True
-except Exception:
-    HAVE_CURLCFFI = False
-
-# Opcional: pypdfium2 + PIL + pytesseract para OCR de folletos escaneados
-try:
-    import pypdfium2 as pdfium
-    from PIL import Image
-    HAVE_PDFIUM = True
-except Exception:
-    HAVE_PDFIUM = False
-
-try:
-    import pytesseract
-    HAVE_TESS = True
-except Exception:
-    HAVE_TESS = False
+
+from ratelimit import RATE_LIMITER, DomainRateLimiter, host_of
+from sessions import SESSION_POOL, SessionPool, HAVE_CURLCFFI, IMPERSONATE
+from htmlparse import Doc, SoupDoc, parse_html, card_price
+from breaker import GONE_STATUSES, NOT_SEARCHED, VENDOR_TIME_BUDGET, RunGuard, StrategyUnavailable, http_status
+from brochures import BROCHURES, BrochureIndex
+from cache import RESULT_CACHE, ResultCache, normalize_term
+from singleflight import FLIGHTS, SingleFlight
+from metrics import (CACHE_LOOKUPS, CURL_FALLBACK, HTTP_BYTES, HTTP_CACHE_LOOKUPS, HTTP_REQUESTS, HTTP_SECONDS, RATE_WAIT,
+                     STRATEGY_SECONDS, RunTimings, bind_run, current_run, record, stage)
+from routing import STRATEGY_ROUTER, StrategyRouter, detect_platform
+from matching import TermMatcher
+from catalog import CATALOG, CatalogStore, SYNC_INTERVAL, model_keys
+from history import HISTORY, HISTORY_ENABLED, PriceHistory
+from httpcache import HTTP_CACHE, HttpCache
 
 UA_POOL = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
@@ -43,14 +36,25 @@ CARD_SELECTORS = [
     ".product-item","li.product",".product",".product-card",".grid-item",".product-box",
     ".vtex-product-summary-2-x-container",".ais-InfiniteHits-item"
 ]
-TITLE_SELECTORS = [
-    ".product-name",".product-title",".vtex-product-summary-2-x-productBrand",".vtex-product-summary-2-x-productNameContainer",
-    "h1","h2","h3","a[title]"
-]
 PRICE_PAT = re.compile(r"\$?\s*\d[\d\.\,]*")
+VTEX_BATCH = 10  # EANs/modelos por request en el modo por lotes
+VTEX_MAX_FROM = 2500  # la API de búsqueda de VTEX no pagina más allá
+MAGENTO_MAX_PAGES = 200
+WP_ACTION_TTL = 6 * 3600  # si la home no tiene TTL en la caché HTTP
 
 def s(x): return "" if x is None else str(x).strip()
 
+class Found(tuple):
+    """
+    (precio_txt, precio_num) con la estrategia que lo resolvió y su origen, para el historial:
+    "live" (consulta al sitio), "cache", "catalog", "batch" (lote VTEX) o "error" (ND con
+    alguna estrategia caída). Se desempaqueta como tupla.
+    """
+    def __new__(cls, price_txt, price_num, strategy: Optional[str] = None, source: Optional[str] = None):
+        t = super().__new__(cls, (price_txt, price_num))
+        t.strategy, t.source = strategy, source
+        return t
+
 def strip_decimal_and_non_digits(text: str) -> Optional[str]:
     """
     Devuelve entero plano:
@@ -85,23 +89,22 @@ def mk_variants_for_match(term: str) -> List[str]:
     return v
 
 def text_matches_any_variant(text: str, variants: List[str]) -> bool:
-    lt = normalize_spaces(text).lower()
-    for v in variants:
-        if all(tok in lt for tok in normalize_spaces(v).lower().split()):
-            return True
-    return False
+    return TermMatcher(variants, accents=False).matches(text)
+
+@lru_cache(maxsize=4096)
+def term_matcher(term: str) -> TermMatcher:
+    """Matcher compilado por término (variantes, tokens y regex se arman una sola vez)."""
+    return TermMatcher(mk_variants_for_match(term))
 
 # ---------------- HTTP endurecido con fallback curl_cffi ----------------
 DEFAULT_HEADERS = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
     "accept-language": "es-AR,es;q=0.9,en-US;q=0.8,en;q=0.7",
-    "cache-control": "no-cache",
     "upgrade-insecure-requests": "1",
     "sec-fetch-site": "none",
     "sec-fetch-mode": "navigate",
     "sec-fetch-user": "?1",
     "sec-fetch-dest": "document",
-    "pragma": "no-cache",
 }
 def browser_headers(domain: str) -> dict:
     ua = random.choice(UA_POOL)
@@ -114,85 +117,158 @@ def browser_headers(domain: str) -> dict:
     return h
 
 class HttpClient:
-    def __init__(self, delay_range=(2,5), log=None, cancel_cb=None):
+    def __init__(self, delay_range=(2,5), log=None, cancel_cb=None, limiter: Optional[DomainRateLimiter]=None, pool: Optional[SessionPool]=None,
+                 http_cache: Optional[HttpCache]=None):
         self.delay_range = delay_range
         self.log = log or (lambda *_: None)
         self.cancel_cb = cancel_cb or (lambda: False)
-        self.rs = requests.Session()
-        self.crs = curl_requests.Session() if HAVE_CURLCFFI else None
-
-    def _prep(self, url):
-        base = re.match(r"^https?://[^/]+", url)
-        if base:
-            hdr = browser_headers(base.group(0))
-            self.rs.headers.clear(); self.rs.headers.update(hdr)
-            if self.crs:
-                self.crs.headers.clear(); self.crs.headers.update(hdr)
-
-    def get(self, url, params=None, timeout=25):
+        self.limiter = limiter or RATE_LIMITER
+        self.pool = pool or SESSION_POOL
+        self.http_cache = http_cache or HTTP_CACHE
+
+    def _wait_turn(self, url):
+        waited = self.limiter.acquire(url, self.delay_range, cancel_cb=self.cancel_cb)
+        RATE_WAIT.observe(waited, host_of(url))
+        record("rate_wait", waited)
+        if waited >= 1: self.log(f"rate-limit {waited:.1f}s {url}")
+
+    def _feedback(self, url, r):
+        self.limiter.feedback(url, r.status_code, r.headers.get("retry-after"))
+
+    @staticmethod
+    def _observe(url, client, t0, r=None):
+        dt = time.perf_counter() - t0
+        host = host_of(url)
+        HTTP_SECONDS.observe(dt, host, client)
+        HTTP_REQUESTS.inc(host, r.status_code if r is not None else "error", client)
+        if r is not None: HTTP_BYTES.observe(len(r.content or b""), host)
+        record("http", dt)
+
+    def _curl_get(self, url, params, timeout, hdr):
+        self._wait_turn(url)
+        t0 = time.perf_counter()
+        try:
+            with self.pool.curl_session(url) as crs:
+                r2 = crs.get(url, params=params, headers=hdr, timeout=timeout, allow_redirects=True, impersonate=IMPERSONATE)
+        except Exception:
+            self._observe(url, "curl", t0); raise
+        self._observe(url, "curl", t0, r2)
+        self.log(f"HTTP {r2.status_code} {r2.url} (curl_cffi)")
+        self._feedback(url, r2)
+        r2.raise_for_status()
+        return r2
+
+    def get(self, url, params=None, timeout=25, headers=None):
+        """
+        GET con la caché HTTP para las URLs que tienen TTL (home, landings): dentro del TTL
+        no sale a la red; vencido, revalida con ETag/Last-Modified y un 304 reutiliza el
+        cuerpo guardado. Con headers condicionales propios (folletos) se omite la caché.
+        """
         if self.cancel_cb(): raise RuntimeError("cancelled")
-        self._prep(url)
+        key = self.http_cache.key(url, params)
+        ttl = self.http_cache.ttl_for(key)
+        if not ttl or any(k.lower() in ("if-none-match", "if-modified-since") for k in (headers or {})):
+            return self._fetch(url, params, timeout, headers)
+        entry = self.http_cache.get(key)
+        if entry and entry.fresh:
+            HTTP_CACHE_LOOKUPS.inc(host_of(url), "fresh")
+            self.log(f"caché HTTP {url}")
+            return entry.response
+        r = self._fetch(url, params, timeout, {**(headers or {}), **entry.validators()} if entry else headers)
+        if r.status_code == 304 and entry:
+            HTTP_CACHE_LOOKUPS.inc(host_of(url), "revalidated")
+            self.http_cache.touch(key, ttl)
+            return entry.response
+        if r.status_code == 200:
+            HTTP_CACHE_LOOKUPS.inc(host_of(url), "stored")
+            self.http_cache.put(key, r, ttl)
+        return r
+
+    def _fetch(self, url, params=None, timeout=25, headers=None, _retry=True):
+        hdr = self.pool.headers(url, browser_headers)
+        if headers: hdr = {**hdr, **headers}
         self.log(f"GET {url}" + (f" params={params}" if params else ""))
+        # dominios que ya respondieron 403 al cliente plano van directo a curl_cffi
+        if HAVE_CURLCFFI and self.pool.needs_impersonation(url):
+            return self._curl_get(url, params, timeout, hdr)
+        self._wait_turn(url)
+        t0 = time.perf_counter()
         try:
-            r = self.rs.get(url, params=params, timeout=timeout, allow_redirects=True)
+            try:
+                r = self.pool.session(url).get(url, params=params, headers=hdr, timeout=timeout, allow_redirects=True)
+            except requests.RequestException:
+                self._observe(url, "requests", t0); raise
+            self._observe(url, "requests", t0, r)
             self.log(f"HTTP {r.status_code} {r.url}")
+            self._feedback(url, r)
             r.raise_for_status()
-            time.sleep(random.uniform(*self.delay_range))
             return r
         except requests.HTTPError as e:
-            if self.crs and getattr(e.response, "status_code", 0) == 403:
-                r2 = self.crs.get(url, params=params, timeout=timeout, allow_redirects=True, impersonate="chrome124")
-                self.log(f"HTTP {r2.status_code} {r2.url} (curl_cffi)")
-                r2.raise_for_status()
-                time.sleep(random.uniform(*self.delay_range))
+            code = getattr(e.response, "status_code", 0)
+            if code in (429, 503) and _retry:
+                # el limitador ya aplicó Retry-After/penalidad: un reintento espera su turno
+                return self._fetch(url, params=params, timeout=timeout, headers=headers, _retry=False)
+            if HAVE_CURLCFFI and code == 403:
+                CURL_FALLBACK.inc(host_of(url))
+                r2 = self._curl_get(url, params, timeout, hdr)
+                self.pool.mark_impersonation(url)
                 return r2
             raise
 
 # ============================== Scraper ==============================
 class PriceScraper:
-    def __init__(self, headless: bool = True, delay_range: Tuple[int,int]=(2,5)):
+    def __init__(self, headless: bool = True, delay_range: Tuple[int,int]=(2,5), cache_mode: str = "use", cache: Optional[ResultCache] = None, router: Optional[StrategyRouter] = None,
+                 batch_vtex: bool = True, use_catalog: bool = True, catalog: Optional[CatalogStore] = None,
+                 flights: Optional[SingleFlight] = None, history: Optional[PriceHistory] = None, record_history: bool = bool(HISTORY_ENABLED)):
+        self._local = threading.local()
         self.client: Optional[HttpClient] = None
         self.delay_range = delay_range
+        self.cache_mode = cache_mode if cache_mode in ("use", "bypass", "refresh") else "use"
+        self.cache = cache or RESULT_CACHE
+        self.router = router or STRATEGY_ROUTER
+        self.batch_vtex = batch_vtex
+        self.use_catalog = use_catalog
+        self.catalog = catalog or CATALOG
+        self.flights = flights or FLIGHTS
+        self.history = (history or HISTORY) if record_history else None
+        self.last_timings: Optional[RunTimings] = None  # desglose de la última scrape_all_vendors
+        self.run_guard: Optional[RunGuard] = None       # breaker y presupuesto de la ejecución en curso
+
+    # cada hilo (carril de vendedor) usa su propio HttpClient: las sesiones no se comparten
+    @property
+    def client(self) -> Optional[HttpClient]:
+        return getattr(self._local, "client", None)
+
+    @client.setter
+    def client(self, c: Optional[HttpClient]):
+        self._local.client = c
 
     # ---------- extracción fiable desde “cards” ----------
-    def _extract_from_cards(self, soup: BeautifulSoup, term: str) -> Optional[str]:
-        variants = mk_variants_for_match(term)
-        for cs in CARD_SELECTORS:
-            for card in soup.select(cs):
-                ctxt = card.get_text(" ", strip=True)
-                title_ok = text_matches_any_variant(ctxt, variants)
-                if not title_ok:
-                    for ts in TITLE_SELECTORS:
-                        t = card.select_one(ts)
-                        if t and text_matches_any_variant(t.get_text(" ", strip=True), variants):
-                            title_ok = True; break
-                if not title_ok: continue
-                for ps in PRICE_CSS:
-                    el = card.select_one(ps)
-                    if el:
-                        p = strip_decimal_and_non_digits(el.get_text(" ", strip=True))
-                        if p: return p
-                m = PRICE_PAT.search(ctxt)
-                if m:
-                    p = strip_decimal_and_non_digits(m.group(0))
-                    if p: return p
-        return None
+    def _extract_from_cards(self, doc, term: str) -> Optional[str]:
+        if not isinstance(doc, Doc): doc = SoupDoc(doc)
+        with stage("cards"):
+            return card_price(doc, CARD_SELECTORS, PRICE_CSS, term_matcher(term).score, PRICE_PAT, strip_decimal_and_non_digits)
 
     # ------------------------ VTEX (API) ------------------------
+    @staticmethod
+    def _vtex_item_price(it: Dict) -> Optional[str]:
+        for sel in (it.get("sellers") or []):
+            offer = (sel.get("commertialOffer") or {})
+            if offer.get("Price") is not None:
+                return plain_from_float(offer["Price"])
+        return None
+
     def _try_vtex(self, base: str, term: str, log):
         api = f"{base.rstrip('/')}/api/catalog_system/pub/products/search"
         r = self.client.get(api, params={"_from": 0, "_to": 9, "ft": term})
         try: data = r.json()
-        except Exception: return None, None
+        except Exception: raise StrategyUnavailable("VTEX: la API no devolvió JSON")
         if not isinstance(data, list) or not data:
             log("VTEX: sin resultados"); return None, None
         for prod in data:
             for it in (prod.get("items") or []):
-                for sel in (it.get("sellers") or []):
-                    offer = (sel.get("commertialOffer") or {})
-                    if offer.get("Price") is not None:
-                        pnum = plain_from_float(offer["Price"])
-                        return f"$ {int(pnum):,}".replace(",", ".") + ",00", pnum
+                pnum = self._vtex_item_price(it)
+                if pnum: return f"$ {int(pnum):,}".replace(",", ".") + ",00", pnum
         for prod in data:
             pr = (prod.get("priceRange") or {}).get("sellingPrice", {})
             if pr.get("lowPrice") is not None:
@@ -200,14 +276,81 @@ class PriceScraper:
                 return f"$ {int(pnum):,}".replace(",", ".") + ",00", pnum
         return None, None
 
+    # ------------------- VTEX por lotes (muchos productos) -------------------
+    def _vtex_batch(self, vendor_name: str, base: str, products: List[Dict], log) -> Dict[int, Tuple[str, str]]:
+        """
+        Resuelve varios productos con pocas llamadas: EANs con fq=alternateIds_Ean (varios fq
+        por request), modelos con fq=alternateIds_RefId y, para los que falten, una consulta
+        intelligent-search por lote. Los resultados se asignan localmente a cada producto.
+        """
+        root = base.rstrip("/")
+        api = f"{root}/api/catalog_system/pub/products/search"
+        out: Dict[int, Tuple[str, str]] = {}
+        fmt = lambda pnum: (f"$ {int(pnum):,}".replace(",", ".") + ",00", pnum)
+        alnum = lambda x: re.sub(r"[^a-z0-9]", "", s(x).lower())
+
+        def fetch(url, params):
+            try: data = self.client.get(url, params=params).json()
+            except Exception as e:
+                if str(e) == "cancelled": raise
+                log(f"[{vendor_name}] VTEX lote error: {e}"); return []
+            if isinstance(data, dict): data = data.get("products") or []
+            return data if isinstance(data, list) else []
+
+        # 1) EAN exacto
+        eans = [(i, re.sub(r"\D", "", s(p.get("ean")))) for i, p in enumerate(products)]
+        eans = [(i, e) for i, e in eans if e]
+        for k in range(0, len(eans), VTEX_BATCH):
+            chunk = eans[k:k + VTEX_BATCH]
+            params = [("fq", f"alternateIds_Ean:{e}") for _, e in chunk] + [("_from", 0), ("_to", 49)]
+            by_ean = {}
+            for prod in fetch(api, params):
+                for it in (prod.get("items") or []):
+                    pnum = self._vtex_item_price(it)
+                    if it.get("ean") and pnum: by_ean.setdefault(s(it.get("ean")), pnum)
+            for i, e in chunk:
+                if e in by_ean: out[i] = fmt(by_ean[e])
+
+        # 2) modelo: RefId exacto y luego intelligent-search, con coincidencia local
+        def match_models(data, pending):
+            cands = []
+            for prod in data:
+                for it in (prod.get("items") or []):
+                    pnum = self._vtex_item_price(it)
+                    if not pnum: continue
+                    # referencias: igualdad exacta (GT32 ≠ GT320); nombres: el modelo contenido
+                    refs = {alnum(r.get("Value")) for r in (it.get("referenceId") or []) if isinstance(r, dict)}
+                    refs.add(alnum(prod.get("productReference")))
+                    names = [alnum(prod.get("productName")), alnum(it.get("name"))]
+                    cands.append((refs, names, pnum))
+            for i, m in pending:
+                for refs, names, pnum in cands:
+                    if m in refs or any(m in n for n in names if n):
+                        out[i] = fmt(pnum); break
+
+        models = [(i, alnum(p.get("modelo")), s(p.get("modelo"))) for i, p in enumerate(products) if i not in out]
+        models = [(i, m, raw) for i, m, raw in models if len(m) >= 4]
+        for k in range(0, len(models), VTEX_BATCH):
+            chunk = models[k:k + VTEX_BATCH]
+            params = [("fq", f"alternateIds_RefId:{raw}") for _, _, raw in chunk] + [("_from", 0), ("_to", 49)]
+            match_models(fetch(api, params), [(i, m) for i, m, _ in chunk])
+            pending = [(i, m, raw) for i, m, raw in chunk if i not in out]
+            if pending:
+                query = " ".join(raw for _, _, raw in pending)
+                isearch = f"{root}/api/io/_v/api/intelligent-search/product_search/"
+                match_models(fetch(isearch, {"query": query, "operator": "or", "count": 50}), [(i, m) for i, m, _ in pending])
+
+        log(f"[{vendor_name}] VTEX lote: {len(out)}/{len(products)} producto(s) resueltos")
+        return out
+
     # --------------------- Magento (HTML) ---------------------
     def _try_magento_html(self, base: str, term: str, log):
         url = f"{base.rstrip('/')}/catalogsearch/result/"
         r = self.client.get(url, params={"q": term})
-        soup = BeautifulSoup(r.text, "html.parser")
-        price = self._extract_from_cards(soup, term)
+        doc = parse_html(r.text)
+        price = self._extract_from_cards(doc, term)
         if price: return f"$ {int(price):,}".replace(",", ".") + ",00", price
-        m = PRICE_PAT.search(soup.get_text(" ", strip=True))
+        m = PRICE_PAT.search(doc.text())
         if m:
             price = strip_decimal_and_non_digits(m.group(0))
             if price: return f"$ {int(price):,}".replace(",", ".") + ",00", price
@@ -215,38 +358,54 @@ class PriceScraper:
 
     # ---------------- WordPress / WooCommerce ----------------
     def _find_wp_search(self, html: str, base: str) -> str:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, "html.parser")
         form = soup.find("form", attrs={"role":"search"}) or soup.find("form", class_=re.compile("search", re.I))
         return (form.get("action") if form else None) or base.rstrip("/") + "/"
 
+    def _wp_search_action(self, base: str) -> str:
+        """Acción del formulario de búsqueda, memorizada por vendedor (la home ya no se pide ni parsea por término)."""
+        key = "wp-search:" + base.rstrip("/")
+        action = self.client.http_cache.recall(key)
+        if not action:
+            action = self._find_wp_search(self.client.get(base.rstrip("/") + "/").text, base)
+            self.client.http_cache.remember(key, action, self.client.http_cache.ttl_for(base.rstrip("/") + "/") or WP_ACTION_TTL)
+        return action
+
     def _try_wordpress(self, base: str, term: str, log):
-        r = self.client.get(base.rstrip("/") + "/")
-        action = self._find_wp_search(r.text, base)
+        action = self._wp_search_action(base)
         for params in ({"s": term}, {"s": term, "post_type": "product"}):
             rr = self.client.get(action, params=params)
-            soup = BeautifulSoup(rr.text, "html.parser")
-            price = self._extract_from_cards(soup, term)
+            price = self._extract_from_cards(parse_html(rr.text), term)
             if price: return f"$ {int(price):,}".replace(",", ".") + ",00", price
         return None, None
 
     # ------------------------ Genérico ------------------------
     def _try_generic(self, base: str, term: str, log):
+        errors = []
         for path in ["/search","/buscar","/busca","/s","/busqueda"]:
             try:
                 rr = self.client.get(f"{base.rstrip('/')}{path}", params={"q": term})
-                soup = BeautifulSoup(rr.text, "html.parser")
-                price = self._extract_from_cards(soup, term)
+                doc = parse_html(rr.text)
+                price = self._extract_from_cards(doc, term)
                 if price: return f"$ {int(price):,}".replace(",", ".") + ",00", price
-                m = PRICE_PAT.search(soup.get_text(" ", strip=True))
+                m = PRICE_PAT.search(doc.text())
                 if m:
                     price = strip_decimal_and_non_digits(m.group(0))
                     if price: return f"$ {int(price):,}".replace(",", ".") + ",00", price
             except Exception as e:
+                if str(e) == "cancelled": raise
                 log(f"Genérico error {path}: {e}")
+                errors.append(e)
+        # si fallaron todas las rutas, el error sube para que cuente en el breaker / descarte
+        if len(errors) == 5:
+            if all(http_status(e) in GONE_STATUSES for e in errors): raise StrategyUnavailable("Genérico: ninguna ruta de búsqueda existe")
+            raise errors[-1]
         return None, None
 
     # -------------------- Folletos / PDF (+OCR) --------------------
     def _extract_pdf_links(self, html: str, base: str) -> List[str]:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, "html.parser")
         links = []
         for a in soup.find_all("a", href=True):
@@ -259,75 +418,222 @@ class PriceScraper:
                 links.append(src)
         return list(dict.fromkeys(links))
 
-    def _pdf_text_from_url(self, url: str, log) -> str:
-        r = self.client.get(url, timeout=45)
-        bio = io.BytesIO(r.content)
+    def _pdf_text(self, content: bytes, url: str, log) -> str:
         try:
-            txt = pdf_extract_text(bio) or ""
+            from pdfminer.high_level import extract_text as pdf_extract_text  # solo si hay folletos
+            with stage("pdf"):
+                txt = pdf_extract_text(io.BytesIO(content)) or ""
             log(f"PDF extraído ({len(txt)} chars) {url}")
             return txt
         except Exception as e:
             log(f"PDF error {e} {url}")
             return ""
 
-    def _pdf_ocr_pages(self, url: str, log, scale=2.2) -> str:
-        if not HAVE_PDFIUM: return ""
-        txts = []
-        try:
-            doc = pdfium.PdfDocument(io.BytesIO(self.client.get(url, timeout=45).content))
-            for i in range(len(doc)):
-                page = doc.get_page(i)
-                img = page.render_topil(scale=scale, greyscale=False)
-                ocr = pytesseract.image_to_string(img, lang="spa+eng") if HAVE_TESS else ""
-                txts.append(ocr)
-        except Exception as e:
-            log(f"OCR error {e} {url}")
-        return "\n".join(txts)
-
-    def _try_brochures(self, base: str, term: str, log):
-        pages = [base] + [f"{base.rstrip('/')}/{p}" for p in ["ofertas","oferta","promociones","folleto","folletos","catalogo","catalogos"]]
-        pdfs = []
-        for u in pages:
+    def _try_brochures(self, base: str, term: str, log, index: Optional[BrochureIndex] = None):
+        # PDFs descubiertos, descargados y extraídos una vez; cada término es una búsqueda en memoria
+        index = index or BROCHURES
+        pdfs = index.pdf_urls(base, self.client, self._extract_pdf_links, log)
+        variants = term_matcher(term)
+        for purl in pdfs[:12]:
             try:
-                html = self.client.get(u).text
-                pdfs.extend(self._extract_pdf_links(html, base))
+                raw = index.find_price(purl, self.client, variants, lambda content, url: self._pdf_text(content, url, log), PRICE_PAT, log)
             except Exception as e:
-                log(f"Folleto error {u}: {e}")
-        variants = mk_variants_for_match(term)
-        for purl in pdfs[:12]:
-            txt = self._pdf_text_from_url(purl, log)
-            if len(txt) < 200 and HAVE_PDFIUM:
-                txt = self._pdf_ocr_pages(purl, log, scale=2.2)
-            tl = txt.lower()
-            for m in PRICE_PAT.finditer(txt):
-                window = tl[max(0, m.start()-200): m.end()+200]
-                if any(all(tok in window for tok in v.lower().split()) for v in variants):
-                    p = strip_decimal_and_non_digits(m.group(0))
-                    if p: return f"$ {int(p):,}".replace(",", ".") + ",00", p
+                if str(e) == "cancelled": raise
+                log(f"Folleto PDF error {purl}: {e}")
+                continue
+            p = strip_decimal_and_non_digits(raw) if raw else None
+            if p: return f"$ {int(p):,}".replace(",", ".") + ",00", p
         return None, None
 
+    # ---------------- Catálogo (instantáneas locales) ----------------
+    def _vtex_catalog_pages(self, base: str, categories: List[str], log):
+        """Páginas de 50 productos de la API de búsqueda, por categoría (o todo el catálogo)."""
+        root = base.rstrip("/")
+        self._catalog_truncated = False
+        for cat in (categories or [""]):
+            api = f"{root}/api/catalog_system/pub/products/search" + (f"/{cat.strip('/')}" if cat else "")
+            for start in range(0, VTEX_MAX_FROM, 50):
+                data = self.client.get(api, params={"_from": start, "_to": start + 49}).json()
+                if not isinstance(data, list): data = []
+                items = []
+                for prod in data:
+                    for it in (prod.get("items") or []):
+                        refs = [s(r.get("Value")) for r in (it.get("referenceId") or []) if isinstance(r, dict)]
+                        model = s(prod.get("productReference")) or (refs[0] if refs else "")
+                        items.append({"sku": s(it.get("itemId")) or f"{prod.get('productId')}:{it.get('ean')}",
+                                      "ean": s(it.get("ean")), "brand": s(prod.get("brand")), "model": model,
+                                      "title": s(it.get("nameComplete") or prod.get("productName")),
+                                      "price": self._vtex_item_price(it),
+                                      "keys": model_keys(model, *refs, prod.get("productName"))})
+                yield items
+                if len(data) < 50: break
+            else:
+                log(f"VTEX catálogo: {cat or '/'} supera {VTEX_MAX_FROM} productos, conviene dividir por categorías")
+                self._catalog_truncated = True
+
+    def _magento_catalog_pages(self, base: str, categories: List[str], log):
+        """Páginas de listado de categorías Magento (?p=N) hasta que se repiten los productos."""
+        root = base.rstrip("/")
+        self._catalog_truncated = False
+        for cat in categories:
+            url = cat if cat.startswith("http") else f"{root}/{cat.strip('/')}"
+            seen = set()
+            for page in range(1, MAGENTO_MAX_PAGES + 1):
+                doc = parse_html(self.client.get(url, params={"p": page, "product_list_limit": 36}).text)
+                items = []
+                for card in doc.select(".product-item"):
+                    link = doc.select_one("a.product-item-link", card) or doc.select_one("a[href]", card)
+                    sku = (doc.attr(doc.select_one("[data-product-sku]", card), "data-product-sku")
+                           or doc.attr(doc.select_one("[data-product-id]", card), "data-product-id")
+                           or doc.attr(link, "href"))
+                    if not sku or sku in seen: continue
+                    seen.add(sku)
+                    amount = doc.attr(doc.select_one("[data-price-amount]", card), "data-price-amount")
+                    el = next((e for e in (doc.select_one(ps, card) for ps in PRICE_CSS) if e is not None), None)
+                    price = plain_from_float(amount) if amount else (strip_decimal_and_non_digits(doc.text(el)) if el is not None else None)
+                    title = doc.text(link) if link is not None else doc.text(card)
+                    items.append({"sku": sku, "title": title, "price": price, "keys": model_keys(sku, title)})
+                if not items: break  # página vacía o repetida (Magento devuelve la última otra vez)
+                yield items
+
+    def sync_catalog(self, vendor_name: str, base: str, log=None, categories: Optional[List[str]] = None,
+                     force: bool = False, cancel_cb: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Recorre el catálogo del vendedor (VTEX: API paginada; Magento: listados de las
+        categorías indicadas) y actualiza la instantánea local. Se omite si la última
+        sincronización completa tiene menos de CATALOG_SYNC_INTERVAL s, salvo force.
+        """
+        log = log or (lambda *_: None)
+        cancel_cb = cancel_cb or (lambda: False)
+        last = self.catalog.last_sync(vendor_name)
+        if not force and last and last["ok_at"] and time.time() - last["ok_at"] < SYNC_INTERVAL:
+            return {"vendor": vendor_name, "status": "skipped", "items": last["items"]}
+        self.client = HttpClient(delay_range=self.delay_range, log=log, cancel_cb=cancel_cb)
+        self._seed_platform(vendor_name, base, log)
+        platform = self.router.platform(vendor_name)[0]
+        if platform == "vtex": pages = self._vtex_catalog_pages(base, categories or [], log)
+        elif platform == "magento" and categories: pages = self._magento_catalog_pages(base, categories, log)
+        else:
+            msg = "Magento requiere categorías" if platform == "magento" else f"plataforma no soportada: {platform or 'desconocida'}"
+            return {"vendor": vendor_name, "status": "unsupported", "platform": platform, "error": msg}
+        started = self.catalog.begin(vendor_name, base, platform)
+        n = changed = 0
+        status, err = "done", None
+        try:
+            for items in pages:
+                items = [it for it in items if it.get("sku")]
+                n += len(items)
+                changed += self.catalog.upsert(vendor_name, items)
+                log(f"[{vendor_name}] catálogo: {n} ítems ({changed} con cambios)")
+        except Exception as e:
+            status, err = ("cancelled" if cancel_cb() else "error"), str(e)
+            log(f"[{vendor_name}] catálogo error: {e}")
+        complete = status == "done" and not self._catalog_truncated
+        removed = self.catalog.finish(vendor_name, started, status, n, changed, err, complete=complete)
+        return {"vendor": vendor_name, "platform": platform, "status": status, "items": n,
+                "changed": changed, "removed": removed, "error": err}
+
     # ---------------- Orden de estrategias por vendedor ----------------
-    def _detect_platform_order(self, vendor_name: str) -> List[str]:
+    def _default_order(self, vendor_name: str) -> List[str]:
         vn = (vendor_name or "").lower()
         if vn in ["cheeksa","cheek","vital"]: return ["brochures","wordpress","generic","vtex","magento"]
         if vn in ["megatone"]: return ["wordpress","generic","magento","vtex"]
         if vn in ["musimundo"]: return ["vtex","magento","wordpress","generic"]
         return ["vtex","magento","wordpress","generic"]
 
+    def _seed_platform(self, vendor_name: str, base: str, log):
+        """Detecta la plataforma desde la home (una vez por PLATFORM_TTL) para sembrar el orden."""
+        _, fresh = self.router.platform(vendor_name)
+        if fresh or not base or not self.client: return
+        try:
+            platform = detect_platform(self.client.get(base.rstrip("/") + "/").text)
+        except Exception as e:
+            if str(e) == "cancelled": return
+            log(f"[{vendor_name}] detección de plataforma falló: {e}")
+            platform = None  # se registra igual para no reintentar en cada término
+        log(f"[{vendor_name}] plataforma detectada: {platform or 'desconocida'}")
+        self.router.set_platform(vendor_name, platform)
+
+    def _detect_platform_order(self, vendor_name: str, base: str = "", log=None) -> List[str]:
+        self._seed_platform(vendor_name, base, log or (lambda *_: None))
+        return self.router.order(vendor_name, self._default_order(vendor_name))
+
     def _search_vendor_once(self, vendor_name: str, base: str, term: str, log):
-        for strat in self._detect_platform_order(vendor_name):
+        """
+        Búsqueda coalescida por (vendedor, término normalizado, modo de caché): si otro hilo
+        (u otro worker, con SINGLEFLIGHT_FILE_LOCKS) ya está buscando lo mismo, se espera y se
+        comparte su resultado. Un líder cancelado no reparte su ND: los que esperaban reintentan.
+        """
+        cancel_cb = self.client.cancel_cb if self.client else (lambda: False)
+        def attempt():
+            res = self._search_vendor_chain(vendor_name, base, term, log)
+            return None if cancel_cb() and not (res and res[1]) else res
+        def recheck():
+            if self.cache_mode != "use": return None
+            for strat in self._detect_platform_order(vendor_name):
+                hit = self.cache.get(vendor_name, term, strat)
+                if hit and hit[0] and hit[1]:
+                    log(f"[{vendor_name}] resuelto por otro worker: {term}")
+                    return Found(*hit, strat, "cache")
+            return None
+        key = (vendor_name, normalize_term(term), self.cache_mode)  # un "refresh" no se conforma con un "use"
+        while True:
+            try:
+                res = self.flights.do(key, attempt, recheck, cancel_cb)
+            except RuntimeError as e:
+                if str(e) != "cancelled": raise
+                res = None
+            if res is not None: return res
+            if cancel_cb(): return None, None
+
+    def _search_vendor_chain(self, vendor_name: str, base: str, term: str, log):
+        read_cache = self.cache_mode == "use"
+        write_cache = self.cache_mode in ("use", "refresh")
+        guard = self.run_guard
+        live = failed = False
+        for strat in self._detect_platform_order(vendor_name, base, log):
+            if guard:
+                if guard.halted(vendor_name): break
+                if guard.skip(vendor_name, strat): continue
+            if read_cache:
+                cached = self.cache.get(vendor_name, term, strat)
+                CACHE_LOOKUPS.inc("miss" if cached is None else ("hit" if cached[0] and cached[1] else "nd"))
+                if cached is not None:
+                    log(f"[{vendor_name}] caché {strat} {term}: {cached[0] or 'ND'}")
+                    if cached[0] and cached[1]: return Found(*cached, strat, "cache")
+                    continue
+            t0, outcome = time.perf_counter(), "error"
             try:
                 if strat == "vtex": log(f"[{vendor_name}] estrategia=VTEX ft={term}"); res = self._try_vtex(base, term, log)
                 elif strat == "magento": log(f"[{vendor_name}] estrategia=Magento q={term}"); res = self._try_magento_html(base, term, log)
                 elif strat == "wordpress": log(f"[{vendor_name}] estrategia=WordPress q={term}"); res = self._try_wordpress(base, term, log)
                 elif strat == "brochures": log(f"[{vendor_name}] estrategia=Folletos term={term}"); res = self._try_brochures(base, term, log)
                 else: log(f"[{vendor_name}] estrategia=Genérico q={term}"); res = self._try_generic(base, term, log)
-                if res and res[0] and res[1]: return res
-            except requests.HTTPError as e:
-                log(f"HTTPError {e}")
+                # solo se cachean respuestas completas (precio o ND); los errores no
+                if write_cache: self.cache.put(vendor_name, term, strat, *(res or (None, None)))
+                won = bool(res and res[0] and res[1])
+                outcome, live = ("hit" if won else "miss"), True
+                self.router.record(vendor_name, strat, won)
+                if guard: guard.ok(vendor_name)
+                if won: return Found(*res, strat, "live")
             except Exception as e:
-                log(f"Error {e}")
-        return None, None
+                log(f"HTTPError {e}" if isinstance(e, requests.HTTPError) else f"Error {e}")
+                if str(e) == "cancelled": outcome = "cancelled"
+                else:
+                    failed = True
+                    self.router.record(vendor_name, strat, False)
+                    msg = guard.failed(vendor_name, strat, e) if guard else None
+                    if msg: log(f"[{vendor_name}] {msg}")
+            finally:
+                self._observe_strategy(vendor_name, strat, outcome, time.perf_counter() - t0)
+        # ND: solo es una observación si alguna estrategia respondió y ninguna se cayó
+        return Found(None, None, None, "error" if failed else ("live" if live else "cache"))
+
+    @staticmethod
+    def _observe_strategy(vendor_name: str, strat: str, outcome: str, seconds: float):
+        STRATEGY_SECONDS.observe(seconds, vendor_name, strat, outcome)
+        run = current_run()
+        if run is not None: run.strategy(vendor_name, strat, outcome, seconds)
 
     def _variants(self, p: Dict) -> List[str]:
         marca = s(p.get("marca")); modelo = s(p.get("modelo"))
@@ -346,25 +652,136 @@ class PriceScraper:
                     out.append(cand); seen.add(cand)
         return out[:10]
 
-    def scrape_all_vendors(self, products: List[Dict], vendors: Dict[str,str], include_official_site: bool=False, return_logs: bool=False, cancel_cb: Optional[Callable[[], bool]]=None):
+    def _prefetch_vendor(self, vendor_name: str, base: str, products: List[Dict], log) -> Dict[int, Tuple[str, str]]:
+        """
+        Precios resueltos antes de la búsqueda término por término: instantánea local del
+        catálogo (por EAN/modelo, solo en modo caché "use") y lote VTEX para el resto.
+        """
+        out: Dict[int, Tuple[str, str]] = {}
+        if self.use_catalog and self.cache_mode == "use" and self.catalog.is_fresh(vendor_name):
+            for i, p in enumerate(products):
+                hit = self.catalog.lookup(vendor_name, s(p.get("ean")), s(p.get("modelo")))
+                if hit: out[i] = Found(f"$ {int(hit[0]):,}".replace(",", ".") + ",00", hit[0], "catalog", "catalog")
+            log(f"[{vendor_name}] catálogo local: {len(out)}/{len(products)} producto(s)")
+        if not self.batch_vtex or self._detect_platform_order(vendor_name, base, log)[:1] != ["vtex"]: return out
+        def cached(p):
+            if self.cache_mode != "use": return False
+            return any((self.cache.get(vendor_name, v, "vtex") or (None,))[0] for v in self._variants(p))
+        idxs = [i for i, p in enumerate(products) if i not in out and not cached(p)]
+        if len(idxs) < 2: return out
+        found = self._vtex_batch(vendor_name, base, [products[i] for i in idxs], log)
+        for j, res in found.items():
+            i = idxs[j]
+            out[i] = Found(*res, "vtex", "batch")
+            vs = self._variants(products[i])
+            if vs and self.cache_mode in ("use", "refresh"): self.cache.put(vendor_name, vs[0], "vtex", *res)
+            self.router.record(vendor_name, "vtex", True)
+        return out
+
+    def _search_product(self, vendor_name: str, base: str, p: Dict, log):
+        sources = set()
+        for term in self._variants(p):
+            if self.client and self.client.cancel_cb(): break
+            res = self._search_vendor_once(vendor_name, base, term, log)
+            if res[0] and res[1]: return res
+            sources.add(getattr(res, "source", None))
+        return Found(None, None, None, "error" if "error" in sources else ("live" if "live" in sources else "cache"))
+
+    def scrape_all_vendors(self, products: List[Dict], vendors: Dict[str,str], include_official_site: bool=False, return_logs: bool=False, cancel_cb: Optional[Callable[[], bool]]=None, max_workers: int=1, per_vendor: int=1,
+                           on_log: Optional[Callable[[str], None]]=None, on_result: Optional[Callable[[int, str, Dict], None]]=None,
+                           vendor_budget: Optional[float]=None, run_id: Optional[str]=None):
+        """
+        Recorre producto × vendedor. Cada vendedor se procesa en `per_vendor` carriles
+        secuenciales (cada uno con su HttpClient y su delay); con max_workers > 1 los
+        carriles de distintos vendedores corren en paralelo, de modo que el tiempo total
+        tiende al del vendedor más lento. El DataFrame resultante es el mismo.
+        on_log(msg) y on_result(idx_producto, vendedor, fila) permiten transmitir logs y
+        precios a medida que se producen. El desglose de tiempos queda en self.last_timings.
+        Un vendedor deja de buscarse si acumula fallas de red seguidas o agota vendor_budget
+        segundos (default VENDOR_TIME_BUDGET); sus productos pendientes quedan como
+        NOT_SEARCHED ("Sin buscar"), distinto de un ND.
+        Cada precio (o ND efectivamente buscado) se agrega al historial con run_id.
+        """
         logs: List[str] = []
-        def log(msg: str): logs.append(msg)
+        def log(msg: str):
+            logs.append(msg)
+            if on_log: on_log(msg)
+        cancel_cb = cancel_cb or (lambda: False)
 
-        self.client = HttpClient(delay_range=self.delay_range, log=log, cancel_cb=cancel_cb)
+        products = list(products or [])
+        vendors = dict(vendors or {})
         date_only = datetime.now().strftime("%d/%m/%Y")
 
+        # filas pre-armadas para conservar el orden de columnas del modo secuencial
         rows = []
-        for p in (products or []):
-            base_row = {"Producto": s(p.get("producto")), "Marca": s(p.get("marca")), "Marca (Sitio oficial)": "ND", "Fecha de Consulta": date_only}
-            row = dict(base_row)
-            for vn, url in (vendors or {}).items():
-                price_txt, price_num = None, None
-                for term in self._variants(p):
-                    price_txt, price_num = self._search_vendor_once(vn, url, term, log)
-                    if price_txt and price_num: break
-                row[vn] = price_txt or "ND"
-                row[f"{vn} (num)"] = price_num or ""  # entero plano sin decimales/separadores
+        for p in products:
+            row = {"Producto": s(p.get("producto")), "Marca": s(p.get("marca")), "Marca (Sitio oficial)": "ND", "Fecha de Consulta": date_only}
+            for vn in vendors:
+                row[vn] = "ND"
+                row[f"{vn} (num)"] = ""  # entero plano sin decimales/separadores
             rows.append(row)
 
+        timings = self.last_timings = RunTimings()
+        guard = self.run_guard = RunGuard(budget=VENDOR_TIME_BUDGET if vendor_budget is None else vendor_budget)
+        run_id = run_id or uuid.uuid4().hex
+
+        # catálogo local y lote VTEX por vendedor: lo hace el primer carril que llega, los demás lo reutilizan
+        prefetched: Dict[str, Dict[int, Tuple[str, str]]] = {}
+        prefetch_locks = {vn: threading.Lock() for vn in vendors}
+        def prefetch(vn: str, url: str):
+            with prefetch_locks[vn]:
+                if vn not in prefetched:
+                    try: prefetched[vn] = self._prefetch_vendor(vn, url, products, log)
+                    except Exception as e:
+                        log(f"[{vn}] lote error: {e}"); prefetched[vn] = {}
+            return prefetched[vn]
+
+        def lane(vn: str, url: str, idxs: List[int]):
+            bind_run(timings)
+            try: run_lane(vn, url, idxs)
+            finally: bind_run(None)
+
+        def run_lane(vn: str, url: str, idxs: List[int]):
+            guard.start(vn)
+            # un vendedor cortado interrumpe también las esperas y pedidos en curso del carril
+            self.client = HttpClient(delay_range=self.delay_range, log=log, cancel_cb=lambda: cancel_cb() or bool(guard.halted(vn)))
+            pre = prefetch(vn, url)
+            skipped = 0
+            for i in idxs:
+                if cancel_cb(): return
+                if i in pre: res = pre[i]
+                elif guard.halted(vn): res = None
+                else: res = self._search_product(vn, url, products[i], log)
+                price_txt, price_num = res or (None, None)
+                if cancel_cb() and not price_num: return  # búsqueda interrumpida: no es un ND real
+                if not price_num and guard.halted(vn):
+                    # vendedor cortado: el producto no se buscó (o quedó a medias), no es un ND
+                    skipped += 1
+                    rows[i][vn] = NOT_SEARCHED
+                else:
+                    # solo consultas al sitio: lo cacheado, el catálogo local o el lote VTEX repetirían
+                    # observaciones viejas, y un ND por error o timeout no dice nada del precio
+                    if self.history and getattr(res, "source", None) == "live":
+                        try: self.history.record(products[i], vn, price_txt, price_num, getattr(res, "strategy", None), run_id)
+                        except Exception as e: log(f"[{vn}] historial: {e}")
+                    rows[i][vn] = price_txt or "ND"
+                rows[i][f"{vn} (num)"] = price_num or ""
+                if on_result:
+                    on_result(i, vn, {k: rows[i][k] for k in ("Producto", "Marca", "Marca (Sitio oficial)", "Fecha de Consulta", vn, f"{vn} (num)")})
+            if skipped: log(f"[{vn}] {skipped} producto(s) sin buscar: {guard.halted(vn)}")
+
+        n_lanes = max(1, min(int(per_vendor or 1), len(products) or 1))
+        lanes = [(vn, url, list(range(k, len(products), n_lanes))) for vn, url in vendors.items() for k in range(n_lanes)]
+        lanes = [ln for ln in lanes if ln[2]]
+        workers = max(1, min(int(max_workers or 1), len(lanes) or 1))
+        if workers == 1:
+            for ln in lanes: lane(*ln)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as ex:
+                for fut in [ex.submit(lane, *ln) for ln in lanes]:
+                    fut.result()
+
+        timings.vendors = guard.as_dict()
+        import pandas as pd  # diferido: ~50 MB que un worker sin scrapings no necesita
         df = pd.DataFrame(rows)
         return (df, logs) if return_logs else (df, [])
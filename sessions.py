@@ -0,0 +1,117 @@
+# sessions.py
+# Pool de sesiones HTTP por dominio, compartido por todo el proceso (keep-alive entre
+# instancias de PriceScraper) y memoria de qué dominios requieren curl_cffi.
+import os, time, threading
+from contextlib import contextmanager
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from ratelimit import host_of
+from settings import env_int
+
+if TYPE_CHECKING:
+    import requests
+
+# Opcional: curl_cffi para reducir 403 por fingerprint (si está disponible). requests y
+# curl_cffi se importan con la primera sesión, no al arrancar el worker.
+HAVE_CURLCFFI = find_spec("curl_cffi") is not None
+
+IMPERSONATE = os.getenv("CURL_IMPERSONATE", "chrome124")
+POOL_MAXSIZE = env_int("HTTP_POOL_MAXSIZE", 16)          # conexiones keep-alive por dominio
+IMPERSONATION_TTL = env_int("IMPERSONATION_TTL", 6 * 3600)
+HTTP2 = os.getenv("CURL_HTTP2", "1") not in ("0", "false", "no")
+
+class SessionPool:
+    def __init__(self, pool_maxsize: int = POOL_MAXSIZE, http2: bool = HTTP2):
+        self.pool_maxsize = pool_maxsize
+        self.http2 = http2
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._sessions: Dict[str, "requests.Session"] = {}
+        self._curl: Dict[str, List] = {}
+        self._headers: Dict[str, dict] = {}
+        self._impersonate: Dict[str, float] = {}
+        self.stats = {"sessions": 0, "curl_sessions": 0, "impersonated": 0}
+
+    def _check_fork(self):
+        # las conexiones abiertas no sobreviven a un fork (p. ej. gunicorn --preload)
+        if self._pid != os.getpid(): self._reset()
+
+    def session(self, url: str) -> "requests.Session":
+        """requests.Session por host, segura para GETs concurrentes (no se mutan sus headers)."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        host = host_of(url)
+        with self._lock:
+            self._check_fork()
+            s = self._sessions.get(host)
+            if s is None:
+                s = requests.Session()
+                ad = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                s.mount("https://", ad); s.mount("http://", ad)
+                self._sessions[host] = s
+                self.stats["sessions"] += 1
+            return s
+
+    def _new_curl(self):
+        from curl_cffi import requests as curl_requests
+        kw = {"impersonate": IMPERSONATE}
+        if self.http2:
+            try:
+                from curl_cffi import CurlHttpVersion
+                kw["http_version"] = CurlHttpVersion.V2TLS
+            except Exception:
+                pass
+        try:
+            return curl_requests.Session(**kw)
+        except TypeError:
+            return curl_requests.Session()
+
+    @contextmanager
+    def curl_session(self, url: str):
+        """Presta una sesión curl_cffi del host (no son thread-safe: una por hilo a la vez)."""
+        if not HAVE_CURLCFFI: raise RuntimeError("curl_cffi no disponible")
+        host = host_of(url)
+        with self._lock:
+            self._check_fork()
+            free = self._curl.setdefault(host, [])
+            s = free.pop() if free else None
+        if s is None:
+            s = self._new_curl()
+            with self._lock: self.stats["curl_sessions"] += 1
+        try:
+            yield s
+        finally:
+            with self._lock:
+                if self._pid == os.getpid(): self._curl.setdefault(host, []).append(s)
+
+    def headers(self, url: str, factory: Callable[[str], dict]) -> dict:
+        """Headers de navegador estables por host (mismo UA durante toda la vida de la conexión)."""
+        host = host_of(url)
+        with self._lock:
+            self._check_fork()
+            h = self._headers.get(host)
+            if h is None:
+                base = url.split("/", 3)
+                h = self._headers[host] = factory("/".join(base[:3]) if len(base) >= 3 else url)
+            return h
+
+    def needs_impersonation(self, url: str) -> bool:
+        until = self._impersonate.get(host_of(url))
+        return bool(until and until > time.time())
+
+    def mark_impersonation(self, url: str):
+        with self._lock:
+            self._impersonate[host_of(url)] = time.time() + IMPERSONATION_TTL
+            self.stats["impersonated"] += 1
+
+    def state(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {**self.stats, "hosts": sorted(self._sessions),
+                    "impersonation": sorted(h for h, t in self._impersonate.items() if t > now)}
+
+SESSION_POOL = SessionPool()
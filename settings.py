@@ -0,0 +1,20 @@
+# settings.py
+# Rutas y parámetros compartidos (configurables por variables de entorno).
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv("SCRAPER_DATA_DIR", str(BASE_DIR / "data")))  # EB: /var/app/data (01_python.config); el default se pierde en cada deploy
+
+def env_int(name: str, default: int) -> int:
+    try: return int(os.getenv(name, default))
+    except (TypeError, ValueError): return default
+
+def env_float(name: str, default: float) -> float:
+    try: return float(os.getenv(name, default))
+    except (TypeError, ValueError): return default
+
+def data_path(*parts) -> Path:
+    p = DATA_DIR.joinpath(*parts)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    return p
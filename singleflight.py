@@ -0,0 +1,125 @@
+# singleflight.py
+# Coalescencia de búsquedas idénticas simultáneas: la primera llamada para una clave
+# (vendedor, término normalizado, modo de caché) ejecuta la búsqueda y las demás esperan
+# su resultado. Entre workers de gunicorn, opcionalmente, un lock de archivo por franja de
+# claves hace que el segundo worker espere y vuelva a mirar la caché antes de salir a la red.
+import os, time, zlib, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional
+
+from settings import DATA_DIR, env_int
+
+try:
+    import fcntl
+    HAVE_FCNTL = True
+except Exception:  # Windows
+    HAVE_FCNTL = False
+
+FILE_LOCKS = os.getenv("SINGLEFLIGHT_FILE_LOCKS", "0") in ("1", "true", "yes")
+LOCK_STRIPES = env_int("SINGLEFLIGHT_STRIPES", 256)
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, file_locks: bool = FILE_LOCKS, lock_dir: Optional[Path] = None, stripes: int = LOCK_STRIPES):
+        self.file_locks = file_locks and HAVE_FCNTL
+        self.lock_dir = lock_dir
+        self.stripes = max(1, stripes)
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._held: Dict[int, List[int]] = {}  # franja → [fd, líderes de este proceso que la usan]
+        self.stats = {"leaders": 0, "shared": 0, "rechecked": 0}
+
+    @contextmanager
+    def _file_lock(self, key: Hashable, cancel_cb: Callable[[], bool]):
+        """
+        flock no bloqueante con sondeo (se puede cancelar); se libera solo si el proceso muere.
+        La franja excluye solo a otros procesos: si ya la tiene otro líder de este worker
+        (otra clave con el mismo hash) se comparte en vez de esperarlo.
+        """
+        if self.lock_dir is None: self.lock_dir = DATA_DIR / "locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        stripe = zlib.crc32(repr(key).encode("utf-8")) % self.stripes
+        fd: Optional[int] = os.open(str(self.lock_dir / f"sf-{stripe:03d}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                with self._lock:
+                    held = self._held.get(stripe)
+                    if held:
+                        held[1] += 1
+                        break
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        self._held[stripe], fd = [fd, 1], None
+                        break
+                    except BlockingIOError:
+                        pass
+                if cancel_cb(): raise RuntimeError("cancelled")
+                time.sleep(0.2)
+        finally:
+            if fd is not None: os.close(fd)
+        try:
+            yield
+        finally:
+            with self._lock:
+                held = self._held[stripe]
+                held[1] -= 1
+                if not held[1]:
+                    del self._held[stripe]
+                    fcntl.flock(held[0], fcntl.LOCK_UN)
+                    os.close(held[0])
+
+    def do(self, key: Hashable, fn: Callable[[], object], recheck: Optional[Callable[[], object]] = None,
+           cancel_cb: Optional[Callable[[], bool]] = None):
+        """
+        Resultado de fn() compartido por las llamadas concurrentes con la misma clave.
+        recheck() (p. ej. la caché) se consulta tras obtener el lock entre procesos; si
+        devuelve algo distinto de None se usa en lugar de fn(). Un seguidor cancelado
+        devuelve None sin esperar al líder.
+        """
+        cancel_cb = cancel_cb or (lambda: False)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                self.stats["shared"] += 1
+        if not leader:
+            while not call.done.wait(0.5):
+                if cancel_cb(): return None
+            if call.error is not None: raise call.error
+            return call.result
+        try:
+            if self.file_locks:
+                with self._file_lock(key, cancel_cb):
+                    res = recheck() if recheck else None
+                    if res is not None:
+                        with self._lock: self.stats["rechecked"] += 1
+                    else:
+                        res = fn()
+            else:
+                res = fn()
+            call.result = res
+            return res
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock: self._calls.pop(key, None)
+            call.done.set()
+
+    def state(self) -> dict:
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._calls), "file_locks": self.file_locks}
+
+FLIGHTS = SingleFlight()
@@ -65,6 +65,7 @@ document.getElementById("clearResults")?.addEventListener("click", ()=>{
   resultsBody.innerHTML = ""; resultsStore = []; runLog.textContent = "";
 });
 document.getElementById("toCSV").onclick        = exportCSV;
+document.getElementById("toXLSX").onclick       = exportXLSX;
 document.getElementById("copyTable").onclick    = copyTable;
 document.getElementById("toSheets").onclick     = exportToSheets;
 
@@ -324,7 +325,6 @@ async function stopSearch(){
     }
   }
 }
-function newRunId(){ return Math.random().toString(36).slice(2) + Date.now().toString(36); }
 
 async function runSearch(){
   const allProducts = collectProducts();
@@ -339,51 +339,121 @@ async function runSearch(){
   runLog.textContent = ""; resultsStore = []; resultsBody.innerHTML = "";
   setStatus("Ejecutando búsqueda...");
   abortRun = false;
-  currentRunId = newRunId();
+  currentRunId = null;
 
   logLine(timeGreeting("Alberto"), "ok");
-  logLine(`Lote de ${products.length} producto(s), ${Object.keys(allVendors).length} vendedor(es). run_id=${currentRunId}`, "warn");
 
   const immediateSel = document.getElementById("immediate");
   const immediate = immediateSel ? immediateSel.value === "true" : true;
 
-  for (const [name, url] of Object.entries(allVendors)){
-    if (abortRun){ logLine("Ejecución detenida por el usuario.", "err"); break; }
-    if (!name) continue;
-    logLine(`Iniciando ${name} …`, "warn");
-    try{
-      const payload = {
-        run_id: currentRunId,
-        products,
-        vendor: { name, url },
-        headless: document.getElementById("headless").value === "true",
-        min_delay: parseInt(document.getElementById("minDelay").value || "2", 10),
-        max_delay: parseInt(document.getElementById("maxDelay").value || "5", 10),
-        include_official: document.getElementById("official").value === "true"
-      };
-      const data = await safeJsonFetch(`${API_BASE}/api/scrape_vendor`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload)
-      });
-      if (!data.success) throw new Error(data.error || `Falló ${name}`);
+  const payload = {
+    products,
+    vendors: allVendors,
+    headless: document.getElementById("headless").value === "true",
+    min_delay: parseInt(document.getElementById("minDelay").value || "2", 10),
+    max_delay: parseInt(document.getElementById("maxDelay").value || "5", 10),
+    include_official: document.getElementById("official").value === "true",
+    cache: document.getElementById("cacheMode")?.value || "use"
+  };
 
-      if (immediate){
-        (data.rows || []).forEach(r => ensureRowAndSetCell(r, name));
-      }
+  let job;
+  try{
+    job = await safeJsonFetch(`${API_BASE}/api/jobs`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload)
+    });
+    if (!job.success) throw new Error(job.error || "No se pudo crear el trabajo");
+  }catch(e){
+    logLine(`ERROR: ${e.message}`, "err");
+    setStatus("Error");
+    return;
+  }
+  currentRunId = job.run_id;
+  const total = products.length * Object.keys(allVendors).length;
+  logLine(`Lote de ${products.length} producto(s), ${Object.keys(allVendors).length} vendedor(es). run_id=${currentRunId}`, "warn");
 
-      mergeRows(data.rows || []);
-      if (!immediate) renderFull();
+  const status = await streamJob(job.events_url, job.status_url, total, (vendor, row) => {
+    if (immediate) ensureRowAndSetCell(row, vendor);
+    mergeRows([row]);
+    if (!immediate) renderFull();
+  });
 
-      (data.log || []).forEach(line => logLine(line));
-      logLine(`OK ${name}`, "ok");
-    }catch(e){
-      logLine(`ERROR ${name}: ${e.message}`, "err");
-    }
-  }
+  const cancelled = abortRun || status === "cancelled";
+  setStatus(cancelled ? "Cancelado" : status === "error" ? "Error" : "Completado");
+  logLine(cancelled ? "Lote cancelado." : "Lote finalizado.", cancelled ? "err" : "ok");
+}
+
+/* Eventos del trabajo (SSE): filas y logs a medida que se producen */
+const STREAM_MAX_RETRIES = 5;
+function streamJob(eventsUrl, statusUrl, total, onRow){
+  return new Promise(resolve => {
+    let done = 0, lastSeq = 0, errors = 0, finished = false;
+    const handle = (kind, data) => {
+      if (kind === "row"){
+        onRow(data.vendor, data.row);
+        done++;
+        setStatus(`Ejecutando búsqueda... ${done}/${total}`);
+      } else if (kind === "log"){
+        logLine(data);
+      } else if (kind === "end"){
+        if (data.error) logLine(`ERROR: ${data.error}`, "err");
+        finish(data.status);
+      }
+    };
+    const finish = (status) => {
+      if (finished) return;
+      finished = true; es.close(); resolve(status);
+    };
+    // trabajo terminado sin evento "end" (p. ej. worker reiniciado): se leen los eventos que
+    // falten en NDJSON (el servidor corta al llegar al final) y se cierra con su estado
+    const drain = async (status) => {
+      try{
+        const res = await fetch(`${API_BASE}${eventsUrl}?format=ndjson&after=${lastSeq}`);
+        for (const line of (await res.text()).split("\n")){
+          if (!line.trim() || finished) continue;
+          const ev = JSON.parse(line); lastSeq = ev.seq; handle(ev.type, ev.data);
+        }
+      }catch(e){ logLine(`ERROR: ${e.message}`, "err"); }
+      finish(status);
+    };
+    // sin stream: se consulta el estado hasta que el trabajo termine
+    const poll = async () => {
+      while (!finished){
+        try{
+          const st = await safeJsonFetch(`${API_BASE}${statusUrl}`);
+          if (["done", "error", "cancelled"].includes(st.status)){ await drain(st.status); return; }
+          setStatus(`Ejecutando búsqueda... ${st.done}/${st.total}`);
+        }catch(e){
+          logLine(`ERROR: ${e.message}`, "err"); finish("error"); return;
+        }
+        await new Promise(r => setTimeout(r, 2000));
+      }
+    };
 
-  setStatus(abortRun ? "Cancelado" : "Completado");
-  logLine(abortRun ? "Lote cancelado." : "Lote finalizado.", abortRun ? "err" : "ok");
+    const es = new EventSource(`${API_BASE}${eventsUrl}`);
+    for (const kind of ["row", "log", "end"]){
+      es.addEventListener(kind, (e) => {
+        errors = 0;
+        lastSeq = parseInt(e.lastEventId || lastSeq, 10) || lastSeq;
+        handle(kind, JSON.parse(e.data));
+      });
+    }
+    // EventSource reconecta solo (con Last-Event-ID), pero si el servidor cierra sin "end"
+    // reintentaría para siempre: tras cada error se mira el estado y, pasado el tope, se sondea
+    es.onerror = async () => {
+      if (finished) return;
+      if (es.readyState === EventSource.CLOSED || ++errors >= STREAM_MAX_RETRIES){
+        es.close(); poll(); return;
+      }
+      try{
+        const st = await safeJsonFetch(`${API_BASE}${statusUrl}`);
+        if (["done", "error", "cancelled"].includes(st.status)){ es.close(); await drain(st.status); }
+      }catch(e){
+        es.close(); poll();
+      }
+    };
+  });
 }
 
 /* Fetch robusto */
@@ -414,13 +484,23 @@ function exportCSV(){
   const blob = new Blob([lines.join("\n")], { type: "text/csv;charset=utf-8" });
   const a = document.createElement("a"); a.href = URL.createObjectURL(blob); a.download = "comparacion_precios.csv"; a.click();
 }
+async function exportXLSX(){
+  if (!resultsStore.length){ alert("Sin datos"); return; }
+  const res = await fetch(`${API_BASE}/api/export`, {
+    method:"POST", headers:{ "Content-Type":"application/json" },
+    body: JSON.stringify({ rows: resultsStore, format: "xlsx" })
+  });
+  if (!res.ok){ alert(`Error al exportar: HTTP ${res.status}`); return; }
+  const blob = await res.blob();
+  const a = document.createElement("a"); a.href = URL.createObjectURL(blob); a.download = "comparacion_precios.xlsx"; a.click();
+}
 async function exportToSheets(){
   if (!resultsStore.length){ alert("Sin datos"); return; }
-  await safeJsonFetch(`${API_BASE}/api/export/sheets`, { 
+  const out = await safeJsonFetch(`${API_BASE}/api/export/sheets`, { 
     method:"POST", headers:{ "Content-Type":"application/json" }, 
     body: JSON.stringify({ rows: resultsStore, sheet_name: (document.getElementById("sheetName")?.value || "Comparación Precios Electrodomésticos") })
   });
-  alert("Exportado a Google Sheets");
+  alert(out.url ? `Exportado a Google Sheets: ${out.url}` : "Exportado a Google Sheets");
 }
 function copyTable(){
   const sel = window.getSelection(); const range = document.createRange();
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# Los módulos se importan desde la raíz del repo; las bases SQLite de los singletons van a
+# un directorio temporal (cada test usa además sus propias rutas vía tmp_path).
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SCRAPER_DATA_DIR", tempfile.mkdtemp(prefix="scraper-tests-"))
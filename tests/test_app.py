@@ -0,0 +1,45 @@
+import io, json, os, subprocess, sys
+
+import pytest
+
+import app as app_module
+from conftest import ROOT
+
+@pytest.fixture
+def client(monkeypatch):
+    def no_scraper(**kw): raise AssertionError("la validación no debe crear el scraper")
+    monkeypatch.setattr(app_module, "new_scraper", no_scraper)
+    return app_module.app.test_client()
+
+def _upload(client, options, body=b"producto,marca\n"):
+    return client.post("/api/batches", data={"file": (io.BytesIO(body), "lote.csv"), "options": json.dumps(options)},
+                       content_type="multipart/form-data")
+
+def test_parse_scrape_options():
+    scraper_kw, kwargs = app_module.parse_scrape_options({"cache": "refresh", "min_delay": "1", "vendor_budget": "30"})
+    assert scraper_kw["cache_mode"] == "refresh" and scraper_kw["delay_range"] == (1, 5)
+    assert kwargs["vendor_budget"] == 30.0
+    with pytest.raises(ValueError):
+        app_module.parse_scrape_options({"cache": "nope"})
+    with pytest.raises(ValueError):
+        app_module.parse_scrape_options({"max_workers": "muchos"})
+
+def test_create_batch_rejects_bad_options(client):
+    r = _upload(client, {"cache": "nope"})
+    assert r.status_code == 400 and "cache" in r.get_json()["error"]
+
+def test_create_batch_validates_without_scraper(client):
+    # opciones válidas y archivo sin productos: se corta antes de encolar, sin haber creado el scraper
+    r = _upload(client, {"cache": "use"})
+    assert r.status_code == 400 and "no tiene productos" in r.get_json()["error"]
+
+def test_create_batch_does_not_import_scraper(tmp_path):
+    code = ("import io, sys, app\n"
+            "r = app.app.test_client().post('/api/batches', content_type='multipart/form-data',\n"
+            "    data={'file': (io.BytesIO(b'producto\\n'), 'x.csv'), 'options': '{\"cache\": \"use\"}'})\n"
+            "assert r.status_code == 400, r.status_code\n"
+            "print(sorted(m for m in ('scraper', 'requests', 'bs4', 'pandas') if m in sys.modules))\n")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                         env={**os.environ, "SCRAPER_DATA_DIR": str(tmp_path)}, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,34 @@
+import json, importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+_spec = importlib.util.spec_from_file_location("bench_run", ROOT / "bench" / "run.py")
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+def _result(scenario, lps, p95, mode="scraper"):
+    return {"scenario": scenario, "mode": mode, "lookups_per_s": lps, "p95_ms": p95}
+
+def test_pct():
+    assert bench.pct([], 0.95) == 0.0
+    assert bench.pct([3, 1, 2], 0.5) == 2
+    assert bench.pct(list(range(1, 101)), 0.95) == 95
+    assert bench.pct([5], 0.95) == 5
+
+def test_compare_flags_regressions(tmp_path):
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps({"results": [_result("vtex", 100, 50), _result("woo", 10, 200),
+                                            _result("magento", 10, 20), {"scenario": "ocr", "mode": "scraper", "error": "x"}]}))
+    now = [_result("vtex", 70, 50), _result("woo", 9, 300), _result("magento", 10, 24),
+           _result("ocr", 1, 9999), _result("vtex", 1, 1, mode="jobs")]
+    assert bench.compare(now, str(base), 0.25) == [
+        "vtex/scraper: búsq/s 100 → 70",
+        "woo/scraper: p95 200 ms → 300 ms",
+    ]  # magento: +20 % y +4 ms está dentro de la tolerancia; sin base para ocr ni jobs
+
+def test_scenarios_offline(tmp_path):
+    out = tmp_path / "r.json"
+    assert bench.main(["--products", "3", "--scenarios", "vtex,woo", "--json", str(out)]) == 0
+    results = json.loads(out.read_text(encoding="utf-8"))["results"]
+    assert [(r["scenario"], r["lookups"], r["found"]) for r in results] == [("vtex", 3, 3), ("woo", 3, 3)]
+    assert bench.main(["--products", "3", "--scenarios", "vtex", "--compare", str(out), "--tolerance", "100"]) == 0
@@ -0,0 +1,62 @@
+import socket
+
+import requests
+
+from breaker import NOT_SEARCHED, RunGuard, StrategyUnavailable, is_transport_error
+
+def _http_error(code):
+    resp = requests.Response(); resp.status_code = code
+    return requests.HTTPError(f"HTTP {code}", response=resp)
+
+def test_transport_failures_halt_vendor_and_ok_resets():
+    g = RunGuard(failures=3, budget=0)
+    g.failed("V", "vtex", requests.ConnectionError("down"))
+    g.failed("V", "vtex", _http_error(503))
+    g.ok("V")
+    assert g.failed("V", "magento", requests.Timeout()) is None
+    assert g.failed("V", "magento", requests.Timeout()) is None
+    assert "vendedor cortado" in g.failed("V", "magento", requests.Timeout())
+    assert g.halted("V").startswith("3 fallas seguidas")
+    assert g.halted("Otro") is None
+
+def test_missing_endpoint_drops_strategy_not_vendor():
+    g = RunGuard(failures=2, budget=0)
+    assert "descartada" in g.failed("V", "vtex", _http_error(404))
+    assert g.failed("V", "generic", StrategyUnavailable("sin rutas"))
+    assert g.skip("V", "vtex") == "HTTP 404" and g.skip("V", "magento") is None
+    assert g.halted("V") is None
+
+def test_time_budget_halts_vendor():
+    now = [100.0]
+    g = RunGuard(failures=5, budget=30, clock=lambda: now[0])
+    g.start("V")
+    now[0] += 29
+    assert g.halted("V") is None
+    now[0] += 2
+    assert "presupuesto" in g.halted("V")
+    assert g.as_dict()["V"]["halted"]
+
+def test_transport_errors():
+    assert is_transport_error(requests.ConnectionError("down")) and is_transport_error(_http_error(403))
+    assert not is_transport_error(_http_error(404)) and not is_transport_error(RuntimeError("cancelled"))
+    assert not is_transport_error(ValueError("json inválido"))  # error de la estrategia, no del sitio
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+def test_halted_vendor_cells_are_not_searched_not_nd(tmp_path):
+    from history import PriceHistory
+    from scraper import PriceScraper
+    products = [{"producto": f"Heladera {i}", "marca": "Drean", "modelo": f"HD{i:03d}", "capacidad": "", "ean": ""} for i in range(5)]
+    history = PriceHistory(tmp_path / "history.sqlite3")
+    scraper = PriceScraper(delay_range=(0, 0), cache_mode="bypass", history=history)
+    seen = []
+    df, logs = scraper.scrape_all_vendors(products, {"Caido": _closed_port_url()}, return_logs=True,
+                                          on_result=lambda i, vn, row: seen.append(row[vn]), vendor_budget=0)
+    assert set(df["Caido"]) == {NOT_SEARCHED}
+    assert seen == [NOT_SEARCHED] * 5
+    assert scraper.last_timings.vendors["Caido"]["halted"]
+    assert any("sin buscar" in line for line in logs)
+    assert history.stats()["observations"] == 0  # no es una observación de precio
@@ -0,0 +1,65 @@
+import os, re, time
+
+import brochures
+from brochures import WINDOW, BrochureIndex, TextIndex
+
+PRICE = re.compile(r"\$\s?\d[\d\.]*")
+FILLER = " relleno" * (WINDOW // 4)
+
+def test_positions_match_substrings_of_tokens():
+    idx = TextIndex("Heladera NOFROST Gafa  heladeras", PRICE)
+    assert idx.positions("heladera") == [0, 23]
+    assert idx.positions("frost") == [11]
+    assert idx.positions("whirlpool") == []
+
+def test_price_near_every_token():
+    text = f"Lavarropas Drean $ 500.000{FILLER} Heladera Gafa HGF358 $ 850.000{FILLER} Gafa $ 1"
+    idx = TextIndex(text, PRICE)
+    assert idx.find_price(["gafa hgf358"]) == "$ 850.000"
+    assert idx.find_price(["drean"]) == "$ 500.000"
+    assert idx.find_price(["Próxima"]) is None
+
+def test_tokens_far_apart_do_not_match():
+    idx = TextIndex(f"Gafa{FILLER}{FILLER} HGF358 $ 850.000", PRICE)
+    assert idx.find_price(["hgf358"]) == "$ 850.000"
+    assert idx.find_price(["gafa hgf358"]) is None
+
+class Site:
+    """Cliente falso: un PDF con ETag que responde 304 a If-None-Match."""
+    def __init__(self, body=b"%PDF-1.4 folleto"):
+        self.body, self.seen = body, []
+    def get(self, url, timeout=None, headers=None):
+        self.seen.append((headers or {}).get("If-None-Match"))
+        code = 304 if (headers or {}).get("If-None-Match") == '"v1"' else 200
+        return type("R", (), {"status_code": code, "content": b"" if code == 304 else self.body, "headers": {"etag": '"v1"'}})()
+
+def _find(idx, site, to_text=lambda c, u: f"Heladera Gafa $ 850.000 {'x' * 200}"):
+    return idx.find_price("https://v.com/f.pdf", site, ["gafa"], to_text, PRICE, lambda m: None)
+
+def test_304_without_text_refetches_body(tmp_path, monkeypatch):
+    idx, site = BrochureIndex(tmp_path), Site()
+    assert _find(idx, site) == "$ 850.000"
+    for p in tmp_path.glob("*.txt"): p.unlink()  # podado
+    monkeypatch.setattr(brochures, "CHECK_TTL", 0)
+    assert _find(BrochureIndex(tmp_path), site) == "$ 850.000"
+    assert site.seen == [None, '"v1"', None]  # el 304 no alcanza: se vuelve a pedir sin validadores
+
+def test_non_pdf_is_remembered(tmp_path, monkeypatch):
+    monkeypatch.setattr(brochures, "HAVE_PDFIUM", True)
+    def broken(path): raise ValueError("no es PDF")
+    monkeypatch.setattr(brochures, "page_count", broken)
+    idx, site = BrochureIndex(tmp_path), Site(b"<html>error</html>")
+    assert _find(idx, site, lambda c, u: "") is None
+    assert _find(idx, site, lambda c, u: "") is None and len(site.seen) == 1  # negativo hasta revalidar
+
+def test_prune_by_age_and_size(tmp_path):
+    idx, now = BrochureIndex(tmp_path), time.time()
+    for i, (name, age) in enumerate([("a", 0), ("b", 10), ("c", 100)]):
+        for ext in ("pdf", "txt"):
+            p = tmp_path / f"{name * 64}.{ext}"
+            p.write_bytes(b"x" * 100)
+            os.utime(p, (now - age - i, now - age - i))
+    (tmp_path / "pdf-viejo.json").write_text("{}"); os.utime(tmp_path / "pdf-viejo.json", (now - 100, now - 100))
+    assert idx.prune(max_age=50, max_bytes=10_000) == 2  # "c" y el metadato vencido
+    assert idx.prune(max_age=50, max_bytes=300) == 1     # "b" es el menos usado de los que quedan
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a" * 64 + ".pdf", "a" * 64 + ".txt"]
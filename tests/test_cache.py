@@ -0,0 +1,65 @@
+import pytest
+
+from cache import ResultCache, normalize_term
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path / "cache.sqlite3", ttl_hit=3600, ttl_miss=60, max_entries=5)
+
+def test_normalize_term():
+    assert normalize_term("  Heladera   NO FROST Gafa ") == "heladera no frost gafa"
+    assert normalize_term("Lavarropas Drean Próxima") == "lavarropas drean proxima"
+
+def test_hit_nd_and_miss(cache):
+    assert cache.get("Frávega", "heladera", "vtex") is None
+    cache.put("Frávega", "Heladera ", "vtex", "$ 1.000", "1000")
+    cache.put("Frávega", "heladera", "magento", None, None)
+    assert cache.get("Frávega", "HELADERA", "vtex") == ("$ 1.000", "1000")
+    assert cache.get("Frávega", "heladera", "magento") == (None, None)  # ND cacheado
+    assert cache.get("Naldo", "heladera", "vtex") is None
+    st = cache.stats()
+    assert (st["entries"], st["prices"], st["nd"]) == (2, 1, 1)
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite3", ttl_hit=-1, ttl_miss=-1)
+    cache.put("Naldo", "tv", "vtex", "$ 10", "10")
+    assert cache.get("Naldo", "tv", "vtex") is None
+
+def test_lru_eviction_keeps_recently_used(cache):
+    for i in range(99): cache.put("V", f"t{i}", "vtex", "$ 1", "1")
+    assert cache.get("V", "t0", "vtex")  # t0 vuelve a ser reciente
+    cache.put("V", "t99", "vtex", "$ 1", "1")  # la escritura 100 dispara la expulsión
+    kept = {f"t{i}" for i in range(100) if cache.get("V", f"t{i}", "vtex")}
+    assert kept == {"t0", "t96", "t97", "t98", "t99"}
+
+def test_clear_by_vendor(cache):
+    cache.put("A", "x", "vtex", "$ 1", "1"); cache.put("B", "x", "vtex", "$ 2", "2")
+    cache.clear("A")
+    assert cache.get("A", "x", "vtex") is None and cache.get("B", "x", "vtex")
+
+@pytest.mark.parametrize("mode, calls, stored", [("use", 1, True), ("refresh", 2, True), ("bypass", 2, False)])
+def test_scraper_cache_modes(tmp_path, monkeypatch, mode, calls, stored):
+    from scraper import PriceScraper
+    cache = ResultCache(tmp_path / "cache.sqlite3")
+    sc = PriceScraper(cache_mode=mode, cache=cache, record_history=False)
+    seen = []
+    monkeypatch.setattr(sc, "_detect_platform_order", lambda *a: ["vtex"])
+    monkeypatch.setattr(sc, "_try_vtex", lambda base, term, log: seen.append(term) or ("$ 5", "5"))
+    for _ in range(2):
+        assert tuple(sc._search_vendor_chain("V", "https://v.example", "Heladera", lambda m: None)) == ("$ 5", "5")
+    assert len(seen) == calls
+    assert (cache.get("V", "heladera", "vtex") is not None) == stored
+
+def test_refresh_does_not_share_a_cached_search(tmp_path, monkeypatch):
+    # un "refresh" que coincide con un "use" del mismo término sale a la red igual
+    from scraper import PriceScraper
+    from singleflight import SingleFlight
+    cache, flights = ResultCache(tmp_path / "cache.sqlite3"), SingleFlight(file_locks=False)
+    keys = []
+    do = flights.do
+    monkeypatch.setattr(flights, "do", lambda key, *a: keys.append(key) or do(key, *a))
+    for mode in ("use", "refresh"):
+        sc = PriceScraper(cache_mode=mode, cache=cache, flights=flights, record_history=False)
+        monkeypatch.setattr(sc, "_search_vendor_chain", lambda *a: ("$ 5", "5"))
+        sc._search_vendor_once("V", "https://v.example", "Heladera ", lambda m: None)
+    assert keys == [("V", "heladera", "use"), ("V", "heladera", "refresh")]
@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from catalog import CatalogStore, model_keys
+
+@pytest.fixture
+def store(tmp_path):
+    return CatalogStore(tmp_path / "catalog.sqlite3")
+
+def _item(sku, price, model="HGF-358", ean="7791234567890"):
+    return {"sku": sku, "ean": ean, "brand": "Gafa", "model": model, "title": f"Heladera Gafa {model}", "price": price,
+            "keys": model_keys(model)}
+
+def test_model_keys():
+    assert model_keys("HGF-358", "Heladera Gafa HGF358 (blanca)") == ["hgf358", "heladeragafahgf358blanca"]
+
+def test_sync_is_incremental_and_removes_missing(store):
+    t0 = store.begin("Naldo", "https://naldo.com.ar", "vtex")
+    assert store.upsert("Naldo", [_item("1", "1000"), _item("2", "2000", "LW-80", "")]) == 2
+    store.finish("Naldo", t0, "done", items=2, changed=2)
+    time.sleep(0.01)
+    t1 = store.begin("Naldo", "https://naldo.com.ar", "vtex")
+    assert store.upsert("Naldo", [_item("1", "1000")]) == 0  # sin cambios: no se reescribe
+    assert store.finish("Naldo", t1, "done", items=1) == 1    # "2" ya no está publicado
+    assert store.lookup("Naldo", model="LW-80") is None
+    assert store.is_fresh("Naldo") and not store.is_fresh("Vital")
+
+def test_lookup_by_ean_then_model(store):
+    store.upsert("Naldo", [_item("1", "1000")])
+    assert store.lookup("Naldo", ean="779-1234567890")[0] == "1000"
+    assert store.lookup("Naldo", model="hgf 358")[1]["sku"] == "1"
+    store.upsert("Naldo", [_item("9", "1500", ean="")])
+    assert store.lookup("Naldo", model="HGF358") is None  # mismo modelo con precios distintos
+
+def test_failed_sync_keeps_last_good_snapshot(store):
+    t0 = store.begin("Naldo", "b", "vtex"); store.finish("Naldo", t0, "done")
+    t1 = store.begin("Naldo", "b", "vtex"); store.finish("Naldo", t1, "error", error="timeout")
+    assert store.last_sync("Naldo")["status"] == "error" and store.is_fresh("Naldo")
@@ -0,0 +1,133 @@
+import csv, io
+
+import pytest
+
+import export
+from export import HAVE_OPENPYXL, columns_for, export_to_sheets, iter_csv, iter_xlsx, rows_from_job, with_backoff
+from jobs import JobStore
+
+# ---------------- cliente de Sheets en memoria ----------------
+class StubAPIError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"stub API error {status}")
+        self.response = type("R", (), {"status_code": status})()
+
+class SpreadsheetNotFound(Exception):
+    pass
+
+class StubWorksheet:
+    def __init__(self, sheet):
+        self.sheet, self.title, self.rows, self.cols = sheet, "Hoja 1", 1000, 26
+    def resize(self, rows=None, cols=None):
+        self.sheet.client._tick("resize")
+        self.rows, self.cols = rows or self.rows, cols or self.cols
+
+class StubSpreadsheet:
+    def __init__(self, client, title):
+        self.client, self.title = client, title
+        self.id = f"stub-{len(client.sheets) + 1}"
+        self.url = f"stub://{self.id}"
+        self.values = []
+        self.sheet1 = StubWorksheet(self)
+    def share(self, *a, **kw):
+        self.client._tick("share")
+    def values_clear(self, rng):
+        self.client._tick("values_clear"); self.values = []
+    def values_update(self, rng, params=None, body=None):
+        self.client._tick("values_update")
+        start = int("".join(ch for ch in rng.rsplit("!A", 1)[-1] if ch.isdigit()) or 1) - 1
+        rows = body["values"]
+        if start + len(rows) > self.sheet1.rows: raise StubAPIError(400)  # fuera de la grilla, como la API real
+        self.values[start:start + len(rows)] = rows
+    def values_append(self, rng, params=None, body=None):
+        self.client._tick("values_append"); self.values.extend(body["values"])
+
+class StubSheetsClient:
+    """Imita la parte de gspread que usa export_to_sheets; `fail` = códigos por llamada (0 = responde bien)."""
+    def __init__(self, fail=None):
+        self.sheets, self.calls, self.fail = {}, [], list(fail or [])
+    def _tick(self, name):
+        self.calls.append(name)
+        code = self.fail.pop(0) if self.fail else 0
+        if code: raise StubAPIError(code)
+    def open(self, title):
+        self._tick("open")
+        if title not in self.sheets: raise SpreadsheetNotFound(title)
+        return self.sheets[title]
+    def open_by_key(self, key):
+        self._tick("open_by_key")
+        for sh in self.sheets.values():
+            if sh.id == key: return sh
+        raise SpreadsheetNotFound(key)
+    def create(self, title):
+        self._tick("create")
+        sh = self.sheets[title] = StubSpreadsheet(self, title)
+        return sh
+
+@pytest.fixture(autouse=True)
+def stub_not_found(monkeypatch):
+    monkeypatch.setattr(export, "_not_found", lambda: SpreadsheetNotFound)
+
+ROWS = [{"Producto": "Heladera", "Naldo": "$ 1.000", "Naldo (num)": "1000"},
+        {"Producto": "Lavarropas", "Vital": "ND", "Vital (num)": ""}]
+
+def test_columns_for():
+    assert columns_for(ROWS, ["Producto", "Marca"]) == ["Producto", "Marca", "Naldo", "Naldo (num)", "Vital", "Vital (num)"]
+
+def test_rows_from_job_merges_row_events(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job_id = store.create("scrape", 2)
+    for seq, (kind, data) in enumerate([("row", {"index": 1, "row": {"Producto": "B"}}), ("log", "x"),
+                                        ("row", {"index": 0, "row": {"Producto": "A"}}),
+                                        ("row", {"index": 1, "row": {"Naldo": "$ 5"}})], 1):
+        store.add_event(job_id, seq, kind, data)
+    assert rows_from_job(store, job_id, page=2) == [{"Producto": "A"}, {"Producto": "B", "Naldo": "$ 5"}]
+
+def test_iter_csv_chunks():
+    rows = [{"Producto": f"p{i}", "Naldo": i} for i in range(5)]
+    chunks = list(iter_csv(rows, ["Producto", "Naldo"], chunk_rows=2))
+    assert len(chunks) == 3 and chunks[0].startswith("\ufeff")
+    parsed = list(csv.reader(io.StringIO("".join(chunks).lstrip("\ufeff"))))
+    assert parsed[0] == ["Producto", "Naldo"] and parsed[-1] == ["p4", "4"] and len(parsed) == 6
+
+@pytest.mark.skipif(not HAVE_OPENPYXL, reason="openpyxl no instalado")
+def test_iter_xlsx_numbers():
+    from openpyxl import load_workbook
+    cols = columns_for(ROWS)
+    ws = load_workbook(io.BytesIO(b"".join(iter_xlsx(ROWS, cols, chunk=100)))).active
+    values = list(ws.values)
+    assert values[0] == tuple(cols)
+    assert values[1][cols.index("Naldo (num)")] == 1000  # columnas (num) como número
+
+def test_with_backoff_retries_quota_errors():
+    waits, calls = [], []
+    def fn():
+        calls.append(1)
+        if len(calls) < 3: raise StubAPIError(429)
+        return "ok"
+    assert with_backoff(fn, retries=5, sleep=waits.append) == "ok"
+    assert len(waits) == 2 and 1 <= waits[0] < 2 and 2 <= waits[1] < 3
+    with pytest.raises(StubAPIError):
+        with_backoff(lambda: (_ for _ in ()).throw(StubAPIError(400)), sleep=waits.append)
+    assert len(waits) == 2  # los 4xx que no son cuota no se reintentan
+
+def test_export_to_sheets_batches_and_retries():
+    client = StubSheetsClient()
+    rows = [{"Producto": f"p{i}"} for i in range(5)]
+    res = export_to_sheets(rows, ["Producto"], "Precios", client=client, batch=2, sleep=lambda s: None)
+    sh = client.sheets["Precios"]
+    assert sh.values == [["Producto"]] + [[f"p{i}"] for i in range(5)]
+    assert res["requests"] == 2 + 3  # clear + resize + 6 filas de a 2
+
+    client.fail = [503]
+    res = export_to_sheets(rows[:1], ["Producto"], "Precios", client=client, mode="append", sleep=lambda s: None)
+    assert sh.values[-1] == ["p0"] and res["requests"] == 1 and len(sh.values) == 7
+
+def test_non_idempotent_calls_retry_only_quota():
+    client = StubSheetsClient(fail=[0, 429])  # create rechazado por cuota: no se aplicó, se reintenta
+    export_to_sheets([{"Producto": "p0"}], ["Producto"], "Nueva", client=client, mode="append", sleep=lambda s: None)
+    assert client.calls == ["open", "create", "create", "values_append"] and len(client.sheets) == 1
+    client.fail, client.calls = [0, 503], []  # values.append pudo haberse aplicado: no se repite
+    with pytest.raises(StubAPIError):
+        export_to_sheets([{"Producto": "p1"}], ["Producto"], "Nueva", client=client, mode="append", sleep=lambda s: None)
+    assert client.calls == ["open", "values_append"]
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+import history
+from history import PriceHistory, parse_since, product_key
+from products import dedupe_key
+
+HELADERA = {"producto": "Heladera Gafa", "marca": "Gafa", "modelo": "HGF-358", "ean": ""}
+
+@pytest.fixture
+def hist(tmp_path):
+    return PriceHistory(tmp_path / "history.sqlite3")
+
+def test_product_key_matches_batch_dedupe():
+    assert product_key(HELADERA) == dedupe_key(HELADERA) == "mm:gafa:hgf358"
+    assert product_key({"ean": "779123", "marca": "x", "modelo": "y"}) == "ean:779123"
+    assert dedupe_key({"ean": "779 123-4"}) == dedupe_key({"ean": "7791234"}) == "ean:7791234"
+    assert dedupe_key({**HELADERA, "ean": "s/n"}) == "mm:gafa:hgf358"
+
+def test_parse_since():
+    assert parse_since("1700000000") == 1700000000.0
+    assert parse_since("2026-10-18") == datetime(2026, 10, 18).timestamp()
+    assert parse_since("ayer") is None and parse_since("") is None
+
+def test_record_detects_changes(hist):
+    assert hist.record(HELADERA, "Frávega", "$ 1.000", "1000", "vtex", ts=100) is True
+    assert hist.record(HELADERA, "Frávega", "$ 1.000", "1000", "vtex", ts=200) is False
+    assert hist.record(HELADERA, "Frávega", None, None, ts=300) is True    # desaparece
+    assert hist.record(HELADERA, "Frávega", "$ 900", "900", "vtex", ts=400) is True
+    (latest,) = hist.latest()
+    assert (latest["price"], latest["since"], latest["checked"]) == (900, 400, 400)
+    assert [(c["prev_price"], c["price"]) for c in hist.changes()] == [(None, 1000), (1000, None), (None, 900)]
+    assert len(hist.series(product_key(HELADERA), changes_only=False)) == 4
+    assert hist.stats()["observations"] == 4
+
+def test_changes_cursor_returns_only_new(hist):
+    hist.record(HELADERA, "Naldo", "$ 5", "5", ts=1)
+    first = hist.changes()
+    hist.record(HELADERA, "Naldo", "$ 6", "6", ts=2)
+    new = hist.changes(cursor=first[-1]["id"])
+    assert [c["price"] for c in new] == [6]
+    assert hist.changes(since=2) == new
+
+def test_cheapest_ignores_nd(hist):
+    hist.record(HELADERA, "Frávega", "$ 1.000", "1000")
+    hist.record(HELADERA, "Naldo", "$ 950", "950")
+    hist.record(HELADERA, "Vital", None, None)
+    (row,) = hist.cheapest()
+    assert (row["vendor"], row["price"], row["vendors"]) == ("Naldo", 950, 2)
+
+def test_prune_keeps_changes(hist, monkeypatch):
+    monkeypatch.setattr(history, "PRUNE_EVERY", 3)
+    hist.keep_unchanged_days = 1
+    old = 0.0
+    hist.record(HELADERA, "Naldo", "$ 5", "5", ts=old)
+    hist.record(HELADERA, "Naldo", "$ 5", "5", ts=old + 1)  # sin cambio y viejo: se poda
+    hist.record(HELADERA, "Naldo", "$ 5", "5", ts=old + 5 * 86400)
+    kept = hist.series(product_key(HELADERA), changes_only=False)
+    assert [o["ts"] for o in kept] == [old, old + 5 * 86400]
+
+def test_scraper_records_only_live_lookups(tmp_path, monkeypatch):
+    from cache import ResultCache
+    from scraper import PriceScraper
+    hist = PriceHistory(tmp_path / "history.sqlite3")
+    cache = ResultCache(tmp_path / "cache.sqlite3")
+    prices = {"HGF-358": ("$ 850.000", "850000"), "WW7": None}
+    def vtex(base, term, log):
+        if "roto" in term.lower(): raise RuntimeError("timeout")
+        return next((v for k, v in prices.items() if k.lower() in term.lower()), None)
+    def run():
+        sc = PriceScraper(delay_range=(0, 0), cache=cache, history=hist, batch_vtex=False, use_catalog=False)
+        monkeypatch.setattr(sc, "_detect_platform_order", lambda *a: ["vtex"])
+        monkeypatch.setattr(sc, "_try_vtex", vtex)
+        sc.scrape_all_vendors([HELADERA, {"producto": "Lavarropas", "marca": "Drean", "modelo": "WW7", "ean": ""},
+                               {"producto": "Roto", "marca": "", "modelo": "", "ean": ""}], {"V": "https://v.example"})
+    run()
+    assert hist.stats()["observations"] == 2  # precio y ND en vivo; el timeout no
+    run()  # todo sale de la caché: no son observaciones nuevas
+    assert hist.stats()["observations"] == 2
@@ -0,0 +1,42 @@
+import re
+
+import pytest
+
+import htmlparse
+from htmlparse import HAVE_LXML, HAVE_SELECTOLAX, card_price, css_to_xpath, parse_html
+
+BACKENDS = ["bs4"] + (["selectolax"] if HAVE_SELECTOLAX else []) + (["lxml"] if HAVE_LXML else [])
+PAT = re.compile(r"\$?\s*\d[\d\.\,]*")
+CLEAN = lambda t: re.sub(r"\D", "", t.split(",")[0]) or None
+HTML = """<html><body>
+<div class="product-item"><h2>Lavarropas Drean 8kg</h2><span class="price">$ 500.000</span></div>
+<div class="product-item destacado"><h2>Heladera Gafa HGF 358</h2><span class="Best-Price">$ 900.000,00</span></div>
+<li class="product"><a title="Microondas BGH">Microondas BGH $ 120.000</a></li>
+</body></html>"""
+
+def _price(backend, words):
+    doc = parse_html(HTML, backend)
+    return card_price(doc, [".product-item", "li.product"], [".price", "[class*='price' i]"],
+                      lambda txt: all(w in txt.lower() for w in words), PAT, CLEAN)
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_agree_on_card_price(backend):
+    assert parse_html(HTML, backend).backend == backend
+    assert _price(backend, ["heladera", "gafa"]) == "900000"   # selector de precio sin distinguir mayúsculas
+    assert _price(backend, ["microondas"]) == "120000"         # sin elemento de precio: patrón sobre el texto
+    assert _price(backend, ["cocina"]) is None
+
+def test_pick_backend(monkeypatch):
+    monkeypatch.setenv("HTML_PARSER", "bs4")
+    assert htmlparse._pick_backend() == "bs4"
+    monkeypatch.setenv("HTML_PARSER", "inexistente")
+    assert htmlparse._pick_backend() == ("selectolax" if HAVE_SELECTOLAX else "lxml" if HAVE_LXML else "bs4")
+    monkeypatch.setattr(htmlparse, "HAVE_SELECTOLAX", False); monkeypatch.setattr(htmlparse, "HAVE_LXML", False)
+    monkeypatch.setenv("HTML_PARSER", "lxml")
+    assert htmlparse._pick_backend() == "bs4"  # pedido pero no instalado
+
+def test_css_to_xpath():
+    assert css_to_xpath("li.product") == ".//li[contains(concat(' ', normalize-space(@class), ' '), ' product ')]"
+    assert css_to_xpath("span[data-price]", first=True) == "(.//span[@data-price])[1]"
+    with pytest.raises(ValueError):
+        css_to_xpath("div > span")
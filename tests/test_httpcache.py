@@ -0,0 +1,76 @@
+import threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from httpcache import DEFAULT_RULES, HttpCache, parse_rules
+from ratelimit import DomainRateLimiter
+
+class Site:
+    """Servidor local con ETag: responde 304 si el validador coincide."""
+    def __init__(self):
+        self.body, self.etag, self.seen = b"<html>v1</html>", '"v1"', []
+        site = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.seen.append((self.path, self.headers.get("If-None-Match")))
+                if self.headers.get("If-None-Match") == site.etag:
+                    self.send_response(304); self.send_header("ETag", site.etag); self.end_headers(); return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8"); self.send_header("ETag", site.etag)
+                self.send_header("Content-Length", str(len(site.body))); self.end_headers()
+                self.wfile.write(site.body)
+            def log_message(self, *a): pass
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+@pytest.fixture
+def site():
+    s = Site()
+    yield s
+    s.server.shutdown(); s.server.server_close()
+
+@pytest.fixture
+def client(tmp_path):
+    from scraper import HttpClient
+    return HttpClient(delay_range=(0, 0), limiter=DomainRateLimiter((0, 0)), http_cache=HttpCache(tmp_path / "http.sqlite3"))
+
+def _expire(cache, key):
+    with cache._conn() as conn: conn.execute("UPDATE responses SET expires=? WHERE key=?", (time.time() - 1, key))
+
+def test_rules():
+    cache = HttpCache(rules=parse_rules(r"/promo$=60;roto;x=abc") + DEFAULT_RULES, enabled=True)
+    assert cache.ttl_for("https://v.com/promo") == 60
+    assert cache.ttl_for("https://v.com/folleto.pdf") == 0
+    assert cache.ttl_for("https://v.com/ofertas/") == cache.rules[2][1]
+    assert cache.ttl_for(HttpCache.key("https://v.com/buscar", {"q": "tv"})) == 0  # búsquedas: no
+    assert HttpCache.key("https://v.com/b?x=1", {"q": "a b"}) == "https://v.com/b?x=1&q=a+b"
+    assert HttpCache(enabled=False).ttl_for("https://v.com/") == 0
+
+def test_fresh_then_revalidated_then_changed(site, client):
+    url = site.url + "/"
+    assert client.get(url).text == "<html>v1</html>"
+    r = client.get(url)  # vigente: no sale a la red
+    assert getattr(r, "from_cache", False) and len(site.seen) == 1
+
+    _expire(client.http_cache, url)
+    r = client.get(url)  # vencido: pedido condicional, 304 reutiliza el cuerpo
+    assert site.seen[-1] == ("/", '"v1"') and r.text == "<html>v1</html>"
+    assert client.http_cache.get(url).fresh
+
+    _expire(client.http_cache, url)
+    site.body, site.etag = b"<html>v2</html>", '"v2"'
+    assert client.get(url).text == "<html>v2</html>"
+    assert client.get(url).text == "<html>v2</html>" and len(site.seen) == 3
+
+def test_queries_and_own_validators_skip_cache(site, client):
+    client.get(site.url + "/buscar", params={"q": "tv"}); client.get(site.url + "/buscar", params={"q": "tv"})
+    client.get(site.url + "/f", headers={"If-None-Match": '"otro"'})
+    assert len(site.seen) == 3 and client.http_cache.stats()["entries"] == 0
+
+def test_memo_ttl(tmp_path):
+    cache = HttpCache(tmp_path / "http.sqlite3")
+    cache.remember("wp:v.com", "https://v.com/?s=", 60)
+    cache.remember("wp:viejo", "x", -1)
+    assert cache.recall("wp:v.com") == "https://v.com/?s=" and cache.recall("wp:viejo") is None
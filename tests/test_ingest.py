@@ -0,0 +1,136 @@
+import socket, threading, time
+
+import ingest
+from breaker import NOT_SEARCHED
+from ingest import BatchStore, iter_csv_rows, iter_products, run_batch
+
+class FakeJob:
+    def __init__(self, job_id="job1"):
+        self.id = job_id
+        self.events = []
+        self.cancelled = False
+        self.done = 0
+    def cancel_cb(self): return self.cancelled
+    def emit(self, kind, data): self.events.append((kind, data))
+    def advance(self, n=1): self.done += n
+
+def _batch(tmp_path, products, vendors=("A", "B")):
+    store = BatchStore(tmp_path / "batches.sqlite3", tmp_path / "uploads")
+    batch_id = store.create("lote.csv", {v: f"https://{v.lower()}.example" for v in vendors}, {})
+    store.ingest(batch_id, products)
+    return store, batch_id
+
+def _products(n):
+    return [{"producto": f"Lavarropas {i}", "marca": "DREAN", "modelo": f"WW{i:03d}", "capacidad": "", "ean": ""} for i in range(n)]
+
+def _scrape(prices):
+    """scrape_all_vendors simulado: prices(vendor, producto) → celda."""
+    def scrape(products, on_result, on_log, cancel_cb):
+        for i, p in enumerate(products):
+            for vn in ("A", "B"):
+                cell = prices(vn, p)
+                on_result(i, vn, {vn: cell, f"{vn} (num)": "" if cell in ("ND", NOT_SEARCHED) else cell.strip("$ ,.0"),
+                                  "Fecha de Consulta": "18/10/2026"})
+    return scrape
+
+def test_csv_ingest_dedupes_by_ean_and_brand_model(tmp_path):
+    path = tmp_path / "lote.csv"
+    path.write_text("Producto;Marca;Modelo;Capacidad;EAN\n"
+                    "Heladera;Drean;HD1;;779000000001\n"
+                    "Heladera repetida;Drean;HD1b;;779000000001\n"
+                    "Lavarropas;drean;ww 7;;\n"
+                    "Lavarropas;DREAN;WW7;;\n"
+                    "Microondas;BGH;MS20;;\n", encoding="utf-8")
+    store = BatchStore(tmp_path / "b.sqlite3", tmp_path / "up")
+    batch_id = store.create("lote.csv", {"A": "https://a.example"}, {})
+    assert store.ingest(batch_id, iter_products(iter_csv_rows(path)), chunk=2) == (3, 2)
+    assert store.get(batch_id)["status"] == "queued"
+
+def test_cancelled_batch_resumes_pending_products(tmp_path):
+    store, batch_id = _batch(tmp_path, _products(4))
+    job = FakeJob()
+    assert store.claim(batch_id, job.id)
+    assert store.claim(batch_id, "otro") is False  # ya corriendo, con latido reciente
+    def cancel_after_two(vn, p):
+        if vn == "B" and p["modelo"] == "WW001": job.cancelled = True
+        return "$ 100,00"
+    run_batch(store, batch_id, job, _scrape(cancel_after_two), batch=2)
+    assert (store.get(batch_id)["status"], store.get(batch_id)["done"]) == ("cancelled", 2)
+
+    seen = []
+    job2 = FakeJob("job2")
+    assert store.claim(batch_id, job2.id)
+    run_batch(store, batch_id, job2, _scrape(lambda vn, p: seen.append(p["modelo"]) or "$ 200,00"), batch=2)
+    assert (store.get(batch_id)["status"], store.get(batch_id)["done"]) == ("done", 4)
+    assert sorted(set(seen)) == ["WW002", "WW003"]
+    assert [r["A"] for r in store.iter_rows(batch_id)] == ["$ 100,00", "$ 100,00", "$ 200,00", "$ 200,00"]
+
+def test_halted_vendor_products_stay_pending_for_resume(tmp_path):
+    store, batch_id = _batch(tmp_path, _products(4))
+    # B cortado a partir del tercer producto: esos quedan sin buscar, no como ND completos
+    halted = lambda vn, p: NOT_SEARCHED if vn == "B" and p["modelo"] >= "WW002" else ("ND" if vn == "B" else "$ 100,00")
+    job = FakeJob()
+    assert store.claim(batch_id, job.id)
+    run_batch(store, batch_id, job, _scrape(halted))
+    info = store.get(batch_id)
+    assert (info["status"], info["done"]) == ("interrupted", 2)
+    assert any("pendientes para /resume" in str(d) for k, d in job.events if k == "log")
+    assert [r["B"] for r in store.iter_rows(batch_id)] == ["ND", "ND", "", ""]
+
+    # /resume: toma el lote y busca solo lo pendiente
+    seen = []
+    def ok(vn, p):
+        seen.append(p["modelo"]); return "$ 200,00"
+    job2 = FakeJob("job2")
+    assert store.claim(batch_id, job2.id)
+    run_batch(store, batch_id, job2, _scrape(ok))
+    info = store.get(batch_id)
+    assert (info["status"], info["done"]) == ("done", 4)
+    assert sorted(set(seen)) == ["WW002", "WW003"]
+    assert store.claim(batch_id, "job3") is False
+
+def test_down_vendor_batch_is_resumable_end_to_end(tmp_path):
+    from scraper import PriceScraper
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); url = f"http://127.0.0.1:{s.getsockname()[1]}"
+    store = BatchStore(tmp_path / "batches.sqlite3", tmp_path / "uploads")
+    batch_id = store.create("lote.csv", {"Caido": url}, {})
+    store.ingest(batch_id, _products(3))
+    scraper = PriceScraper(delay_range=(0, 0), cache_mode="bypass", record_history=False)
+    job = FakeJob()
+    assert store.claim(batch_id, job.id)
+    run_batch(store, batch_id, job, lambda products, on_result, on_log, cancel_cb: scraper.scrape_all_vendors(
+        products, {"Caido": url}, cancel_cb=cancel_cb, on_log=on_log, on_result=on_result, vendor_budget=0))
+    info = store.get(batch_id)
+    assert (info["status"], info["done"]) == ("interrupted", 0)
+    assert store.claim(batch_id, "job2")
+
+def test_heartbeat_keeps_slow_batch_claimed(tmp_path, monkeypatch):
+    # un producto lento (OCR, rate limit) sin resultados ni consultas a cancel_cb no debe
+    # dejar que otro /resume tome el lote mientras sigue corriendo
+    monkeypatch.setattr(ingest, "HEARTBEAT_EVERY", 0.05)
+    store, batch_id = _batch(tmp_path, _products(1))
+    stolen = []
+    def slow(products, on_result, on_log, cancel_cb):
+        time.sleep(0.5)
+        stolen.append(store.claim(batch_id, "intruso", stale=0.3))
+    job = FakeJob()
+    assert store.claim(batch_id, job.id)
+    run_batch(store, batch_id, job, slow)
+    assert stolen == [False]
+    assert not [t for t in threading.enumerate() if t.name.startswith("batch-")]
+
+def test_queued_batch_is_not_taken_by_resume(tmp_path):
+    # encolado detrás de otros trabajos: sin latido, pero tampoco interrumpido
+    store, batch_id = _batch(tmp_path, _products(2))
+    assert store.claim(batch_id, "job1")
+    with store._conn() as conn:
+        conn.execute("UPDATE batches SET updated=? WHERE id=?", (time.time() - ingest.STALE_AFTER - 60, batch_id))
+    assert store.get(batch_id)["status"] == "queued" and store.claim(batch_id, "job2") is False
+    # muy viejo en cola (worker muerto antes de arrancarlo): se reasigna y el dueño anterior ya no corre
+    assert store.claim(batch_id, "job2", queued_stale=0)
+    old = FakeJob("job1")
+    run_batch(store, batch_id, old, _scrape(lambda vn, p: "$ 1,00"))
+    assert old.done == 0 and store.get(batch_id)["done"] == 0
+    run_batch(store, batch_id, FakeJob("job2"), _scrape(lambda vn, p: "$ 1,00"))
+    assert (store.get(batch_id)["status"], store.get(batch_id)["done"]) == ("done", 2)
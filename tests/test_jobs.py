@@ -0,0 +1,102 @@
+import threading, time
+
+import jobs, registry
+from jobs import JobManager, JobStore
+from registry import RUN_TTL, SqliteRunRegistry
+
+def _manager(tmp_path):
+    return JobManager(JobStore(tmp_path / "jobs.sqlite3"), registry=SqliteRunRegistry(tmp_path / "runs.sqlite3"))
+
+def _running_job(mgr, age):
+    job_id = mgr.store.create("batch", 100)
+    mgr.store.set_status(job_id, "running")
+    with mgr.store._conn() as conn:
+        conn.execute("UPDATE jobs SET updated=? WHERE id=?", (time.time() - age, job_id))
+    return job_id
+
+def _drain(mgr, job_id):
+    out = []
+    for ev in mgr.stream(job_id, poll=0, heartbeat=0):
+        if ev is None: break  # latido: el stream sigue esperando, no expiró
+        out.append(ev)
+    return out
+
+def _wait_status(mgr, job_id, status):
+    # el estado se guarda justo después de "end"
+    deadline = time.monotonic() + 5
+    while mgr.store.get(job_id)["status"] != status and time.monotonic() < deadline: time.sleep(0.01)
+    return mgr.store.get(job_id)["status"]
+
+def test_submitted_job_streams_until_end(tmp_path):
+    mgr = _manager(tmp_path)
+    def work(job):
+        job.emit("row", {"index": 0})
+        job.advance()
+    job_id = mgr.submit("scrape", 1, work)
+    evs = [ev for ev in mgr.stream(job_id, poll=0.01) if ev]
+    assert [kind for _, kind, _ in evs] == ["row", "end"]
+    assert evs[-1][2] == {"status": "done", "error": None}
+    assert _wait_status(mgr, job_id, "done") == "done" and mgr.store.get(job_id)["progress"] == 1.0
+
+def test_stream_resumes_after_seq(tmp_path):
+    mgr = _manager(tmp_path)
+    job_id = mgr.submit("scrape", 3, lambda job: [job.emit("log", f"l{i}") for i in range(3)])
+    evs = [ev for ev in mgr.stream(job_id, poll=0.01) if ev]
+    assert [data for _, kind, data in evs if kind == "log"] == ["l0", "l1", "l2"]
+    assert [ev[2] for ev in mgr.stream(job_id, after=2, poll=0.01) if ev][0] == "l2"
+
+def test_error_and_cancel_end_states(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "CANCEL_POLL", 0.0)
+    mgr = _manager(tmp_path)
+    def boom(job): raise ValueError("falló")
+    job_id = mgr.submit("scrape", 1, boom)
+    assert [ev for ev in mgr.stream(job_id, poll=0.01) if ev][-1][2] == {"status": "error", "error": "falló"}
+    job_id = mgr.submit("scrape", 1, lambda job: mgr.registry.cancel(job.id))  # cancelado desde otro worker
+    assert [ev for ev in mgr.stream(job_id, poll=0.01) if ev][-1][2]["status"] == "cancelled"
+    assert _wait_status(mgr, job_id, "cancelled") == "cancelled" and mgr.registry.active() == []
+
+def test_stream_heartbeat_while_waiting(tmp_path):
+    mgr = _manager(tmp_path)
+    job_id = mgr.store.create("scrape", 1)
+    assert next(mgr.stream(job_id, poll=0, heartbeat=0)) is None  # latido: sin eventos todavía
+
+def test_stream_expires_job_without_activity(tmp_path):
+    mgr = _manager(tmp_path)
+    job_id = _running_job(mgr, RUN_TTL + 60)
+    assert _drain(mgr, job_id) == []
+    job = mgr.store.get(job_id)
+    assert (job["status"], job["error"]) == ("error", "expirado sin actividad")
+
+def test_events_keep_long_job_alive(tmp_path):
+    # un lote que avanza una vez por tanda pero emite logs/filas no debe darse por muerto
+    mgr = _manager(tmp_path)
+    job_id = _running_job(mgr, RUN_TTL + 60)
+    mgr.store.add_event(job_id, 1, "log", "tanda 1/40")
+    assert [kind for _, kind, _ in _drain(mgr, job_id)] == ["log"]
+    assert mgr.store.get(job_id)["status"] == "running"
+
+def test_cancel_checks_heartbeat_quiet_job(tmp_path, monkeypatch):
+    # sin eventos (OCR largo, rate limit): el latido sale de las consultas a cancel_cb
+    monkeypatch.setattr(jobs, "HEARTBEAT_EVERY", 0.0)
+    mgr = _manager(tmp_path)
+    job_id = _running_job(mgr, RUN_TTL + 60)
+    job = jobs.Job(mgr.store, job_id, lambda: False)
+    assert job.cancel_cb() is False
+    assert time.time() - mgr.store.get(job_id)["updated"] < 5
+    assert _drain(mgr, job_id) == []
+    assert mgr.store.get(job_id)["status"] == "running"
+
+def test_queued_job_does_not_expire_nor_register(tmp_path):
+    # con un solo hilo, el segundo trabajo espera en cola: sin latido pero no muerto
+    mgr, started, release = _manager(tmp_path), threading.Event(), threading.Event()
+    mgr.max_workers = 1
+    first = mgr.submit("scrape", 1, lambda job: started.set() or release.wait(5))
+    started.wait(5)
+    queued = mgr.submit("scrape", 1, lambda job: job.emit("log", "arrancó"))
+    with mgr.store._conn() as conn:
+        conn.execute("UPDATE jobs SET updated=? WHERE id=?", (time.time() - RUN_TTL - 60, queued))
+    assert _drain(mgr, queued) == [] and mgr.store.get(queued)["status"] == "queued"
+    assert [r["run_id"] for r in mgr.registry.active()] == [first]
+    release.set()
+    assert [kind for _, kind, _ in (ev for ev in mgr.stream(queued, poll=0.01) if ev)] == ["log", "end"]
+    assert _wait_status(mgr, queued, "done") == "done"
@@ -0,0 +1,49 @@
+import threading, time
+
+import pytest
+
+from scraper import PriceScraper
+
+VENDORS = {"A": "https://a.invalid", "B": "https://b.invalid"}
+PRODUCTS = [{"producto": f"p{i}", "marca": "M", "modelo": f"m{i}"} for i in range(4)]
+
+class FakeScraper(PriceScraper):
+    """Búsqueda simulada: registra concurrencia por vendedor y el HttpClient de cada carril."""
+    def __init__(self, wait=0.1, cancel_after=None):
+        super().__init__(delay_range=(0, 0))
+        self.wait, self.cancel_after = wait, cancel_after
+        self.lock, self.active, self.peak, self.clients, self.calls = threading.Lock(), {}, {}, set(), []
+
+    def _prefetch_vendor(self, vendor_name, base, products, log):
+        return {}
+
+    def _search_product(self, vendor_name, base, p, log):
+        with self.lock:
+            self.active[vendor_name] = self.active.get(vendor_name, 0) + 1
+            self.peak[vendor_name] = max(self.peak.get(vendor_name, 0), self.active[vendor_name])
+            self.clients.add(id(self.client)); self.calls.append((vendor_name, p["producto"]))
+        time.sleep(self.wait)
+        with self.lock: self.active[vendor_name] -= 1
+        return f"$ {len(p['producto'])}", str(len(p["producto"]))
+
+def test_lanes_run_in_parallel_with_same_dataframe():
+    seq, _ = FakeScraper(wait=0).scrape_all_vendors(PRODUCTS, VENDORS)
+    sc = FakeScraper(wait=0.2)
+    t0 = time.monotonic()
+    df, _ = sc.scrape_all_vendors(PRODUCTS, VENDORS, max_workers=4, per_vendor=2)
+    assert time.monotonic() - t0 < 0.8 * 0.2 * len(PRODUCTS) * len(VENDORS) / 2  # secuencial: 1,6 s
+    assert list(df.columns) == list(seq.columns) and df.to_dict("records") == seq.to_dict("records")
+    assert sc.peak == {"A": 2, "B": 2} and len(sc.clients) == 4  # un HttpClient por carril
+
+def test_per_vendor_limits_concurrency():
+    sc = FakeScraper(wait=0.05)
+    sc.scrape_all_vendors(PRODUCTS, VENDORS, max_workers=8, per_vendor=1)
+    assert sc.peak == {"A": 1, "B": 1} and len(sc.calls) == 8
+    assert [p for v, p in sc.calls if v == "A"] == ["p0", "p1", "p2", "p3"]  # orden dentro del carril
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_cancel_stops_lanes(workers):
+    sc = FakeScraper(wait=0.05)
+    df, _ = sc.scrape_all_vendors(PRODUCTS, VENDORS, max_workers=workers, per_vendor=2, cancel_cb=lambda: len(sc.calls) >= 2)
+    assert 2 <= len(sc.calls) <= 4  # a lo sumo un producto en curso por carril
+    assert (df["A"] == "ND").sum() + (df["B"] == "ND").sum() == 8 - len(sc.calls)
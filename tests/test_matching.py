@@ -0,0 +1,39 @@
+import pytest
+
+import htmlparse
+from matching import TermMatcher, fold
+
+def test_fold_keeps_offsets():
+    assert fold("Heladera Próxima ÑANDÚ") == "heladera proxima nandu"
+    assert len(fold("Próxima")) == len("Próxima")
+
+def test_matches_needs_every_token_of_a_variant():
+    m = TermMatcher(["Drean Próxima 8", "PROXIMA8"])
+    assert m.matches("Lavarropas DREAN proxima 8kg")
+    assert m.matches("lavarropas proxima800")  # subcadena, como text_matches_any_variant
+    assert not m.matches("Lavarropas Drean Next 8")
+
+def test_shared_prefix_tokens_are_all_found():
+    m = TermMatcher(["no nofrost"])
+    assert m.matches("heladera nofrost")  # "no" sale del mismo match que "nofrost"
+
+def test_score_prefers_whole_words_and_short_cards():
+    m = TermMatcher(["gafa hgf 358"])
+    exact = m.score("Gafa HGF 358")
+    inside = m.score("Gafa HGF3580 No Frost")
+    noisy = m.score("Gafa HGF 358 heladera con freezer no frost 282 litros blanca")
+    assert m.score("Whirlpool WRM") == 0
+    assert 0.6 <= inside < noisy < exact <= 1.0
+
+BACKENDS = [b for b, ok in (("bs4", True), ("selectolax", htmlparse.HAVE_SELECTOLAX), ("lxml", htmlparse.HAVE_LXML)) if ok]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_best_card_wins_over_first(backend):
+    from scraper import PriceScraper
+    html = """<ul>
+      <li class="product">Heladera Gafa HGF 358 con dispenser y freezer grande <span class="price">$ 999.999</span></li>
+      <li class="product">Heladera Gafa HGF 358 <span class="price">$ 850.000</span></li>
+      <li class="product"><h3>Heladera Gafa HGF 358</h3> modelo 2024 $ 12345</li>
+    </ul>"""
+    doc = htmlparse.parse_html(html, backend)
+    assert PriceScraper()._extract_from_cards(doc, "Gafa HGF 358") == "850000"
@@ -0,0 +1,64 @@
+import json, os, subprocess, sys, time, threading
+
+import metrics
+from metrics import Registry, RunTimings, bind_run, stage
+
+def _dead_pid():
+    p = subprocess.Popen([sys.executable, "-c", "pass"]); p.wait()
+    return p.pid
+
+def test_collect_sums_live_workers_and_retires_dead(tmp_path):
+    reg = Registry(tmp_path)
+    c = reg.counter("t_requests_total", "Pedidos", ("host",))
+    h = reg.histogram("t_seconds", "Latencia", ("host",), buckets=(0.1, 1))
+    c.inc("a.com"); c.inc("a.com", n=2); h.observe(0.5, "a.com")
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(  # otro worker vivo
+        {"t_requests_total": {"a.com": 4, "b.com": 1}, "t_seconds": {"a.com": [1, 0, 0, 0.05]}, "otra": {"x": 1}}))
+    dead = tmp_path / f"{_dead_pid()}.json"
+    dead.write_text(json.dumps({"t_requests_total": {"a.com": 100}}))
+    total = reg.collect()
+    assert total["t_requests_total"] == {"a.com": 107, "b.com": 1}  # lo del muerto no se pierde
+    assert total["t_seconds"] == {"a.com": [1, 1, 0, 0.55]}
+    assert "otra" not in total and not dead.exists()
+    assert reg.collect()["t_requests_total"] == {"a.com": 107, "b.com": 1}  # y se suma una sola vez
+    assert json.loads((tmp_path / "retired.json").read_text()) == {"t_requests_total": {"a.com": 100}}
+
+def test_flush_runs_in_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "FLUSH_EVERY", 0.05)
+    reg, threads = Registry(tmp_path), []
+    flush = reg.flush
+    reg.flush = lambda: threads.append(threading.current_thread().name) or flush()
+    reg.counter("t_total", "Total").values[()] = 1
+    reg.touch()
+    deadline = time.monotonic() + 5
+    while not threads and time.monotonic() < deadline: time.sleep(0.01)
+    assert threads[0] == "metrics-flush"  # no escribe el hilo que cuenta
+    assert json.loads((tmp_path / f"{os.getpid()}.json").read_text()) == {"t_total": {"": 1}}
+
+def test_exposition_format(tmp_path):
+    reg = Registry(tmp_path)
+    reg.counter("t_total", "Total", ("host", "status")).inc('a"b', 200)
+    h = reg.histogram("t_seconds", "Latencia", (), buckets=(0.1, 1))
+    h.observe(0.05); h.observe(0.5); h.observe(3)
+    assert reg.render().splitlines() == [
+        "# HELP t_seconds Latencia", "# TYPE t_seconds histogram",
+        't_seconds_bucket{le="0.1"} 1', 't_seconds_bucket{le="1"} 2', 't_seconds_bucket{le="+Inf"} 3',
+        "t_seconds_sum 3.55", "t_seconds_count 3",
+        "# HELP t_total Total", "# TYPE t_total counter",
+        't_total{host="a\\"b",status="200"} 1',
+    ]
+
+def test_run_timings_bound_per_thread():
+    run = RunTimings()
+    bind_run(run)
+    try:
+        with stage("parse"): pass
+        with stage("parse"): pass
+    finally:
+        bind_run(None)
+    with stage("parse"): pass  # sin ejecución asociada: solo el histograma global
+    run.strategy("Naldo", "vtex", "hit", 0.25)
+    d = run.as_dict()
+    assert d["stages"]["parse"]["count"] == 2
+    assert d["strategies"] == {"Naldo": {"vtex:hit": {"count": 1, "seconds": 0.25}}}
+    assert metrics.current_run() is None
@@ -0,0 +1,96 @@
+import re, shutil, time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import brochures, ocr
+from brochures import BrochureIndex
+
+PRICE = re.compile(r"\$\s?\d[\d\.]*")
+
+def _pdf(path, pages):
+    import pypdfium2 as pdfium
+    doc = pdfium.PdfDocument.new()
+    for _ in range(pages): doc.new_page(100, 100)
+    doc.save(str(path))
+    return str(path)
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """Pool de hilos en lugar del de procesos: se puede ver qué páginas se encargaron."""
+    submitted, ex = [], ThreadPoolExecutor(4)
+    class Pool:
+        def submit(self, fn, path, index, *a):
+            submitted.append(index)
+            return ex.submit(fn, path, index, *a)
+    def page(path, index, scale, greyscale, lang):
+        time.sleep(0.02 * (index % 2))  # las impares terminan después
+        return f"página {index}"
+    monkeypatch.setattr(ocr, "ocr_available", lambda: True)
+    monkeypatch.setattr(ocr, "_executor", Pool)
+    monkeypatch.setattr(ocr, "_ocr_page", page)
+    monkeypatch.setattr(ocr, "page_count", lambda path: 10)
+    yield submitted
+    ex.shutdown(wait=True)
+
+def test_pages_in_order_with_bounded_lookahead(fake_pool):
+    it = ocr.iter_ocr_pages("x.pdf", start=2, workers=3)
+    assert [next(it) for _ in range(3)] == [(2, "página 2"), (3, "página 3"), (4, "página 4")]
+    it.close()  # corte temprano: no se encargan más páginas
+    assert fake_pool == [2, 3, 4, 5, 6]  # a lo sumo `workers` páginas por delante
+    assert [i for i, _ in ocr.iter_ocr_pages("x.pdf", max_pages=4, workers=2)] == [0, 1, 2, 3]
+
+@pytest.mark.skipif(not (ocr.HAVE_PDFIUM and ocr.HAVE_TESS and shutil.which("tesseract")), reason="sin tesseract")
+def test_process_pool_ocr(tmp_path):
+    assert [i for i, _ in ocr.iter_ocr_pages(_pdf(tmp_path / "f.pdf", 3), workers=2)] == [0, 1, 2]
+
+def test_without_tesseract_nothing_is_rendered(monkeypatch):
+    monkeypatch.setattr(ocr, "ocr_available", lambda: False)
+    monkeypatch.setattr(ocr, "_executor", lambda: pytest.fail("no debe encargar páginas"))
+    assert list(ocr.iter_ocr_pages("x.pdf")) == []
+
+@pytest.mark.skipif(not (ocr.HAVE_PDFIUM and ocr.HAVE_TESS) or bool(shutil.which("tesseract")), reason="requiere pytesseract sin el binario")
+def test_process_pool_survives_worker_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "ocr_available", lambda: True)  # en el hijo, pytesseract falla sin el binario
+    path = _pdf(tmp_path / "f.pdf", 2)
+    for _ in range(2):  # el error se serializa y el pool sigue sano
+        with pytest.raises(RuntimeError, match="tesseract"):
+            list(ocr.iter_ocr_pages(path, workers=2))
+
+class Client:
+    def __init__(self): self.calls = 0
+    def get(self, url, timeout=None, headers=None):
+        self.calls += 1
+        return type("R", (), {"status_code": 200, "content": b"%PDF escaneado", "headers": {}})()
+
+def test_scanned_brochure_ocr_is_cached(tmp_path, monkeypatch):
+    fill = " relleno" * (brochures.WINDOW // 4)
+    pages, starts = ["tapa", f"Heladera Gafa $ 850.000{fill}", f"Drean $ 500.000{fill}", "contratapa"], []
+    def fake_iter(path, start=0, **kw):
+        starts.append(start)
+        yield from ((i, pages[i]) for i in range(start, len(pages)))
+    monkeypatch.setattr(brochures, "HAVE_PDFIUM", True)
+    monkeypatch.setattr(brochures, "page_count", lambda path: len(pages))
+    monkeypatch.setattr(brochures, "iter_ocr_pages", fake_iter)
+    client, log = Client(), lambda m: None
+    find = lambda idx, term: idx.find_price("https://v.com/f.pdf", client, [term], lambda c, u: "", PRICE, log)
+
+    idx = BrochureIndex(tmp_path)
+    assert find(idx, "gafa") == "$ 850.000" and starts == [0]          # corta en la página 2
+    assert find(BrochureIndex(tmp_path), "heladera") == "$ 850.000"      # páginas ya reconocidas, en disco
+    assert starts == [0] and client.calls == 1
+    assert find(idx, "drean") == "$ 500.000" and starts == [0, 2]      # retoma donde quedó
+    assert find(idx, "whirlpool") is None and starts == [0, 2, 3]      # completa y guarda el texto
+    assert find(idx, "drean") == "$ 500.000" and starts == [0, 2, 3]
+    assert (tmp_path / f"{idx._document('https://v.com/f.pdf', client, None, log)[0]}.txt").exists()
+
+def test_truncated_ocr_is_partial(tmp_path, monkeypatch):
+    pages = ["tapa", "Heladera", "Drean", "contratapa"]
+    monkeypatch.setattr(brochures, "HAVE_PDFIUM", True)
+    monkeypatch.setattr(brochures, "page_count", lambda path: len(pages))
+    monkeypatch.setattr(brochures, "iter_ocr_pages", lambda path, start=0, **kw: ((i, pages[i]) for i in range(start, 2)))
+    idx, client = BrochureIndex(tmp_path), Client()
+    assert idx.find_price("https://v.com/f.pdf", client, ["whirlpool"], lambda c, u: "", PRICE, lambda m: None) is None
+    sha = idx._document("https://v.com/f.pdf", client, None, lambda m: None)[0]
+    assert not (tmp_path / f"{sha}.txt").exists()  # OCR_MAX_PAGES cortó: no es el texto final
+    assert idx._read_json(tmp_path / f"{sha}.ocr.json") == {"pages": ["tapa", "Heladera"], "total": 4, "partial": True}
@@ -0,0 +1,58 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from ratelimit import MAX_RETRY_AFTER, DomainRateLimiter, TokenBucket, host_of, parse_retry_after
+
+def test_host_of():
+    assert host_of("https://WWW.Fravega.com:443/l/?q=tv") == "www.fravega.com"
+    assert host_of("http://naldo.com.ar") == "naldo.com.ar"
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30.0
+    assert parse_retry_after("99999") == MAX_RETRY_AFTER
+    assert 50 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after("mañana") is None and parse_retry_after(None) is None
+
+def test_bucket_spaces_requests_after_burst():
+    bk = TokenBucket(interval=2.0, jitter=0.0, burst=2)
+    now = bk.updated
+    assert bk.reserve(now) == 0 and bk.reserve(now) == 0  # ráfaga
+    assert bk.reserve(now) == pytest.approx(2.0)
+    assert bk.reserve(now + 2.0) == pytest.approx(2.0)  # el turno anterior ya estaba reservado
+
+def test_hosts_do_not_wait_for_each_other():
+    rl = DomainRateLimiter((0.3, 0.3))
+    rl.acquire("https://a.example/x")
+    t0 = time.monotonic()
+    assert rl.acquire("https://b.example/x") == 0
+    assert time.monotonic() - t0 < 0.2
+
+def test_throttle_penalty_and_recovery():
+    rl = DomainRateLimiter((1, 1))
+    rl.acquire("https://a.example/")
+    rl.feedback("https://a.example/", 429, "5")
+    st = rl.state()["a.example"]
+    assert st["penalty"] == 2.0 and st["throttled"] == 1 and 4 < st["blocked_for"] <= 5
+    for _ in range(3): rl.feedback("https://a.example/", 200)
+    assert 1.0 <= rl.state()["a.example"]["penalty"] < 2.0
+
+def test_acquire_is_cancellable():
+    rl = DomainRateLimiter((30, 30))
+    rl.acquire("https://a.example/")
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="cancelled"):
+        rl.acquire("https://a.example/", cancel_cb=lambda: True)
+    assert time.monotonic() - t0 < 1
+
+def test_shared_bucket_keeps_slowest_delay():
+    rl = DomainRateLimiter((0, 0))
+    t0 = time.monotonic()
+    rl.acquire("https://a.example/", (0.2, 0.3))
+    rl.acquire("https://a.example/", (0, 0))
+    assert time.monotonic() - t0 >= 0.2  # el pedido apurado no baja el intervalo
+    st = rl.state()["a.example"]
+    assert (st["interval"], st["jitter"]) == (0.2, 0.1)
+    rl.acquire("https://b.example/", (0, 0))
+    assert rl.state()["b.example"]["interval"] == 0
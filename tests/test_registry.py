@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+import registry
+from registry import RunRegistry, SqliteRunRegistry
+
+def test_base_is_abstract():
+    with pytest.raises(TypeError):
+        RunRegistry()
+
+    class Partial(RunRegistry):
+        def register(self, run_id, kind="scrape", meta=None): pass
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_cancel_before_register_is_kept(tmp_path):
+    runs = SqliteRunRegistry(tmp_path / "runs.sqlite3")
+    assert runs.cancel("r1") is False  # todavía no registrada
+    runs.register("r1", "scrape", {"n": 3})
+    assert runs.is_cancelled("r1")
+    assert [r["run_id"] for r in runs.active()] == ["r1"]
+    runs.finish("r1", "cancelled")
+    assert runs.active() == []
+
+def test_cancel_checker_polls_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "CANCEL_POLL", 0.0)
+    runs = SqliteRunRegistry(tmp_path / "runs.sqlite3")
+    runs.register("r1")
+    check = runs.cancel_checker("r1")
+    assert check() is False
+    runs.cancel("r1")
+    assert check() is True
+
+def test_expire_stale_runs(tmp_path):
+    runs = SqliteRunRegistry(tmp_path / "runs.sqlite3")
+    runs.register("old"); runs.register("live")
+    with runs._conn() as conn:
+        conn.execute("UPDATE runs SET updated=? WHERE run_id='old'", (time.time() - registry.RUN_TTL - 1,))
+    assert runs.expire() == 1
+    assert [r["run_id"] for r in runs.active()] == ["live"]
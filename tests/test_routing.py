@@ -0,0 +1,67 @@
+import pytest
+
+import routing
+from routing import StrategyRouter, detect_platform
+
+BASE = ["vtex", "magento", "wordpress", "generic", "brochures"]
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    monkeypatch.setattr(routing, "EXPLORE", 0.0)
+
+@pytest.fixture
+def router(tmp_path):
+    return StrategyRouter(tmp_path / "routing.sqlite3")
+
+def test_detect_platform():
+    assert detect_platform('<img src="https://x.vteximg.com.br/a.png">') == "vtex"
+    assert detect_platform('<script type="text/x-magento-init">data-mage-init</script>') == "magento"
+    assert detect_platform('<link href="/wp-content/themes/x.css">') == "wordpress"
+    assert detect_platform("<html></html>") is None
+
+def test_platform_goes_first_and_drops_generic(router):
+    router.set_platform("Naldo", "magento")
+    assert router.platform("Naldo") == ("magento", True)
+    order = router.order("Naldo", BASE)
+    assert order[0] == "magento" and "generic" not in order
+
+def test_order_learns_from_wins(router):
+    for _ in range(3): router.record("Vital", "wordpress", True)
+    assert router.order("Vital", BASE)[0] == "wordpress"
+    for _ in range(routing.MIN_TRIES): router.record("Vital", "vtex", False)
+    order = router.order("Vital", BASE)
+    assert order[0] == "wordpress" and "vtex" not in order  # descartada tras MIN_TRIES sin acierto
+
+def test_expired_platform_is_not_current(router, monkeypatch):
+    router.set_platform("Naldo", "vtex")
+    monkeypatch.setattr(routing, "PLATFORM_TTL", -1)
+    assert router.platform("Naldo") == ("vtex", False)
+
+def test_snapshot(router):
+    router.set_platform("A", "vtex"); router.record("A", "vtex", True)
+    assert router.snapshot() == {"A": {"platform": "vtex", "strategies": {"vtex": {"attempts": 1, "wins": 1}}}}
+
+def test_dropped_strategies_are_explored_last(router, monkeypatch):
+    router.set_platform("Vital", "wordpress")
+    for _ in range(3): router.record("Vital", "wordpress", True)
+    for _ in range(routing.MIN_TRIES): router.record("Vital", "vtex", False)
+    monkeypatch.setattr(routing, "EXPLORE", 1.0)
+    assert router.order("Vital", BASE) == ["wordpress", "magento", "brochures", "generic", "vtex"]
+
+def test_old_failures_decay(tmp_path, router):
+    for _ in range(3): router.record("Vital", "wordpress", True)
+    for _ in range(routing.MIN_TRIES): router.record("Vital", "vtex", False)
+    with router._conn() as conn:  # los fallos de vtex son de hace dos vidas medias
+        conn.execute("UPDATE strategy_stats SET updated=updated-? WHERE strategy='vtex'", (2 * routing.HALF_LIFE,))
+    assert "vtex" in StrategyRouter(router.path).order("Vital", BASE)
+    router.record("Vital", "vtex", False)  # el nuevo intento se suma a lo ya decaído
+    assert router.snapshot()["Vital"]["strategies"]["vtex"]["attempts"] == pytest.approx(routing.MIN_TRIES / 4 + 1, abs=0.01)
+
+def test_record_updates_cached_stats_without_reading(router, monkeypatch):
+    router.order("Vital", BASE)
+    opened = []
+    connect = router._connect
+    monkeypatch.setattr(router, "_connect", lambda: opened.append(1) or connect())
+    for _ in range(3): router.record("Vital", "wordpress", True)
+    assert router.order("Vital", BASE)[0] == "wordpress"
+    assert len(opened) == 3  # solo las escrituras
@@ -0,0 +1,48 @@
+import os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ratelimit import DomainRateLimiter
+from sessions import SessionPool
+
+@pytest.fixture
+def site():
+    ports = []
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        def do_GET(self):
+            ports.append(self.client_address[1])
+            self.send_response(200); self.send_header("Content-Length", "2"); self.end_headers()
+            self.wfile.write(b"ok")
+        def log_message(self, *a): pass
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", ports
+    server.shutdown(); server.server_close()
+
+def test_clients_reuse_pooled_connection(site):
+    from scraper import HttpClient
+    url, ports = site
+    pool = SessionPool()
+    for _ in range(2):  # dos HttpClient (p. ej. dos PriceScraper) sobre el mismo pool
+        client = HttpClient(delay_range=(0, 0), limiter=DomainRateLimiter((0, 0)), pool=pool)
+        assert client.get(url + "/buscar", params={"q": "tv"}).text == "ok"
+    assert len(ports) == 2 and ports[0] == ports[1]  # misma conexión TCP
+    assert pool.state()["sessions"] == 1 and pool.state()["hosts"] == ["127.0.0.1"]
+
+def test_session_and_headers_per_host():
+    pool, made = SessionPool(), []
+    factory = lambda base: made.append(base) or {"user-agent": f"ua{len(made)}"}
+    assert pool.session("https://a.com/x") is pool.session("https://a.com/y")
+    assert pool.session("https://a.com/x") is not pool.session("https://b.com/x")
+    assert pool.headers("https://a.com/x?q=1", factory) is pool.headers("https://a.com/otra", factory)
+    assert made == ["https://a.com"]
+
+def test_impersonation_memory_and_fork_reset():
+    pool = SessionPool()
+    s = pool.session("https://a.com/")
+    pool.mark_impersonation("https://a.com/x")
+    assert pool.needs_impersonation("https://a.com/y") and not pool.needs_impersonation("https://b.com/")
+    pool._pid = os.getpid() + 1  # como si viniera de un fork
+    assert pool.session("https://a.com/") is not s and pool.state()["sessions"] == 1
@@ -0,0 +1,66 @@
+import threading, time
+
+import pytest
+
+from singleflight import HAVE_FCNTL, SingleFlight
+
+def _run(n, target):
+    out = [None] * n
+    ts = [threading.Thread(target=lambda i=i: out.__setitem__(i, target())) for i in range(n)]
+    for t in ts: t.start()
+    for t in ts: t.join(10)
+    return out
+
+def test_concurrent_calls_share_one_search():
+    sf, calls = SingleFlight(file_locks=False), []
+    def search():
+        calls.append(1); time.sleep(0.2); return ("$ 1", "1")
+    assert _run(5, lambda: sf.do(("Naldo", "tv"), search)) == [("$ 1", "1")] * 5
+    assert len(calls) == 1
+    assert sf.state()["leaders"] == 1 and sf.state()["shared"] == 4 and sf.state()["in_flight"] == 0
+
+def test_leader_error_reaches_followers():
+    sf = SingleFlight(file_locks=False)
+    def boom(): time.sleep(0.2); raise ValueError("caído")
+    errors = []
+    def call():
+        try: sf.do("k", boom)
+        except ValueError as e: errors.append(str(e))
+    _run(3, call)
+    assert errors == ["caído"] * 3
+    assert sf.do("k", lambda: "ok") == "ok"  # la clave se libera
+
+def test_cancelled_follower_does_not_wait():
+    sf, release = SingleFlight(file_locks=False), threading.Event()
+    leader = threading.Thread(target=lambda: sf.do("k", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    assert sf.do("k", lambda: "nunca", cancel_cb=lambda: True) is None
+    assert time.monotonic() - t0 < 1.5
+    release.set(); leader.join(5)
+
+@pytest.mark.skipif(not HAVE_FCNTL, reason="sin fcntl")
+def test_file_lock_rechecks_before_searching(tmp_path):
+    sf = SingleFlight(file_locks=True, lock_dir=tmp_path)
+    assert sf.do("k", lambda: "red", recheck=lambda: "caché") == "caché"
+    assert sf.do("k", lambda: "red", recheck=lambda: None) == "red"
+    assert sf.state()["rechecked"] == 1
+
+@pytest.mark.skipif(not HAVE_FCNTL, reason="sin fcntl")
+def test_same_stripe_does_not_serialize_within_process(tmp_path):
+    sf, inside = SingleFlight(file_locks=True, lock_dir=tmp_path, stripes=1), threading.Barrier(2, timeout=5)
+    def search(): inside.wait(); return "red"  # solo termina si las dos claves están adentro a la vez
+    assert _run(2, lambda: sf.do(threading.current_thread().name, search)) == ["red", "red"]
+    assert sf.state()["leaders"] == 2 and sf._held == {}
+
+@pytest.mark.skipif(not HAVE_FCNTL, reason="sin fcntl")
+def test_stripe_still_excludes_other_processes(tmp_path):
+    import fcntl, os
+    sf = SingleFlight(file_locks=True, lock_dir=tmp_path, stripes=1)
+    fd = os.open(str(tmp_path / "sf-000.lock"), os.O_RDWR | os.O_CREAT)  # otra descripción, como otro worker
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    with pytest.raises(RuntimeError, match="cancelled"):
+        sf.do("k", lambda: "red", cancel_cb=lambda: True)
+    fcntl.flock(fd, fcntl.LOCK_UN); os.close(fd)
+    assert sf.do("k", lambda: "red") == "red"
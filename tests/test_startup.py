@@ -0,0 +1,44 @@
+import gc, os, runpy, subprocess, sys
+from importlib.util import find_spec
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ("scraper", "pandas", "bs4", "pdfminer", "requests", "openpyxl", "pytesseract", "pypdfium2")
+
+def test_import_app_is_light():
+    code = f"import sys, app; print([m for m in {HEAVY!r} if m in sys.modules])"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+                         env={**os.environ, "GUNICORN_PRELOAD": "0"})
+    assert out.stdout.strip() == "[]"
+
+def test_warm_imports_reports_missing():
+    from app import warm_imports
+    assert warm_imports(["json", "modulo_que_no_existe"]) == ["modulo_que_no_existe"]
+
+def test_gunicorn_conf_reads_env(monkeypatch):
+    monkeypatch.setenv("WORKERS", "2"); monkeypatch.setenv("THREADS", "4"); monkeypatch.setenv("PORT", "9000")
+    monkeypatch.setenv("GUNICORN_PRELOAD", "1")
+    conf = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+    assert (conf["workers"], conf["threads"], conf["bind"], conf["preload_app"]) == (2, 4, "127.0.0.1:9000", True)
+    monkeypatch.setenv("GUNICORN_PRELOAD", "0")
+    assert runpy.run_path(str(ROOT / "gunicorn.conf.py"))["preload_app"] is False
+
+def test_preload_warms_imports_and_freezes_gc(monkeypatch):
+    import app
+    monkeypatch.setenv("GUNICORN_PRELOAD", "1")
+    conf = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+    calls, logged = [], []
+    monkeypatch.setattr(app, "warm_imports", lambda: calls.append(1) or ["curl_cffi.requests"])
+    server = type("S", (), {"log": type("L", (), {"info": lambda self, *a: logged.append(a[0] % a[1:])})()})()
+    try:
+        conf["when_ready"](server)
+    finally:
+        gc.unfreeze()
+    assert calls == [1] and "no disponibles: curl_cffi.requests" in logged[0]
+
+@pytest.mark.skipif(find_spec("gunicorn") is None, reason="gunicorn no instalado")
+def test_gunicorn_accepts_config():
+    subprocess.run([sys.executable, "-m", "gunicorn", "--check-config", "-c", "gunicorn.conf.py", "app:app"],
+                   cwd=ROOT, check=True, capture_output=True)
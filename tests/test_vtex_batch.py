@@ -0,0 +1,48 @@
+import scraper
+from scraper import PriceScraper
+
+def _item(price, ean=None, ref=None, name=""):
+    return {"ean": ean, "name": name, "referenceId": [{"Key": "RefId", "Value": ref}] if ref else [],
+            "sellers": [{"commertialOffer": {"Price": price}}]}
+
+class FakeVtex:
+    """Catálogo VTEX en memoria que responde a fq=alternateIds_* y a intelligent-search."""
+    def __init__(self, items):
+        self.items, self.calls = items, []
+    def get(self, url, params=None, **kw):
+        self.calls.append((url, params))
+        if "intelligent-search" in url:
+            words = params["query"].lower().split()
+            hits = [it for it in self.items if any(w in it["name"].lower() for w in words)]
+            data = {"products": [{"productName": it["name"], "items": [it]} for it in hits]}
+        else:
+            fq = [v.split(":", 1) for k, v in params if k == "fq"]
+            hits = [it for it in self.items for key, val in fq
+                    if (key == "alternateIds_Ean" and it["ean"] == val) or
+                       (key == "alternateIds_RefId" and any(r["Value"] == val for r in it["referenceId"]))]
+            data = [{"productName": it["name"], "items": [it]} for it in hits]
+        return type("R", (), {"json": lambda self: data})()
+
+def _scraper(items):
+    sc = PriceScraper(delay_range=(0, 0))
+    sc.client = FakeVtex(items)
+    return sc
+
+def test_eans_are_chunked_and_mapped_back():
+    eans = [f"779{i:010d}" for i in range(scraper.VTEX_BATCH + 2)]
+    sc = _scraper([_item(1000 + i, ean=e) for i, e in enumerate(eans) if i != 3])
+    products = [{"ean": f"{e[:3]}-{e[3:]}"} for e in eans]  # el EAN se normaliza a dígitos
+    out = sc._vtex_batch("V", "https://v.com/", products, lambda m: None)
+    assert len(sc.client.calls) == 2  # 10 + 2 EANs
+    assert [len([p for p in params if p[0] == "fq"]) for _, params in sc.client.calls] == [scraper.VTEX_BATCH, 2]
+    assert sorted(out) == [i for i in range(len(eans)) if i != 3]
+    assert tuple(out[5]) == ("$ 1.005,00", "1005")
+
+def test_models_by_refid_then_intelligent_search():
+    sc = _scraper([_item(500, ref="HGF-358"), _item(700, name="Lavarropas Drean NEXT8"), _item(900, ref="GT320")])
+    products = [{"modelo": "HGF-358"}, {"modelo": "NEXT8"}, {"modelo": "GT32"}, {"modelo": "X1"}]
+    out = sc._vtex_batch("V", "https://v.com", products, lambda m: None)
+    assert {i: tuple(v)[1] for i, v in out.items()} == {0: "500", 1: "700"}  # GT32 ≠ GT320; X1: muy corto
+    urls = [u for u, _ in sc.client.calls]
+    assert len(urls) == 2 and "intelligent-search" in urls[1]
+    assert sc.client.calls[1][1]["query"] == "NEXT8 GT32"  # un único OR para lo que faltó